@@ -0,0 +1,64 @@
+"""
+bench_batch_scoring.py
+
+Re-scores synthetic "archived runs" (postings repeat from one day to the next) with the
+per-listing filter_job_listings and with its sparse-matrix batch mode.
+
+Usage:
+    python benchmarks/bench_batch_scoring.py [--days 30 90 180] [--listings-per-day 400] [--repeat-rate 0.7]
+"""
+import argparse
+import copy
+import importlib
+import random
+import time
+
+import stub_servers  # noqa: F401 (sets up sys.path)
+from bench_token_matcher import synthetic_snippets
+from lib.profile_tokens import profile_tokens_pt, profile_tokens_en
+
+import job_search
+from job_listing import JobListing
+
+
+def archived_runs(days, listings_per_day, repeat_rate, rng):
+    snippets = synthetic_snippets(listings_per_day, profile_tokens_pt + profile_tokens_en, rng)
+    listings = []
+    for day in range(days):
+        fresh = synthetic_snippets(int(listings_per_day * (1 - repeat_rate)), profile_tokens_pt + profile_tokens_en, rng)
+        snippets = snippets[len(fresh):] + fresh
+        for index, snippet in enumerate(snippets):
+            listings.append(JobListing(snippet[:50], f'https://jobs.example.com/{day}/{index}', snippet))
+    return listings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--days', type=int, nargs='+', default=[30, 90, 180])
+    parser.add_argument('--listings-per-day', type=int, default=400)
+    parser.add_argument('--repeat-rate', type=float, default=0.7)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    # Loaded before the timings, so the first batch run doesn't pay for importing NumPy/SciPy
+    importlib.import_module('batch_scoring')
+    print(f"{'days':>5} {'listings':>9} {'per-listing (s)':>16} {'batch (s)':>10} {'speedup':>8}")
+
+    for days in args.days:
+        listings = archived_runs(days, args.listings_per_day, args.repeat_rate, rng)
+        per_listing_input, batch_input = copy.deepcopy(listings), copy.deepcopy(listings)
+
+        start = time.perf_counter()
+        per_listing = job_search.filter_job_listings(per_listing_input)
+        per_listing_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = job_search.filter_job_listings(batch_input, batch=True)
+        batch_time = time.perf_counter() - start
+
+        assert [listing.url for listing in per_listing] == [listing.url for listing in batch]
+        print(f"{days:>5} {len(listings):>9} {per_listing_time:>16.2f} {batch_time:>10.2f} {per_listing_time / batch_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
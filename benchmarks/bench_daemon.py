@@ -0,0 +1,157 @@
+"""
+bench_daemon.py
+
+Runs the search daemon (src/daemon.py) against local Google, Dify and Trello stubs on a compressed
+clock (intervals of seconds instead of minutes). Half of the ATS queries are busy (a new posting
+every --period seconds during the first half of the run), the other half publish nothing new.
+Reported:
+    1. Google calls and polls per source: busy sources are polled more often, quiet ones back off
+       to the longest interval and cost one call per poll.
+    2. Latency from publication to Trello card, against the interval of fixed-schedule polling.
+    3. Calls the same coverage would cost polling every source at the shortest interval.
+
+Usage:
+    python benchmarks/bench_daemon.py [--queries 6] [--duration 20] [--period 1.5]
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import statistics
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+from stub_servers import SERVERS, DifyStubHandler, StubHandler, TrelloStubHandler, running_server
+
+import daemon
+import instrumentation
+import job_search
+import profiles
+import trello_integration
+from settings import settings
+
+ROLES = ['Business Operations Manager', 'Strategy & Operations Lead', 'Revenue Operations Analyst',
+         'Gerente de Operações', 'Product Operations Manager']
+
+
+class FeedGoogleStubHandler(StubHandler):
+    """
+    Fake Google Custom Search endpoint whose results grow over time: a busy query (even ATS number)
+    publishes posting `server.initial + n` at `server.started + n * server.period`, up to `server.burst`
+    seconds in. sort=date serves the newest first.
+    """
+
+    def do_GET(self):
+        self.delay()
+        params = parse_qs(urlparse(self.path).query)
+        query = params.get('q', [''])[0]
+        start = int(params.get('start', ['1'])[0])
+        number = int(re.search(r'ats(\d+)', query).group(1))
+
+        total = self.server.initial
+        if number % 2 == 0:
+            elapsed = min(time.monotonic() - self.server.started, self.server.burst)
+            total += int(elapsed // self.server.period)
+        postings = list(range(total, 0, -1)) if params.get('sort', [''])[0] == 'date' else list(range(1, total + 1))
+
+        items = [{
+            'title': f'{ROLES[posting % len(ROLES)]} - Empresa{number}{posting * 7919 % 1000}',
+            'link': f'https://ats{number}.example.com/jobs/{posting}',
+            'snippet': f'Remote LATAM. Estratégia, operações e produto na Empresa{number}{posting}. Python, SQL. Vaga {posting}.',
+        } for posting in postings[start - 1:start + 9]]
+        self.send_json({'searchInformation': {'totalResults': str(total)}, 'items': items})
+
+
+def published_at(server, url):
+    """Publication time of a busy-source posting (None for the ones already there at the start)."""
+    posting = int(url.rstrip('/').split('/')[-1])
+    if posting <= server.initial:
+        return None
+    return server.started + (posting - server.initial) * server.period
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--queries', type=int, default=6)
+    parser.add_argument('--duration', type=float, default=20, help='Seconds the daemon runs')
+    parser.add_argument('--period', type=float, default=1.5, help='Seconds between two postings of a busy source')
+    parser.add_argument('--min-interval', type=float, default=0.5, help='DAEMON_MIN_INTERVAL, in (compressed) seconds')
+    parser.add_argument('--max-interval', type=float, default=8, help='DAEMON_MAX_INTERVAL, in (compressed) seconds')
+    parser.add_argument('--latency', type=float, default=0.02, help='Google/Trello stub latency, in seconds')
+    parser.add_argument('--dify-latency', type=float, default=0.1, help='Dify stub latency, in seconds')
+    args = parser.parse_args()
+
+    queries = {f'ats{i}': f'site:ats{i}.example.com remote business latam after:' for i in range(args.queries)}
+
+    with running_server(FeedGoogleStubHandler, latency=args.latency, initial=10, period=args.period,
+                        burst=args.duration / 2, started=time.monotonic()) as google_url, \
+            running_server(DifyStubHandler, latency=args.dify_latency) as dify_url, \
+            running_server(TrelloStubHandler, latency=args.latency) as trello_url:
+
+        job_search.GOOGLE_SEARCH_URL = google_url
+        settings.DIFY_AGENT_URL = dify_url
+        job_search.DIFY_RATE_LIMITER = job_search.TokenBucket(1000)
+        trello_integration.TRELLO_API_URL = trello_url
+        trello_integration.TRELLO_RATE_PER_SECOND = 1000
+        daemon.load_queries = lambda path: queries
+        daemon.SEARCH_RATE_PER_SECOND = 1000
+        daemon.SEARCH_DAILY_BUDGET = 10 ** 6  # The budget floor is measured in days: irrelevant on this clock
+        daemon.DAEMON_START_INTERVAL = 2
+        daemon.DAEMON_MIN_INTERVAL = args.min_interval
+        daemon.DAEMON_MAX_INTERVAL = args.max_interval
+        daemon.DAEMON_MAX_SLEEP = 0.05
+
+        workdir = tempfile.mkdtemp()
+        previous_cwd = os.getcwd()
+        os.chdir(workdir)
+        os.makedirs('output', exist_ok=True)
+        profiles.PROFILES_PATH = os.path.join(workdir, 'profiles.json')  # No such file: the default profile
+        instrumentation.REPORT_PATH = os.path.join(workdir, 'run_report.json')
+        instrumentation.METRICS.reset()
+        google_server, trello_server = SERVERS[google_url], SERVERS[trello_url]
+        try:
+            search_daemon = daemon.SearchDaemon(state_dir=workdir)
+            google_server.started = time.monotonic()
+            stopper = threading.Timer(args.duration, search_daemon.stop)
+            stopper.start()
+            with contextlib.redirect_stdout(io.StringIO()):
+                search_daemon.run()
+            stopper.cancel()
+        finally:
+            os.chdir(previous_cwd)
+
+    # 1. Polls and calls per source
+    calls = instrumentation.METRICS.report()['stages'].get('search_google', {}).get('calls', 0)
+    print(f"{'source':>8} {'kind':>6} {'polls':>6} {'new postings':>13} {'interval (s)':>13}")
+    for source, state in search_daemon.schedule.sources.items():
+        kind = 'busy' if int(source[3:]) % 2 == 0 else 'quiet'
+        print(f"{source:>8} {kind:>6} {state['polls']:>6} {state['new_postings']:>13} {state['interval']:>13.2f}")
+    polls = sum(state['polls'] for state in search_daemon.schedule.sources.values())
+    print(f"{search_daemon.cycles} ciclos, {polls} consultas, {calls} chamadas Google ({calls / max(polls, 1):.2f} por consulta)")
+
+    # 2. Latency, publication -> card
+    latencies = []
+    for card in trello_server.cards:
+        published = published_at(google_server, card['urlSource'])
+        if published is not None:
+            latencies.append(card['created_at'] - published)
+    busy = sum(1 for i in range(args.queries) if i % 2 == 0)
+    published_count = busy * int(args.duration / 2 // args.period)
+    if latencies:
+        latencies.sort()
+        print(f"\n{len(trello_server.cards)} cards; {len(latencies)} de {published_count} vagas publicadas durante a execução "
+              f"com card, latência p50 {statistics.median(latencies):.2f}s, p95 {latencies[int(0.95 * (len(latencies) - 1))]:.2f}s, "
+              f"máx {latencies[-1]:.2f}s")
+    print(f"Consulta em intervalo fixo: latência média de meio intervalo ({args.max_interval / 2:.2f}s a cada {args.max_interval:.0f}s; "
+          f"uma execução diária: 12 h)")
+
+    # 3. Fixed polling at the shortest interval
+    fixed = int(args.duration / args.min_interval) * args.queries
+    print(f"Intervalo fixo mínimo ({args.min_interval}s) em todas as fontes: ≥{fixed} chamadas Google, contra {calls}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+bench_group_search.py
+
+Compares sequential vs concurrent group_search against a local Google stub, for a growing number of ATS queries.
+
+Usage:
+    python benchmarks/bench_group_search.py [--latency 0.05] [--workers 4]
+"""
+import argparse
+import time
+
+from stub_servers import GoogleStubHandler, running_server
+
+import http_client
+import job_search
+
+
+def run(queries, max_concurrency):
+    start = time.perf_counter()
+    results = job_search.group_search(queries, max_concurrency=max_concurrency, rate_per_second=1000)
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.05, help='Stub latency per request, in seconds')
+    parser.add_argument('--workers', type=int, default=job_search.SEARCH_MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    with running_server(GoogleStubHandler, latency=args.latency, total_results=30) as base_url:
+        job_search.GOOGLE_SEARCH_URL = base_url
+
+        print(f"{'queries':>8} {'sequential (s)':>15} {'concurrent (s)':>15} {'speedup':>8}")
+        for query_count in (3, 6, 12, 24, 48):
+            queries = {f'ats{i}': f'site:ats{i}.example.com remote business latam after:' for i in range(query_count)}
+
+            # Silence the per-page prints of search_google
+            with open(job_search.os.devnull, 'w') as devnull:
+                stdout, job_search.sys.stdout = job_search.sys.stdout, devnull
+                try:
+                    sequential_time, sequential_results = run(queries, 1)
+                    concurrent_time, concurrent_results = run(queries, args.workers)
+                finally:
+                    job_search.sys.stdout = stdout
+
+            assert sequential_results == concurrent_results, 'Concurrent results must keep the sequential order'
+            print(f"{query_count:>8} {sequential_time:>15.3f} {concurrent_time:>15.3f} {sequential_time / concurrent_time:>7.1f}x")
+
+    # Keep-alive: connections opened should stay near the worker count, whatever the number of calls
+    http_client.print_connection_stats()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+bench_import_time.py
+
+Import time budget of the entry points used without running the pipeline (filtering, parsing,
+re-scoring scripts): each module is imported in a fresh interpreter under `python -X importtime`,
+with every API secret removed from the environment, and its cumulative import time (median of
+--runs) is checked against its budget. Network clients and NumPy must not be loaded by them.
+
+Usage:
+    python benchmarks/bench_import_time.py [--runs 7] [--scale 1.0]     # exits 1 when over budget
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from stub_servers import DUMMY_ENV, ROOT_DIR
+
+# Module -> (budget in milliseconds, what it is imported for)
+BUDGETS = {
+    'job_search': (100, 'filter_job_listings, parse_ai_screening_results'),
+    'json_extractor': (25, 'extract_json_blocks'),
+    'dify_stream': (35, 'JsonBlockStream'),
+    'token_matcher': (15, 'get_matcher'),
+}
+# Loaded on first use only (first HTTP call, streamed answer, near-duplicate fingerprints, cassettes)
+DEFERRED_MODULES = ['requests', 'urllib3', 'sseclient', 'numpy', 'scipy', 'cassette']
+
+
+def import_once(module):
+    """
+    Returns:
+        tuple: (cumulative import time of `module` in ms, deferred modules that were loaded anyway)
+    """
+    env = {name: value for name, value in os.environ.items() if name not in DUMMY_ENV}
+    env['PYTHONPATH'] = os.pathsep.join([os.path.join(ROOT_DIR, 'src'), ROOT_DIR])
+    check = f"import sys, {module}; print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', check], env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed without secrets:\n{result.stderr}")
+
+    cumulative = None
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            cumulative = int(fields[1]) / 1000
+    loaded = [name for name in result.stdout.strip().split(',') if name]
+    return cumulative, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--scale', type=float, default=1.0, help='Budget multiplier (slow CI machines)')
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':>16} {'median (ms)':>12} {'budget (ms)':>12}  loaded deferred modules")
+    for module, (budget, entry_points) in BUDGETS.items():
+        samples, loaded = [], []
+        for _ in range(args.runs):
+            milliseconds, loaded = import_once(module)
+            samples.append(milliseconds)
+        median = statistics.median(samples)
+        budget *= args.scale
+        print(f"{module:>16} {median:>12.1f} {budget:>12.0f}  {', '.join(loaded) or '-'}")
+        if median > budget:
+            failures.append(f"{module} ({entry_points}): {median:.1f} ms > {budget:.0f} ms")
+        if loaded:
+            failures.append(f"{module} ({entry_points}) loads {', '.join(loaded)} at import")
+
+    for failure in failures:
+        print(f"ACIMA DO ORÇAMENTO {failure}")
+    if failures:
+        sys.exit(1)
+    print("Dentro do orçamento")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+bench_job_listing.py
+
+Compares the previous string/dict round trip of a search result (format_result string, split back
+into a dict, formatted again for the prompt) with the JobListing record, on synthetic Google items:
+memory held by the listings (tracemalloc) and time from Google item to prompt line.
+Also counts the listings the old round trip corrupted (snippets holding a newline).
+
+Usage:
+    python benchmarks/bench_job_listing.py [--listings 100000]
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+import stub_servers  # noqa: F401 (sets up sys.path)
+from job_listing import JobListing
+
+
+###***********************************************************************************************************************###
+def legacy_format_result(item):
+    return f"Title: {item.get('title', '')}\nURL: {item.get('link', '')}\nSnippet: {item.get('snippet', '')}\n---\n"
+
+
+def legacy_parse_formatted_result(result):
+    lines = result.strip().split('\n')
+    if len(lines) >= 3:
+        return {
+            "Title": lines[0].replace('Title: ', ''),
+            "URL": lines[1].replace('URL: ', ''),
+            "Snippet": lines[2].replace('Snippet: ', ''),
+        }
+    return None
+
+
+def legacy_format_listing_for_screening(listing):
+    return f"Title: {listing['Title']} §URL: {listing['URL']} §Snippet: {listing['Snippet']} §---"
+
+
+def legacy_pipeline(items):
+    results = [legacy_format_result(item) for item in items]
+    listings = [listing for listing in map(legacy_parse_formatted_result, results) if listing is not None]
+    for listing in listings:
+        listing['token_analysis'] = {'matches_pt': [], 'matches_en': [], 'total_matches': 0}
+        listing['remove'] = True
+    prompt_lines = [legacy_format_listing_for_screening(listing) for listing in listings]
+    return listings, prompt_lines
+
+
+def record_pipeline(items):
+    listings = [JobListing.from_search_item(item, source='lever') for item in items]
+    for listing in listings:
+        listing.matches_pt, listing.matches_en, listing.total_matches = [], [], 0
+    prompt_lines = [listing.screening_text() for listing in listings]
+    return listings, prompt_lines
+
+
+###***********************************************************************************************************************###
+def synthetic_items(count, rng, newline_rate=0.05):
+    words = ['remote', 'latam', 'estratégia', 'operações', 'business', 'manager', 'python', 'sql', 'produto', 'growth']
+    items = []
+    for index in range(count):
+        snippet = ' '.join(rng.choice(words) for _ in range(25))
+        if rng.random() < newline_rate:
+            snippet = snippet.replace(' ', '\n', 1)  # Google snippets sometimes hold line breaks
+        items.append({
+            'title': f'Business Operations Manager {index}',
+            'link': f'https://jobs.lever.co/company{index % 500}/{index:08x}-0000-0000-0000-000000000000',
+            'snippet': snippet,
+        })
+    return items
+
+
+def measure(pipeline, items):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    listings, prompt_lines = pipeline(items)
+    seconds = time.perf_counter() - start
+    del prompt_lines
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return listings, seconds, retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--listings', type=int, default=100000)
+    args = parser.parse_args()
+
+    items = synthetic_items(args.listings, random.Random(5))
+
+    # Timings without tracemalloc overhead (best of 3)
+    timings = {}
+    for name, pipeline in (('legacy', legacy_pipeline), ('JobListing', record_pipeline)):
+        best = float('inf')
+        for _ in range(3):
+            start = time.perf_counter()
+            pipeline(items)
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+
+    print(f"{'':>11} {'seconds':>8} {'listings/s':>11} {'held (MB)':>10} {'peak (MB)':>10}")
+    kept = {}
+    for name, pipeline in (('legacy', legacy_pipeline), ('JobListing', record_pipeline)):
+        listings, _, retained, peak = measure(pipeline, items)
+        kept[name] = listings
+        print(f"{name:>11} {timings[name]:>8.2f} {len(items) / timings[name]:>11.0f} {retained / 2 ** 20:>10.1f} {peak / 2 ** 20:>10.1f}")
+
+    corrupted = sum(1 for item, listing in zip(items, kept['legacy']) if listing['Snippet'] != item['snippet'])
+    print(f"Snippets truncated by the old round trip: {corrupted} of {len(items)}")
+    assert all(listing.snippet == item['snippet'] for item, listing in zip(items, kept['JobListing']))
+
+
+if __name__ == '__main__':
+    main()
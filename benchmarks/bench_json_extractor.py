@@ -0,0 +1,150 @@
+"""
+bench_json_extractor.py
+
+Compares extract_json_blocks with the previous parse_llm_json:
+    1. Same output on a corpus of agent answers: the recorded ones (output/job_analysis.json and
+       any answer files given with --answers) plus synthetic answers full of escapes, smart quotes
+       and broken blocks.
+    2. Time to parse multi-megabyte answers.
+
+Usage:
+    python benchmarks/bench_json_extractor.py [--answers path.json ...] [--sizes 1 4 16]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import time
+
+from stub_servers import ROOT_DIR
+from json_extractor import extract_json_blocks
+
+RECORDED_ANSWERS = [os.path.join(ROOT_DIR, 'output', 'job_analysis.json')]
+
+
+def legacy_parse_llm_json(json_from_llm_output):
+    parsed_data = []
+    json_blocks = re.findall(r"```json\s*(.*?)\s*```", json_from_llm_output, re.DOTALL)
+
+    for block in json_blocks:
+        cleaned_block = block.strip()
+        if cleaned_block.endswith(','):
+            cleaned_block = cleaned_block[:-1]
+
+        try:
+            cleaned_block = re.sub(r'\\[^"\\/bfnrtu]', ' ', cleaned_block)
+            cleaned_block = cleaned_block.replace('\\xa0', ' ')
+            cleaned_block = cleaned_block.replace('\\u00a0', ' ')
+            cleaned_block = cleaned_block.replace('\\u2014', '-')
+            cleaned_block = cleaned_block.replace('\\u2013', '-')
+            cleaned_block = cleaned_block.replace('\\u2019', "'")
+            cleaned_block = cleaned_block.replace('\\u2018', "'")
+            cleaned_block = cleaned_block.replace('\\u201c', '"')
+            cleaned_block = cleaned_block.replace('\\u201d', '"')
+            cleaned_block = re.sub(r'\\(?!["\\/bfnrtu])', '', cleaned_block)
+            parsed_data.append(json.loads(cleaned_block))
+        except json.JSONDecodeError:
+            try:
+                cleaned_block = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', cleaned_block)
+                parsed_data.append(json.loads(cleaned_block))
+            except json.JSONDecodeError:
+                continue
+
+    return parsed_data
+
+
+###***********************************************************************************************************************###
+# Escapes and characters seen in agent answers, some of which break the old cleaning (e.g. escaped smart double quotes)
+TRICKY_FRAGMENTS = [
+    'Estratégia', 'remoto\\n', '\\u2014', '\\u2013', '\\u2019s', '\\u2018', '\\u201cok\\u201d', '\\u00a0', '\\u00A0',
+    '\\xa0', '\\t', '\\/', '\\\\', '\\\\\\u2019', '\\\\x', '\\"', '\\é', '\\ ', '\x0b', '\x85', 'ação', '😀', '\\ud83d\\ude00',
+]
+# What a typical answer holds: line breaks, accents, the odd escaped dash or apostrophe
+TYPICAL_FRAGMENTS = ['\\n', '\\n\\n', '\\u2019', '\\u2014', '\\u00a0', 'ação', '\\/', '\\"', 'Estratégia']
+
+
+def synthetic_job(rng, index, size=1, fragments=TRICKY_FRAGMENTS):
+    def text(words):
+        return ' '.join(rng.choice(fragments) if rng.random() < 0.2 else rng.choice(['gestão', 'produto', 'data', 'ops'])
+                        for _ in range(words))
+
+    return (
+        '{\n'
+        f'  "EMPRESA": "{text(2)}",\n'
+        f'  "CLASSIFICAÇÃO": "{rng.choice(["ALTA", "MÉDIA", "BAIXA"])}",\n'
+        f'  "ANÁLISE": "{text(12 * size)}",\n'
+        f'  "RECOMENDAÇÃO": "{rng.choice(["CANDIDATAR-SE", "INVESTIGAR MAIS", "DESCARTAR"])}",\n'
+        f'  "URL": "https://jobs.example.com/{index}"\n'
+        '}'
+    )
+
+
+def synthetic_answer(rng, jobs, size=1, fragments=TRICKY_FRAGMENTS):
+    body = '[\n' + ',\n'.join(synthetic_job(rng, index, size, fragments) for index in range(jobs)) + '\n]'
+    trailing = ',' if rng.random() < 0.2 else ''
+    answer = f'Análise das vagas:\n```json\n{body}{trailing}\n```\n'
+    if rng.random() < 0.3:
+        answer += f'\nOutras vagas:\n```json\n{synthetic_job(rng, jobs, size, fragments)}\n```\n'
+    return answer + 'Resumo das vagas: ...'
+
+
+def load_recorded_answers(paths):
+    answers = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding='utf-8') as f:
+            content = json.load(f)
+        answers.extend(content if isinstance(content, list) else [content])
+    return [answer for answer in answers if isinstance(answer, str)]
+
+
+def quiet(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+
+###***********************************************************************************************************************###
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--answers', nargs='*', default=[], help='JSON files holding recorded answers (a string or a list of strings)')
+    parser.add_argument('--synthetic', type=int, default=2000, help='Synthetic answers in the parity corpus')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 4, 16], help='Answer sizes to time, in MB')
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    recorded = load_recorded_answers(RECORDED_ANSWERS + args.answers)
+    corpus = recorded + [synthetic_answer(rng, rng.randint(0, 8)) for _ in range(args.synthetic)]
+
+    # Parity: with repairs off, exactly the old output; with repairs on, blocks the old parser dropped may be recovered
+    mismatches = 0
+    recovered = 0
+    for answer in corpus:
+        legacy = quiet(legacy_parse_llm_json, answer)
+        if quiet(extract_json_blocks, answer, False) != legacy:
+            mismatches += 1
+        recovered += len(quiet(extract_json_blocks, answer)) - len(legacy)
+    print(f"Paridade: {len(corpus)} respostas ({len(recorded)} gravadas), {mismatches} diferenças, {recovered} blocos recuperados")
+
+    print(f"{'MB':>4} {'legacy (s)':>11} {'extractor (s)':>14} {'speedup':>8}")
+    for size in args.sizes:
+        job_bytes = len(synthetic_job(rng, 0, fragments=TYPICAL_FRAGMENTS))
+        answer = synthetic_answer(rng, size * 2 ** 20 // job_bytes, fragments=TYPICAL_FRAGMENTS)
+
+        start = time.perf_counter()
+        legacy = quiet(legacy_parse_llm_json, answer)
+        legacy_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        extracted = quiet(extract_json_blocks, answer)
+        extractor_seconds = time.perf_counter() - start
+
+        assert extracted == legacy
+        print(f"{len(answer) / 2 ** 20:>4.0f} {legacy_seconds:>11.3f} {extractor_seconds:>14.3f} {legacy_seconds / extractor_seconds:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+bench_pipeline.py
+
+Runs the staged main() and the streaming main_streaming() end to end against local Google, Dify
+and Trello stubs, and compares time-to-first-card and total run time.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--queries 12] [--results-per-query 30] [--latency 0.05]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from stub_servers import SERVERS, DifyStubHandler, GoogleStubHandler, TrelloStubHandler, running_server
+
+import instrumentation
+import job_search
+import trello_integration
+from settings import settings
+
+
+def run(entry_point, queries, workdir, trello_server):
+    # Fresh caches per run (state_dir), kept out of the repository output/ directory
+    job_search.load_queries = lambda path: queries
+    instrumentation.REPORT_PATH = os.path.join(workdir, 'run_report.json')
+    instrumentation.METRICS.reset()
+    trello_server.cards.clear()
+
+    start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        entry_point(refresh=True, state_dir=workdir)
+    total = time.monotonic() - start
+
+    cards = list(trello_server.cards)
+    first_card = min(card['created_at'] for card in cards) - start if cards else float('nan')
+    return total, first_card, len(cards)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--queries', type=int, default=12)
+    parser.add_argument('--results-per-query', type=int, default=30)
+    parser.add_argument('--latency', type=float, default=0.05, help='Google/Trello stub latency, in seconds')
+    parser.add_argument('--dify-latency', type=float, default=0.5, help='Dify stub latency, in seconds')
+    args = parser.parse_args()
+
+    queries = {f'ats{i}': f'site:ats{i}.example.com remote business latam after:' for i in range(args.queries)}
+
+    with running_server(GoogleStubHandler, latency=args.latency, total_results=args.results_per_query) as google_url, \
+            running_server(DifyStubHandler, latency=args.dify_latency) as dify_url, \
+            running_server(TrelloStubHandler, latency=args.latency) as trello_url:
+
+        job_search.GOOGLE_SEARCH_URL = google_url
+        settings.DIFY_AGENT_URL = dify_url
+        job_search.SEARCH_RATE_PER_SECOND = 1000
+        job_search.DIFY_RATE_LIMITER = job_search.TokenBucket(1000)
+        trello_integration.TRELLO_API_URL = trello_url
+        trello_integration.TRELLO_RATE_PER_SECOND = 1000  # The stub has no rate limit (see bench_trello_sync.py)
+        trello_server = SERVERS[trello_url]
+
+        workdir = tempfile.mkdtemp()
+        previous_cwd = os.getcwd()
+        os.chdir(workdir)  # main() writes its JSON outputs under ./output
+        os.makedirs('output', exist_ok=True)
+        try:
+            print(f"{'mode':>10} {'total (s)':>10} {'first card (s)':>15} {'cards':>6}")
+            for name, entry_point in (('staged', job_search.main), ('streaming', job_search.main_streaming)):
+                total, first_card, cards = run(entry_point, queries, tempfile.mkdtemp(dir=workdir), trello_server)
+                print(f"{name:>10} {total:>10.2f} {first_card:>15.2f} {cards:>6}")
+        finally:
+            os.chdir(previous_cwd)
+
+
+if __name__ == '__main__':
+    main()
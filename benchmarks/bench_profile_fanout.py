@@ -0,0 +1,108 @@
+"""
+bench_profile_fanout.py
+
+Runs the staged main() for 1, 2, 4... candidate profiles (see src/profiles.py) against local Google,
+Dify and Trello stubs, each profile with its own agent keys, Trello board and list. The search is
+shared: Google calls and search time stay flat as profiles are added, while screening, analysis and
+cards grow with them. Separate runs per profile would multiply the Google calls instead.
+
+Usage:
+    python benchmarks/bench_profile_fanout.py [--profiles 1 2 4] [--queries 6] [--stream]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+
+from stub_servers import SERVERS, DifyStubHandler, GoogleStubHandler, TrelloStubHandler, running_server
+
+import instrumentation
+import job_search
+import profiles
+import trello_integration
+from lib.profile_tokens import profile_tokens_pt, profile_tokens_en, profile_token_weights
+from settings import settings
+
+
+def write_profiles(path, count):
+    """Profiles with the same tokens, each with its own agent keys, board and list."""
+    data = []
+    for index in range(count):
+        for name in (f'DIFY_API_KEY_P{index}', f'DIFY_API_KEY_SEEKER_P{index}'):
+            os.environ.setdefault(name, f'bench-{name.lower()}')
+        data.append({
+            'name': f'p{index}', 'tokens_pt': profile_tokens_pt, 'tokens_en': profile_tokens_en, 'weights': profile_token_weights,
+            'trello_list_id': f'list-p{index}', 'trello_board_id': f'board-p{index}',
+            'dify_api_key_env': f'DIFY_API_KEY_P{index}', 'dify_api_key_seeker_env': f'DIFY_API_KEY_SEEKER_P{index}',
+        })
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    return {f'list-p{index}': f'board-p{index}' for index in range(count)}
+
+
+def stage_calls(stage):
+    return instrumentation.METRICS.report()['stages'].get(stage, {}).get('calls', 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--profiles', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--queries', type=int, default=6)
+    parser.add_argument('--results-per-query', type=int, default=30)
+    parser.add_argument('--latency', type=float, default=0.05, help='Google/Trello stub latency, in seconds')
+    parser.add_argument('--dify-latency', type=float, default=0.5, help='Dify stub latency, in seconds')
+    parser.add_argument('--stream', action='store_true', help='Run main_streaming() instead of main()')
+    args = parser.parse_args()
+
+    queries = {f'ats{i}': f'site:ats{i}.example.com remote business latam after:' for i in range(args.queries)}
+    entry_point = job_search.main_streaming if args.stream else job_search.main
+
+    with running_server(GoogleStubHandler, latency=args.latency, total_results=args.results_per_query) as google_url, \
+            running_server(DifyStubHandler, latency=args.dify_latency) as dify_url, \
+            running_server(TrelloStubHandler, latency=args.latency) as trello_url:
+
+        job_search.GOOGLE_SEARCH_URL = google_url
+        settings.DIFY_AGENT_URL = dify_url
+        job_search.SEARCH_RATE_PER_SECOND = 1000
+        job_search.DIFY_RATE_LIMITER = job_search.TokenBucket(1000)
+        job_search.load_queries = lambda path: queries
+        trello_integration.TRELLO_API_URL = trello_url
+        trello_integration.TRELLO_RATE_PER_SECOND = 1000
+        trello_server = SERVERS[trello_url]
+
+        workdir = tempfile.mkdtemp()
+        previous_cwd = os.getcwd()
+        os.chdir(workdir)  # main() writes its JSON outputs under ./output
+        os.makedirs('output', exist_ok=True)
+        try:
+            print(f"{'profiles':>8} {'google':>7} {'screening':>10} {'analysis':>9} {'cards':>6} {'cards/profile':>14} "
+                  f"{'total (s)':>10} {'google, separate runs':>22}")
+            single_google = None
+            for count in args.profiles:
+                profiles.PROFILES_PATH = os.path.join(workdir, f'profiles-{count}.json')
+                trello_server.list_boards = write_profiles(profiles.PROFILES_PATH, count)
+                trello_server.cards.clear()
+                instrumentation.REPORT_PATH = os.path.join(workdir, 'run_report.json')
+                instrumentation.METRICS.reset()
+
+                start = time.monotonic()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    entry_point(refresh=True, state_dir=tempfile.mkdtemp(dir=workdir))
+                total = time.monotonic() - start
+
+                google = stage_calls('search_google')
+                single_google = google if single_google is None else single_google
+                per_list = Counter(card.get('idList') for card in trello_server.cards)
+                spread = '/'.join(str(per_list[f'list-p{index}']) for index in range(count))
+                print(f"{count:>8} {google:>7} {stage_calls('send_to_dify_agent'):>10} {stage_calls('stream_dify_agent'):>9} "
+                      f"{len(trello_server.cards):>6} {spread:>14} {total:>10.2f} {single_google * count:>22}")
+        finally:
+            os.chdir(previous_cwd)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+bench_profile_index.py
+
+Compares the weighted profile index (src/profile_index.py) with the substring TokenMatcher it
+replaced in filter_job_listings, on synthetic listings labeled by construction: each one carries
+0-4 real mentions of profile tokens, written the way postings write them (capitalized, upper case,
+without accents, in the plural), and 0-2 decoys, words holding a token inside another word
+("candidatar" holds "data", "cuidados" holds "dados", "accredited" holds "credit"...).
+    1. Precision/recall of the profile concepts found in each listing (a token listed twice, or
+       in both lists, is one concept).
+    2. Precision/recall of the filter (a listing is relevant when the weights of the concepts it
+       really mentions add up to more than 1), and how many listings each version sends to the LLM
+       screening.
+    3. Throughput on the same listings, and index build vs cached load time.
+
+Usage:
+    python benchmarks/bench_profile_index.py [--listings 20000]
+"""
+import argparse
+import random
+import tempfile
+import time
+
+import stub_servers  # noqa: F401 (sets up sys.path)
+from lib.profile_tokens import profile_tokens_pt, profile_tokens_en, profile_token_weights
+from profile_index import ProfileIndex, load_index
+from token_matcher import TokenMatcher
+
+# (text as postings write it, profile tokens it mentions, nested ones included)
+MENTIONS = [
+    ('Operações', ('operações',)), ('OPERACOES', ('operações',)), ('operacoes', ('operações',)),
+    ('Produtos', ('produtos',)), ('produto', ('produto',)), ('Gestão de Produtos', ('gestão de produto', 'produtos')),
+    ('análise', ('análise',)), ('Analise de Dados', ('análise de dados', 'análise', 'dados')), ('analises', ('análise',)),
+    ('Crédito', ('crédito',)), ('credito imobiliario', ('crédito imobiliário', 'crédito')), ('Home-Equity', ('home equity',)),
+    ('Estratégia', ('estratégia',)), ('ESTRATEGIA', ('estratégia',)), ('Gerentes', ('gerente',)),
+    ('Gerente de Projetos', ('gerente de projetos', 'gerente')), ('Finanças', ('finanças',)), ('financas', ('finanças',)),
+    ('Stakeholders', ('stakeholders',)), ('stakeholder', ('stakeholders',)), ('SQL', ('sql',)), ('Python', ('python',)),
+    ('Business Analyst', ('business analyst', 'business', 'analyst')),
+    ('business analysts', ('business analyst', 'business', 'analyst')),
+    ('Product Manager', ('product manager', 'products')), ('product managers', ('product manager', 'products')),
+    ('Operations', ('operations',)), ('risk', ('risks',)), ('Risks', ('risks',)), ('Fintech', ('fintech',)),
+    ('fintechs', ('fintech',)), ('Loan Origination', ('loan origination',)), ('Consignado', ('consignado',)),
+    ('Inovação', ('inovação',)), ('inovacao', ('inovação',)), ('Transformação Digital', ('transformação digital',)),
+    ('Estruturas Operacionais', ('estrutura operacional',)), ('Supervisores', ('supervisor',)),
+    ('Jurídico', ('jurídico',)), ('Tecnologia', ('tecnologia',)), ('P&L', ('p&l',)), ('Roadmap', ('roadmap',)),
+]
+# Words holding a token inside another word
+DECOYS = [
+    'candidatar', 'candidate-se', 'cuidados', 'soldados', 'accredited', 'discredited', 'fragile',
+    'illegal', 'therapists', 'psychoanalysis', 'telemarketing', 'subprodutos', 'nosql', 'underdevelopment',
+]
+FILLER = ['remote', 'latam', 'apply', 'now', 'the', 'team', 'we', 'are', 'hiring', 'a', 'para', 'vaga',
+          'de', 'com', 'empresa', 'time', 'growth', 'startup', 'benefits', 'hybrid', 'são', 'paulo']
+
+
+def synthetic_listings(count, seed=42):
+    """
+    Returns:
+        list: (text, set of the profile tokens really mentioned) pairs
+    """
+    rng = random.Random(seed)
+    listings = []
+    for _ in range(count):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(15, 30))]
+        mentioned = set()
+        for _ in range(rng.choice([0, 1, 1, 2, 2, 3, 4])):
+            text, tokens = rng.choice(MENTIONS)
+            words.insert(rng.randrange(len(words) + 1), text)
+            mentioned.update(tokens)
+        for _ in range(rng.choice([0, 0, 1, 2])):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(DECOYS))
+        listings.append((' '.join(words), mentioned))
+    return listings
+
+
+def precision_recall(true_positives, found, relevant):
+    precision = true_positives / found if found else 1.0
+    recall = true_positives / relevant if relevant else 1.0
+    return precision, recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--listings', type=int, default=20000)
+    args = parser.parse_args()
+
+    index = ProfileIndex.build(profile_tokens_pt, profile_tokens_en, profile_token_weights)
+    matcher = TokenMatcher(profile_tokens_pt, profile_tokens_en)
+    # Concepts: tokens are compared through their index entry (produto/produtos, python PT/EN are one)
+    concept = {token: entry['key'] for entry in index.entries for token in entry['pt'] + entry['en']}
+    listings = synthetic_listings(args.listings)
+    texts = [text for text, _ in listings]
+
+    # 3. Throughput first, so the results below come from the timed runs
+    start = time.perf_counter()
+    legacy_results = [matcher.match(text) for text in texts]
+    legacy_time = time.perf_counter() - start
+    start = time.perf_counter()
+    index_results = [index.match(text) for text in texts]
+    index_time = time.perf_counter() - start
+
+    # 1. Concepts
+    print(f"{'matcher':>22} {'precision':>10} {'recall':>7}")
+    for name, results in (('substring (antes)', legacy_results), ('índice ponderado', index_results)):
+        true_positives = found = relevant = 0
+        for (_, mentioned), result in zip(listings, results):
+            expected = {concept[token] for token in mentioned}
+            matched = {concept[token] for token in result['pt'] + result['en']}
+            true_positives += len(expected & matched)
+            found += len(matched)
+            relevant += len(expected)
+        precision, recall = precision_recall(true_positives, found, relevant)
+        print(f"{name:>22} {precision:>10.1%} {recall:>7.1%}")
+
+    # 2. Filter. A listing is relevant when the weights of the concepts it really mentions add up
+    # to more than 1 (with the default weights, all 1.0: 2+ concepts), the policy profile_token_weights encodes
+    weight = {entry['key']: entry['weight'] for entry in index.entries}
+    relevant_listings = [sum(weight[key] for key in {concept[token] for token in mentioned}) > 1 for _, mentioned in listings]
+    filters = [
+        ('substring, > 1 token', [result['total'] > 1 for result in legacy_results]),
+        ('índice, > 1 conceito', [result['total'] > 1 for result in index_results]),
+        ('índice, score > 1', [result['score'] > 1 for result in index_results]),
+    ]
+    print(f"\n{'filtro':>22} {'precision':>10} {'recall':>7} {'triadas':>8} {'falsos positivos':>17}")
+    for name, kept in filters:
+        true_positives = sum(1 for keep, relevant in zip(kept, relevant_listings) if keep and relevant)
+        precision, recall = precision_recall(true_positives, sum(kept), sum(relevant_listings))
+        print(f"{name:>22} {precision:>10.1%} {recall:>7.1%} {sum(kept):>8} {sum(kept) - true_positives:>17}")
+    print(f"({sum(relevant_listings)} de {len(listings)} vagas relevantes)")
+
+    # 3. Throughput and build/load
+    print(f"\n{'matcher':>22} {'seconds':>8} {'listings/s':>11}")
+    print(f"{'substring (antes)':>22} {legacy_time:>8.2f} {len(texts) / legacy_time:>11,.0f}")
+    print(f"{'índice ponderado':>22} {index_time:>8.2f} {len(texts) / index_time:>11,.0f}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        load_index(profile_tokens_pt, profile_tokens_en, profile_token_weights, directory=directory)
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        cached = load_index(profile_tokens_pt, profile_tokens_en, profile_token_weights, directory=directory)
+        load_time = time.perf_counter() - start
+        assert cached.variants == index.variants and cached.entries == index.entries, 'Cached index must match the built one'
+    print(f"\nÍndice: {len(index.entries)} conceitos, {len(index.variants)} variantes; "
+          f"construído e gravado em {build_time * 1000:.1f} ms, lido do cache em {load_time * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
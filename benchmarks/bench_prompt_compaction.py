@@ -0,0 +1,111 @@
+"""
+bench_prompt_compaction.py
+
+Screening payload before and after compaction (see src/prompt_compaction.py), on synthetic
+listings shaped like the Google results of each ATS (tracking parameters, date prefixes,
+"Apply now"...):
+    1. Bytes and estimated tokens per listing, whole vs compacted, and compaction throughput.
+    2. A screening round trip through the local Dify stub: every link of the answer must map back
+       to a posting URL.
+    3. Budgeted runs: listings shortened and deferred at decreasing token budgets.
+
+Usage:
+    python benchmarks/bench_prompt_compaction.py [--listings 2000]
+"""
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from stub_servers import DifyStubHandler, running_server
+
+import job_search
+from job_listing import JobListing
+from prompt_compaction import PromptCompactor
+from screening_scheduler import estimate_tokens
+from settings import settings
+
+ATS_SHAPES = [
+    ('lever', '{company} - {role}', 'https://jobs.lever.co/{slug}/{uuid}?lever-source=LinkedIn&utm_source=google'),
+    ('greenhouse', 'Job Application for {role} at {company}', 'https://boards.greenhouse.io/{slug}/jobs/{number}?gh_src=google&t=1'),
+    ('ashby', '{role} - {company} - Ashby', 'https://jobs.ashbyhq.com/{slug}/{uuid}/application?utm_source=google'),
+    ('workable', '{role} - {company}', 'https://apply.workable.com/{slug}/j/{short}/?utm_medium=google_jobs'),
+    ('teamtailor', '{role} - {company} - Teamtailor', 'https://{slug}.teamtailor.com/jobs/{number}-{slug}-role?promotion=google'),
+]
+ROLES = ['Business Operations Manager', 'Strategy & Operations Lead', 'Revenue Operations Analyst', 'Gerente de Operações']
+PREFIXES = ['3 days ago ... ', 'Jun 2, 2025 ... ', 'há 5 dias ... ', '']
+BODIES = [
+    'We are looking for a {role} to own planning, reporting and process improvement across LATAM teams. '
+    'You will partner with Sales and Finance on forecasting, SQL dashboards and OKRs.',
+    'Buscamos {role} para liderar projetos de estratégia, operações e produto, com foco em dados (SQL, Python) '
+    'e melhoria contínua dos processos comerciais.',
+]
+SUFFIXES = [' Remote - LATAM. Apply now.', ' Apply for this job.', ' ... Powered by Lever', '']
+
+
+def synthetic_listings(count, seed=7):
+    rng = random.Random(seed)
+    listings = []
+    for index in range(count):
+        source, title, url = ATS_SHAPES[index % len(ATS_SHAPES)]
+        company, role = f'Empresa{index % 97}', rng.choice(ROLES)
+        fields = {'company': company, 'role': role, 'slug': company.lower(), 'number': 4000000 + index,
+                  'uuid': f'{rng.getrandbits(128):032x}', 'short': f'{rng.getrandbits(40):010X}'}
+        snippet = rng.choice(PREFIXES) + rng.choice(BODIES).format(role=role) + rng.choice(SUFFIXES)
+        listing = JobListing(title.format(**fields), url.format(**fields), snippet, source)
+        listing.total_matches = rng.randint(2, 12)
+        listings.append(listing)
+    return listings
+
+
+def payload(lines):
+    # Counted like the compactor does: each line plus the newline joining it
+    return sum(len(line.encode('utf-8')) + 1 for line in lines), sum(estimate_tokens(line) + 1 for line in lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--listings', type=int, default=2000)
+    args = parser.parse_args()
+    listings = synthetic_listings(args.listings)
+
+    # 1. Savings and throughput
+    whole_bytes, whole_tokens = payload([listing.screening_text() for listing in listings])
+    start = time.perf_counter()
+    compactor = PromptCompactor(budget=float('inf'))
+    lines = compactor.fit(listings)
+    seconds = time.perf_counter() - start
+    compact_bytes, compact_tokens = payload(lines)
+    print(f"{'payload':>10} {'bytes':>10} {'~tokens':>9} {'tokens/listing':>15}")
+    print(f"{'whole':>10} {whole_bytes:>10} {whole_tokens:>9} {whole_tokens / len(listings):>15.1f}")
+    print(f"{'compacted':>10} {compact_bytes:>10} {compact_tokens:>9} {compact_tokens / len(listings):>15.1f}")
+    print(f"Economia: {1 - compact_bytes / whole_bytes:.0%} dos bytes, {1 - compact_tokens / whole_tokens:.0%} dos tokens "
+          f"({len(listings) / seconds:,.0f} vagas/s compactadas)")
+    print(f"Exemplo:\n  {listings[0].screening_text()}\n  {lines[0]}")
+
+    # 2. Round trip through the Dify stub: IDs in the prompt, URLs back in the jobs
+    with running_server(DifyStubHandler) as dify_url:
+        settings.DIFY_AGENT_URL = dify_url
+        job_search.DIFY_RATE_LIMITER = job_search.TokenBucket(1000)
+        sample = listings[:200]
+        compactor = PromptCompactor(budget=float('inf'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            jobs = job_search.screen_listings(sample, compactor=compactor)
+        urls = {listing.url for listing in sample}
+        lost = [job['link'] for job in jobs if job['link'] not in urls]
+        print(f"\nIda e volta: {len(jobs)}/{len(sample)} vagas triadas, {compactor.stats['restored']} IDs mapeados de volta, "
+              f"{len(lost)} links desconhecidos")
+
+    # 3. Budgets
+    print(f"\n{'budget':>10} {'sent':>6} {'shortened':>10} {'deferred':>9} {'~tokens':>8}")
+    for fraction in (1.0, 0.9, 0.75, 0.5, 0.25):
+        budget = int(compact_tokens * fraction)
+        compactor = PromptCompactor(budget=budget)
+        lines = compactor.fit(listings)
+        stats = compactor.report()
+        print(f"{budget:>10} {len(lines):>6} {stats['truncated']:>10} {stats['deferred']:>9} {stats['tokens_after']:>8}")
+
+
+if __name__ == '__main__':
+    main()
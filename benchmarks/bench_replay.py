@@ -0,0 +1,168 @@
+"""
+bench_replay.py
+
+End-to-end benchmark suite on recorded cassettes (see src/cassette.py), runnable without network.
+
+For every scale (1x = 12 ATS queries of 30 results, 360 listings; 10x and 100x multiply the
+queries), a run against the local Google, Dify and Trello stubs is recorded once into a
+cassette, then replayed offline with the stubs shut down. The replayed run is timed end to end
+and per stage (from the instrumentation report), so a performance regression in the pipeline
+itself (filtering, parsing, dedupe, scheduling...) shows without network noise.
+
+    python benchmarks/bench_replay.py --save baseline.json
+    python benchmarks/bench_replay.py --baseline baseline.json     # exits 1 on a regression
+
+Usage:
+    python benchmarks/bench_replay.py [--scales 1 10 100] [--mode staged|streaming] [--cassettes DIR]
+                                      [--save PATH] [--baseline PATH] [--tolerance 0.25]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from stub_servers import SERVERS, DifyStubHandler, GoogleStubHandler, TrelloStubHandler, running_server
+
+import http_client
+import instrumentation
+import job_search
+import prompt_compaction
+import trello_integration
+from settings import settings
+from cassette import Cassette
+
+BASE_QUERIES = 12
+RESULTS_PER_QUERY = 30
+STAGES = ['search_google', 'filter_job_listings', 'collapse_near_duplicates', 'screen_listings',
+          'stream_dify_agent', 'extract_json_blocks', 'trello_sync_job']
+
+
+def synthetic_queries(scale):
+    return {f'ats{index}': f'site:ats{index}.example.com remote business latam after:' for index in range(BASE_QUERIES * scale)}
+
+
+def run_main(entry_point, queries, state_dir, report_path):
+    job_search.load_queries = lambda path: queries
+    instrumentation.REPORT_PATH = report_path
+    instrumentation.METRICS.reset()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        entry_point(refresh=True, state_dir=state_dir)
+    seconds = time.perf_counter() - start
+    with open(report_path, encoding='utf-8') as f:
+        return seconds, json.load(f)
+
+
+def record(entry_point, queries, directory):
+    """Record a run against the local stubs, from an empty state."""
+    with running_server(GoogleStubHandler, total_results=RESULTS_PER_QUERY) as google_url, \
+            running_server(DifyStubHandler) as dify_url, \
+            running_server(TrelloStubHandler) as trello_url:
+        job_search.GOOGLE_SEARCH_URL = google_url
+        settings.DIFY_AGENT_URL = dify_url
+        trello_integration.TRELLO_API_URL = trello_url
+
+        cassette = Cassette(directory, 'record')
+        state_dir = tempfile.mkdtemp()
+        cassette.save_state([])
+        http_client.use_cassette(cassette)
+        try:
+            run_main(entry_point, queries, state_dir, os.path.join(state_dir, 'run_report.json'))
+        finally:
+            http_client.use_cassette(None)
+        cards = len(SERVERS[trello_url].cards)
+    return cassette.stats['recorded'], cards
+
+
+def replay(entry_point, queries, directory):
+    # Cassettes match requests on their path, not their host: any stub address replays (nothing listens there)
+    job_search.GOOGLE_SEARCH_URL = settings.DIFY_AGENT_URL = trello_integration.TRELLO_API_URL = 'http://127.0.0.1:9'
+    cassette = Cassette(directory, 'replay')
+    state_dir = cassette.restore_state()
+    http_client.use_cassette(cassette)
+    try:
+        seconds, report = run_main(entry_point, queries, state_dir, os.path.join(state_dir, 'run_report.json'))
+    finally:
+        http_client.use_cassette(None)
+    return seconds, report, cassette.stats
+
+
+###***********************************************************************************************************************###
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--mode', choices=['staged', 'streaming'], default='staged')
+    parser.add_argument('--cassettes', default=None, help='Keep the cassettes here (recorded only when missing)')
+    parser.add_argument('--save', default=None, help='Write the results as a baseline')
+    parser.add_argument('--baseline', default=None, help='Compare with a saved baseline, exit 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Slowdown tolerated against the baseline')
+    args = parser.parse_args()
+
+    entry_point = job_search.main if args.mode == 'staged' else job_search.main_streaming
+    cassettes = args.cassettes or tempfile.mkdtemp()
+    # Stubs and replays have no quota: rate limits off, a budget for every page and every listing
+    job_search.SEARCH_RATE_PER_SECOND = 10 ** 6
+    job_search.DIFY_RATE_LIMITER = job_search.TokenBucket(10 ** 6)
+    job_search.SEARCH_DAILY_BUDGET = 10 ** 6
+    prompt_compaction.SCREENING_TOKEN_BUDGET = float('inf')
+    trello_integration.TRELLO_RATE_PER_SECOND = 10 ** 6
+
+    workdir = tempfile.mkdtemp()
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)  # main() writes its JSON outputs under ./output
+    os.makedirs('output', exist_ok=True)
+
+    results = {}
+    try:
+        print(f"{'scale':>6} {'listings':>9} {'exchanges':>10} {'replay (s)':>11} {'listings/s':>11} {'missed':>7}  slowest stages")
+        for scale in args.scales:
+            queries = synthetic_queries(scale)
+            directory = os.path.join(cassettes, f'{args.mode}-{scale}x')
+            if not os.path.isdir(directory):
+                record(entry_point, queries, directory)
+
+            seconds, report, stats = replay(entry_point, queries, directory)
+            stages = {name: values.get('seconds', {}).get('sum', 0.0) for name, values in report['stages'].items()}
+            listings = report['stages'].get('filter_job_listings', {}).get('items_in', 0)
+            results[f'{scale}x'] = {'seconds': seconds, 'listings': listings, 'stages': stages}
+
+            slowest = ', '.join(f"{name} {stages[name]:.2f}s" for name in sorted(stages, key=stages.get, reverse=True)[:3])
+            print(f"{scale:>5}x {listings:>9} {stats['replayed']:>10} {seconds:>11.2f} {listings / seconds:>11.0f} {stats['missed']:>7}  {slowest}")
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        if args.cassettes is None:
+            shutil.rmtree(cassettes, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = []
+        for scale, result in results.items():
+            if scale not in baseline:
+                continue
+            checks = [('total', result['seconds'], baseline[scale]['seconds'])]
+            checks += [(stage, result['stages'].get(stage, 0.0), baseline[scale]['stages'].get(stage, 0.0)) for stage in STAGES]
+            for name, current, previous in checks:
+                # Stages under 50 ms are noise
+                if previous >= 0.05 and current > previous * (1 + args.tolerance):
+                    regressions.append(f"{scale} {name}: {previous:.2f}s -> {current:.2f}s")
+        for regression in regressions:
+            print(f"REGRESSÃO {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"Sem regressões (tolerância {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+bench_rescreen.py
+
+Bulk re-screening (src/rescreen.py) of a synthetic archive of past runs, one directory per day
+holding job_results.json (raw listings), ai_screening.json (screened jobs, some days as the agent's
+```json answer) and job_analysis.json (seeker answers with escapes, trailing commas and a truncated
+final block to repair), for 1, 2, 4... worker processes up to the number of cores:
+    1. Time, files/s and speedup over one process, the speedup Amdahl's law expects from the
+       serial part (merge and write, in the parent), and a plain loop in this process (what running
+       the stages file by file costs, without the pool).
+    2. The merged results must be the same as the loop's, whatever the number of workers.
+
+Usage:
+    python benchmarks/bench_rescreen.py [--days 60] [--listings 1500] [--workers 1 2 4]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+import stub_servers  # noqa: F401 (sets up sys.path)
+import rescreen
+
+ROLES = ['Business Operations Manager', 'Strategy & Operations Lead', 'Revenue Operations Analyst',
+         'Gerente de Operações', 'Analista de Dados', 'Product Manager', 'Coordenador de Crédito']
+WORDS = ['remote', 'latam', 'estratégia', 'operações', 'produto', 'python', 'sql', 'stakeholders', 'crédito',
+         'fintech', 'team', 'growth', 'vaga', 'empresa', 'hybrid', 'benefits', 'análise', 'dados', 'roadmap']
+
+
+def write_archive(directory, days, listings_per_day, seed=11):
+    rng = random.Random(seed)
+    for day in range(days):
+        path = os.path.join(directory, f'2025-{day // 28 + 1:02d}-{day % 28 + 1:02d}')
+        os.makedirs(path)
+        listings, jobs, analyses = [], [], []
+        for index in range(listings_per_day):
+            # A third of each day's postings were already found the day before
+            number = day * listings_per_day * 2 // 3 + index
+            url = f'https://jobs.example.com/{number % 97}/{number}'
+            snippet = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 40)))
+            listings.append({'Title': f'{rng.choice(ROLES)} - Empresa{number % 501}', 'URL': url, 'Snippet': snippet, 'Source': f'ats{number % 12}'})
+            if index % 3 == 0:
+                jobs.append({'title': listings[-1]['Title'], 'fit_score': rng.randint(40, 95), 'snippet': snippet[:120], 'link': url})
+                analyses.append({'EMPRESA': f'Empresa{number % 501}', 'CLASSIFICAÇÃO': 'ALTA', 'RECOMENDAÇÃO': 'CANDIDATAR-SE',
+                                 'ANÁLISE': 'Boa aderência\\u00a0ao perfil \\u2013 liderança\\n de operações.', 'URL': url})
+
+        with open(os.path.join(path, 'job_results.json'), 'w', encoding='utf-8') as f:
+            json.dump(listings, f, indent=2)
+        with open(os.path.join(path, 'ai_screening.json'), 'w', encoding='utf-8') as f:
+            # Older runs saved the agent answer as is
+            json.dump('```json\n' + json.dumps(jobs) + '\n```' if day % 4 == 0 else jobs, f, indent=2)
+        # Seeker answers: one block per chunk, a trailing comma in one, the last one cut short
+        blocks = [json.dumps(analyses[start:start + 20], ensure_ascii=False) for start in range(0, len(analyses), 20)]
+        blocks[0] = blocks[0][:-1] + ',]'
+        answer = ''.join(f'Análise:\n```json\n{block}\n```\n' for block in blocks[:-1]) + f'```json\n{blocks[-1][:-40]}'
+        with open(os.path.join(path, 'job_analysis.json'), 'w', encoding='utf-8') as f:
+            json.dump(answer, f, ensure_ascii=False)
+
+
+def merged_outputs(directory):
+    return {name: open(os.path.join(directory, name), encoding='utf-8').read()
+            for name in ('job_results_filtered.json', 'ai_screening.json', 'job_analysis.json')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--listings', type=int, default=1500, help='Listings per archived run')
+    parser.add_argument('--workers', type=int, nargs='+', default=None, help='Default: 1, 2, 4... up to the number of cores')
+    args = parser.parse_args()
+    cores = os.cpu_count() or 1
+    workers = args.workers or sorted({1, *[2 ** power for power in range(1, 8) if 2 ** power <= cores], cores})
+
+    with tempfile.TemporaryDirectory() as directory:
+        archive = os.path.join(directory, 'archive')
+        write_archive(archive, args.days, args.listings)
+        files = sum(1 for _ in rescreen.iter_archives([archive]))
+        print(f"{files} arquivos de {args.days} execuções ({args.listings} vagas cada), {cores} núcleos")
+
+        # A plain loop in this process: one file after the other, no pool, same merge
+        start = time.perf_counter()
+        rescreen._init_worker(None)
+        merge = rescreen.RescreenMerge([profile.name for profile in rescreen._profiles])
+        serial_seconds = 0.0  # Merge and write: what stays in the parent process, whatever the workers
+        with contextlib.redirect_stdout(io.StringIO()):
+            for position, path in enumerate(rescreen.iter_archives([archive])):
+                result = rescreen.rescreen_file(path)
+                merge_start = time.perf_counter()
+                merge.add(position, result)
+                serial_seconds += time.perf_counter() - merge_start
+            merge_start = time.perf_counter()
+            merge.write(os.path.join(directory, 'rescreen-loop'))
+            serial_seconds += time.perf_counter() - merge_start
+        loop_seconds = time.perf_counter() - start
+        serial = serial_seconds / loop_seconds
+
+        print(f"\n{'workers':>8} {'seconds':>8} {'files/s':>8} {'speedup':>8} {'efficiency':>11} {'expected (Amdahl)':>18}")
+        print(f"{'loop':>8} {loop_seconds:>8.2f} {files / loop_seconds:>8.1f} {'':>8} {'':>11} {'':>18}")
+        baseline, reference = None, merged_outputs(os.path.join(directory, 'rescreen-loop'))
+        for count in workers:
+            output = os.path.join(directory, f'rescreen-{count}')
+            with contextlib.redirect_stdout(io.StringIO()):
+                summary = rescreen.rescreen_archives([archive], output_dir=output, workers=count)
+            seconds = summary['seconds']
+            baseline = baseline or seconds
+            speedup = baseline / seconds
+            # Speedup on `count` free cores, the serial part (merge and write) staying on one
+            expected = 1 / (serial + (1 - serial) / count)
+            print(f"{count:>8} {seconds:>8.2f} {files / seconds:>8.1f} {speedup:>7.2f}x {speedup / count:>10.0%} {expected:>17.2f}x")
+
+            assert merged_outputs(output) == reference, f'Merged results with {count} workers differ from the plain loop'
+
+        print(f"\n{summary['screened']} vagas triadas e {summary['analyses']} análises após a fusão, "
+              f"{sum(summary['filtered'].values())} vagas mantidas pelo filtro; resultados iguais aos do laço simples com qualquer número de processos")
+        print(f"Parte serial (fusão e gravação no processo principal): {serial:.1%} do laço simples")
+        if cores < max(workers):
+            print(f"(Mais processos que núcleos: acima de {cores} o ganho não é medido aqui, só o esperado)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+bench_run_archive.py
+
+Fills a run archive with a year of synthetic daily runs, then times the history queries
+("postings per ATS per day", "CANDIDATAR-SE rate by source") and reports the file size.
+
+Usage:
+    python benchmarks/bench_run_archive.py [--days 365] [--listings-per-run 500]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import stub_servers  # noqa: F401 (sets up sys.path)
+from job_listing import JobListing
+from run_archive import ATS_HOSTS, RunArchive
+
+RECOMMENDATIONS = ['CANDIDATAR-SE', 'INVESTIGAR MAIS', 'DESCARTAR']
+
+
+def synthetic_run(rng, day_index, listings_per_run):
+    listings = []
+    for index in range(listings_per_run):
+        host = rng.choice(list(ATS_HOSTS))
+        # Postings stay online a few weeks: part of every run was already found before
+        posting = rng.randint(max(0, day_index - 20) * 50, (day_index + 1) * 50)
+        listings.append(JobListing(
+            f'Business Operations Manager {posting}',
+            f'https://jobs.{host}/company{posting % 300}/{posting}',
+            'Remote LATAM. Estratégia, operações e produto. Python, SQL, dashboards e OKRs para o time de negócios. Inglês fluente.',
+            matches_pt=['estratégia'], matches_en=['operations'], total_matches=rng.randint(0, 6),
+        ))
+    return listings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--listings-per-run', type=int, default=500)
+    args = parser.parse_args()
+    rng = random.Random(13)
+
+    path = os.path.join(tempfile.mkdtemp(), 'run_archive.sqlite')
+    archive = RunArchive(path)
+    first_day = time.time() - args.days * 86400
+
+    start = time.perf_counter()
+    for day_index in range(args.days):
+        run_id = archive.start_run(started_at=first_day + day_index * 86400)
+        listings = synthetic_run(rng, day_index, args.listings_per_run)
+        archive.record_listings(run_id, listings)
+        screened = [listing for listing in listings if listing.total_matches > 1]
+        archive.record_screening(run_id, [{'link': listing.url, 'fit_score': rng.randint(0, 100)} for listing in screened])
+        archive.record_analyses(run_id, [{'URL': listing.url, 'CLASSIFICAÇÃO': 'ALTA', 'RECOMENDAÇÃO': rng.choice(RECOMMENDATIONS), 'ANÁLISE': '...'}
+                                         for listing in screened[:len(screened) // 2]])
+    fill_seconds = time.perf_counter() - start
+    rows = archive.query("SELECT COUNT(*) FROM postings")[0][0]
+    print(f"{args.days} execuções, {rows} linhas gravadas em {fill_seconds:.1f}s ({os.path.getsize(path) / 2 ** 20:.1f} MB)")
+
+    for name, query in (
+        ('postings per ATS per day', archive.postings_per_source_per_day),
+        ('CANDIDATAR-SE rate by source', archive.recommendation_rate_by_source),
+    ):
+        start = time.perf_counter()
+        result = query()
+        print(f"{name:<30} {time.perf_counter() - start:>7.3f}s  ({len(result)} linhas)")
+    archive.close()
+
+
+if __name__ == '__main__':
+    main()
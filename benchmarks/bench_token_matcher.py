@@ -0,0 +1,94 @@
+"""
+bench_token_matcher.py
+
+Compares the compiled TokenMatcher with the previous per-token substring scan, on synthetic
+snippets and profile vocabularies of growing size. Also checks both return the same matches.
+
+Usage:
+    python benchmarks/bench_token_matcher.py [--snippets 10000 100000 1000000] [--vocabularies 50 500 5000]
+"""
+import argparse
+import random
+import time
+
+import stub_servers  # noqa: F401 (sets up sys.path)
+from lib.profile_tokens import profile_tokens_pt, profile_tokens_en
+from token_matcher import TokenMatcher
+
+LEGACY_SAMPLE = 2000  # The old matcher is timed on a sample and extrapolated, a full 1M x 5000 run takes hours
+
+
+def legacy_analyze_text_for_tokens(text, tokens_pt, tokens_en):
+    text_lower = text.lower()
+    matches = {'pt': [], 'en': [], 'total': 0}
+    for token in tokens_pt:
+        if token.lower() in text_lower:
+            matches['pt'].append(token)
+            matches['total'] += 1
+    for token in tokens_en:
+        if token.lower() in text_lower:
+            matches['en'].append(token)
+            matches['total'] += 1
+    return matches
+
+
+def synthetic_vocabulary(size, rng):
+    """Real profile tokens first, then made-up words and bigrams until `size` is reached."""
+    base = list(profile_tokens_pt) + list(profile_tokens_en)
+    vocabulary = base[:size]
+    syllables = ['ana', 'lis', 'ta', 'pro', 'du', 'to', 'ges', 'tão', 'ope', 'ra', 'ções', 'da', 'dos', 'mar', 'ke', 'ting']
+    while len(vocabulary) < size:
+        word = ''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.3:
+            word += ' ' + ''.join(rng.choice(syllables) for _ in range(2))
+        vocabulary.append(word)
+    half = size // 2
+    return vocabulary[:half], vocabulary[half:]
+
+
+def synthetic_snippets(count, vocabulary, rng):
+    filler = ['remote', 'latam', 'apply', 'now', 'the', 'team', 'we', 'are', 'hiring', 'a', 'para', 'vaga', 'de', 'com']
+    snippets = []
+    for _ in range(count):
+        words = [rng.choice(filler) for _ in range(rng.randint(15, 30))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words)), rng.choice(vocabulary).upper() if rng.random() < 0.2 else rng.choice(vocabulary))
+        snippets.append(' '.join(words))
+    return snippets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--snippets', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--vocabularies', type=int, nargs='+', default=[50, 500, 5000])
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'tokens':>7} {'snippets':>9} {'legacy (s)':>11} {'compiled (s)':>13} {'build (ms)':>11} {'speedup':>8}")
+
+    for vocabulary_size in args.vocabularies:
+        tokens_pt, tokens_en = synthetic_vocabulary(vocabulary_size, rng)
+
+        start = time.perf_counter()
+        matcher = TokenMatcher(tokens_pt, tokens_en)
+        build_time = time.perf_counter() - start
+
+        for snippet_count in args.snippets:
+            snippets = synthetic_snippets(snippet_count, tokens_pt + tokens_en, rng)
+
+            start = time.perf_counter()
+            compiled_results = [matcher.match(snippet) for snippet in snippets]
+            compiled_time = time.perf_counter() - start
+
+            sample = snippets[:LEGACY_SAMPLE]
+            start = time.perf_counter()
+            legacy_results = [legacy_analyze_text_for_tokens(snippet, tokens_pt, tokens_en) for snippet in sample]
+            legacy_time = (time.perf_counter() - start) * len(snippets) / len(sample)
+
+            assert legacy_results == compiled_results[:len(sample)], 'Compiled matcher must return the legacy matches'
+            print(f"{vocabulary_size:>7} {snippet_count:>9} {legacy_time:>11.2f} {compiled_time:>13.2f} "
+                  f"{build_time * 1000:>11.1f} {legacy_time / compiled_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
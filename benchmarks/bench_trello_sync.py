@@ -0,0 +1,112 @@
+"""
+bench_trello_sync.py
+
+Runs the Trello card creation against the local fake Trello server:
+    1. The previous serial loop (one card POST per job, no lookup) vs TrelloSync, on an empty board.
+    2. TrelloSync again on the same jobs (every card skipped, none duplicated), then with some
+       analyses changed (only those cards updated).
+    3. TrelloSync against a server enforcing a per-token rate limit (429 + Retry-After).
+
+Usage:
+    python benchmarks/bench_trello_sync.py [--jobs 200] [--latency 0.05] [--workers 4]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from stub_servers import SERVERS, TrelloStubHandler, running_server
+
+import http_client
+import trello_integration
+from settings import settings
+from trello_integration import TrelloSync, card_fields
+
+
+def synthetic_jobs(count, revision=0):
+    return [{
+        'EMPRESA': f'Empresa {index}',
+        'CLASSIFICAÇÃO': 'ALTA',
+        'ANÁLISE': f'Vaga remota de operações (revisão {revision}).',
+        'RECOMENDAÇÃO': 'CANDIDATAR-SE' if index % 3 == 0 else 'INVESTIGAR MAIS',
+        'URL': f'https://jobs.lever.co/empresa{index}/{index:08x}',
+    } for index in range(count)]
+
+
+def legacy_create(jobs):
+    # The loop TrelloSync replaced: one blind POST per job, so a rerun duplicates every card
+    created = []
+    for job in jobs:
+        response = http_client.post(f"{trello_integration.TRELLO_API_URL}/cards", json={
+            'idList': settings.TRELLO_LIST_ID,
+            'key': settings.TRELLO_API_KEY,
+            'token': settings.TRELLO_TOKEN,
+            'pos': 'top',
+            **card_fields(job),
+        })
+        if response.ok:
+            created.append(response.json())
+    return created
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run_sync(jobs, workers, rate):
+    trello_sync = TrelloSync(max_concurrency=workers, rate_per_second=rate)
+    trello_sync.sync(jobs)
+    return trello_sync.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05, help='Fake Trello latency, in seconds')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    jobs = synthetic_jobs(args.jobs)
+
+    print(f"{'run':>28} {'seconds':>8} {'cards':>6} {'created':>8} {'updated':>8} {'skipped':>8} {'429':>5}")
+
+    def report(name, seconds, server, counts=None):
+        counts = counts or {}
+        print(f"{name:>28} {seconds:>8.2f} {len(server.cards):>6} {counts.get('created', '-'):>8} "
+              f"{counts.get('updated', '-'):>8} {counts.get('skipped', '-'):>8} {getattr(server, 'throttled', 0):>5}")
+
+    with running_server(TrelloStubHandler, latency=args.latency) as trello_url:
+        trello_integration.TRELLO_API_URL = trello_url
+        server = SERVERS[trello_url]
+
+        created, seconds = timed(legacy_create, jobs)
+        report('legacy serial', seconds, server)
+        _, seconds = timed(legacy_create, jobs)
+        report('legacy serial, rerun', seconds, server)
+
+        server.cards.clear()
+        counts, seconds = timed(run_sync, jobs, args.workers, 1000)
+        report(f'TrelloSync x{args.workers}', seconds, server, counts)
+        counts, seconds = timed(run_sync, jobs, args.workers, 1000)
+        report(f'TrelloSync x{args.workers}, rerun', seconds, server, counts)
+        changed = [job if index % 10 else synthetic_jobs(args.jobs, revision=1)[index] for index, job in enumerate(jobs)]
+        counts, seconds = timed(run_sync, changed, args.workers, 1000)
+        report(f'TrelloSync x{args.workers}, 10% changed', seconds, server, counts)
+
+    # Trello allows 100 calls per 10 s per token: scaled down to 20 calls per second here. A 9/s bucket
+    # (bursting 9 calls) stays under it, like the default 8/s one does under the real limit
+    with running_server(TrelloStubHandler, latency=args.latency, rate_limit=(20, 1)) as trello_url:
+        trello_integration.TRELLO_API_URL = trello_url
+        server = SERVERS[trello_url]
+        counts, seconds = timed(run_sync, jobs, args.workers, 1000)
+        report('rate limited, no bucket', seconds, server, counts)
+        server.cards.clear()
+        server.throttled = 0
+        counts, seconds = timed(run_sync, jobs, args.workers, 9)
+        report('rate limited, 9/s bucket', seconds, server, counts)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""
+stub_servers.py
+
+Local HTTP stubs used by the benchmarks, so they never hit (or pay for) the real APIs.
+
+Usage:
+    with running_server(GoogleStubHandler, latency=0.05) as base_url:
+        ...
+"""
+import json
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Add the project root and src/ to Python path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+
+# Dummy secrets, so runs against the stubs pass the credential check (see src/settings.py)
+DUMMY_ENV = [
+    'GOOGLE_API_KEY', 'SEARCH_ENGINE_ID', 'DIFY_API_KEY', 'DIFY_API_KEY_SEEKER', 'DIFY_AGENT_URL', 'DIFY_USER',
+    'TRELLO_API_KEY', 'TRELLO_TOKEN', 'TRELLO_BOARD_ID', 'TRELLO_LIST_ID',
+]
+for name in DUMMY_ENV:
+    os.environ.setdefault(name, f'bench-{name.lower()}')
+
+
+###***********************************************************************************************************************###
+class StubHandler(BaseHTTPRequestHandler):
+    """Base handler: sleeps `server.latency` seconds per request and replies with JSON."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def delay(self):
+        latency = getattr(self.server, 'latency', 0)
+        if latency:
+            threading.Event().wait(latency)
+
+
+###***********************************************************************************************************************###
+class GoogleStubHandler(StubHandler):
+    """
+    Fake Google Custom Search endpoint.
+    Every query reports `server.total_results` results and serves them 10 per page.
+    """
+
+    def do_GET(self):
+        self.delay()
+        params = parse_qs(urlparse(self.path).query)
+        query = params.get('q', [''])[0]
+        start = int(params.get('start', ['1'])[0])
+        num = int(params.get('num', ['10'])[0])
+        total = getattr(self.server, 'total_results', 30)
+
+        items = []
+        for position in range(start, min(start + num, total + 1)):
+            items.append({
+                'title': f'Business Operations Manager {position} - {query[:20]}',
+                'link': f'https://jobs.example.com/{abs(hash(query)) % 10000}/{position}',
+                'snippet': f'Remote LATAM. Estratégia, operações e produto. Python, SQL. Posting {position}.',
+            })
+
+        self.send_json({'searchInformation': {'totalResults': str(total)}, 'items': items})
+
+
+###***********************************************************************************************************************###
+class DifyStubHandler(StubHandler):
+    """
+    Fake Dify chat endpoint.
+    Blocking calls (screening agent) score every "Title: ... §URL: ... §" listing of the prompt.
+    Streaming calls (seeker agent) answer, as SSE events, one analysis per "Link: ..." line of the prompt.
+    """
+
+    def do_POST(self):
+        self.delay()
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        query = body.get('query') or ''
+
+        if body.get('response_mode') == 'streaming':
+            links = [line[len('Link: '):] for line in query.split('\n') if line.startswith('Link: ')]
+            jobs = [{
+                'EMPRESA': f'Empresa {index}',
+                'CLASSIFICAÇÃO': 'ALTA',
+                'ANÁLISE': 'Boa aderência ao perfil.',
+                'RECOMENDAÇÃO': 'CANDIDATAR-SE' if index % 2 == 0 else 'INVESTIGAR MAIS',
+                'URL': link,
+            } for index, link in enumerate(links)]
+            self.send_sse('```json\n' + json.dumps(jobs, ensure_ascii=False) + '\n```')
+            return
+
+        jobs = []
+        for line in query.split('\n'):
+            line = line.strip()
+            if line.startswith('Title: ') and ' §URL: ' in line:
+                title, rest = line[len('Title: '):].split(' §URL: ', 1)
+                url, rest = rest.split(' §Snippet: ', 1)
+                jobs.append({'title': title, 'fit_score': 80, 'snippet': rest.split(' §')[0], 'link': url})
+        self.send_json({'answer': '```json\n' + json.dumps(jobs, ensure_ascii=False) + '\n```'})
+
+    def send_sse(self, answer, chunk_size=64):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        events = [{'event': 'agent_message', 'answer': answer[index:index + chunk_size]} for index in range(0, len(answer), chunk_size)]
+        events.append({'event': 'workflow_finished'})
+        for event in events:
+            data = f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+###***********************************************************************************************************************###
+class TrelloStubHandler(StubHandler):
+    """
+    Fake Trello API, cards kept in `server.cards`:
+        POST /1/cards creates a card (its urlSource becomes an attachment)
+        PUT /1/cards/<id> updates one
+        GET /1/boards/<id>/cards lists them, with their attachments
+    With `server.rate_limit = (calls, seconds)`, calls over the limit get a 429 with Retry-After,
+    like the real per-token limit (`server.throttled` counts them).
+    With `server.list_boards = {list id: board id}`, a board lists only the cards of its lists.
+    """
+
+    def throttle(self):
+        rate_limit = getattr(self.server, 'rate_limit', None)
+        if rate_limit is None:
+            return False
+        calls, seconds = rate_limit
+        now = time.monotonic()
+        with self.server.lock:
+            window = self.server.calls
+            while window and window[0] <= now - seconds:
+                window.pop(0)
+            if len(window) >= calls:
+                self.server.throttled = getattr(self.server, 'throttled', 0) + 1
+                retry_after = window[0] + seconds - now
+            else:
+                window.append(now)
+                return False
+        self.send_json({'error': 'API_TOKEN_LIMIT_EXCEEDED'}, status=429, headers={'Retry-After': str(math.ceil(retry_after))})
+        return True
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        self.delay()
+        if self.throttle():
+            return
+        list_boards = getattr(self.server, 'list_boards', None)
+        board_id = urlparse(self.path).path.rstrip('/').split('/')[-2]
+        with self.server.lock:
+            cards = [
+                {'id': card['id'], 'name': card.get('name'), 'desc': card.get('desc'), 'idList': card.get('idList'),
+                 'closed': False, 'idLabels': [label for label in (card.get('idLabels') or '').split(',') if label],
+                 'attachments': [{'url': card['urlSource']}] if card.get('urlSource') else []}
+                for card in self.server.cards
+                if list_boards is None or list_boards.get(card.get('idList')) == board_id
+            ]
+        self.send_json(cards)
+
+    def do_POST(self):
+        self.delay()
+        card = self.read_body()
+        if self.throttle():
+            return
+        with self.server.lock:
+            card['id'] = f'card{len(self.server.cards) + 1}'
+            card['created_at'] = time.monotonic()
+            self.server.cards.append(card)
+        self.send_json({'id': card['id'], 'name': card.get('name')})
+
+    def do_PUT(self):
+        self.delay()
+        changes = self.read_body()
+        if self.throttle():
+            return
+        card_id = urlparse(self.path).path.rstrip('/').split('/')[-1]
+        with self.server.lock:
+            card = next((card for card in self.server.cards if card['id'] == card_id), None)
+            if card is not None:
+                card.update(changes)
+                self.server.updates = getattr(self.server, 'updates', 0) + 1
+        if card is None:
+            self.send_json({'error': 'not found'}, status=404)
+        else:
+            self.send_json({'id': card_id, 'name': card.get('name')})
+
+
+###***********************************************************************************************************************###
+SERVERS = {}  # Base URL -> running server, to inspect what a stub received (e.g. SERVERS[url].cards)
+
+
+@contextmanager
+def running_server(handler, **attributes):
+    """
+    Start `handler` on a free localhost port in a background thread.
+    Args:
+        handler (BaseHTTPRequestHandler): Request handler class
+        attributes: Values set on the server object (e.g. latency=0.05), read by the handler
+    Yields:
+        str: Base URL of the running server
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.cards = []
+    server.calls = []  # Call times inside the rate limit window (see TrelloStubHandler)
+    for key, value in attributes.items():
+        setattr(server, key, value)
+
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    SERVERS[base_url] = server
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield base_url
+    finally:
+        SERVERS.pop(base_url, None)
+        server.shutdown()
+        server.server_close()
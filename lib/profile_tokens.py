@@ -166,3 +166,8 @@ profile_tokens_en = [
     "product manager", # Added: Common job title
     "fintech", # Added: Relevant industry
 ]
+
+# Weight of each token in the relevance score of a listing (see src/profile_index.py). Tokens not listed weigh 1.0.
+# Empty by default, so a listing is kept when it matches at least two tokens, as before the index. A weight changes
+# which listings reach the LLM screening: set them here (or per profile, see src/profiles.py), e.g. {"operações": 1.5}.
+profile_token_weights = {}
@@ -0,0 +1,185 @@
+"""
+cassette.py
+
+Record/replay of every HTTP exchange of a run (Google, Dify and Trello), so downstream stages
+can be re-run, debugged and benchmarked without touching the APIs or their quotas.
+
+    python src/job_search.py --record cassettes/2025-06-01     # real run, every exchange saved
+    python src/job_search.py --replay cassettes/2025-06-01     # same run, offline
+
+Each exchange is a JSON file in the cassette directory, named after a hash of the request
+(method, URL and body without secrets, dates normalized so a cassette replays on any day) and
+its occurrence number, so identical requests replay in the order they were recorded. Streamed
+answers (Dify SSE) are stored whole and replayed chunk by chunk. The run state (output/*.sqlite
+caches and indexes) is snapshotted when recording and restored into a scratch directory when
+replaying, so the replayed run sends exactly the requests the recorded one did. A request
+missing from the cassette fails like a connection error (see CassetteMiss) and is counted.
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import Counter
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+SECRET_FIELDS = {'key', 'token', 'cx', 'user'}  # Query/body fields left out of the cassette (and of the request hash)
+DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')  # Google queries carry an 'after:' date
+STORED_HEADERS = ('Content-Type', 'Retry-After')
+STATE_DIR = 'state'
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """A replayed run sent a request that was not recorded (handled like the API being unreachable)."""
+
+
+###***********************************************************************************************************************###
+def _redact_url(url):
+    parts = urlsplit(url)
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True) if name not in SECRET_FIELDS]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+
+def _redact_body(body):
+    if not body:
+        return None
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', errors='replace')
+    try:
+        data = json.loads(body)
+    except json.JSONDecodeError:
+        return body
+    if isinstance(data, dict):
+        data = {name: value for name, value in data.items() if name not in SECRET_FIELDS}
+    return data
+
+
+def request_fingerprint(method, url, body):
+    """
+    Returns:
+        tuple: (hash, redacted request) of an exchange, the same on every day and for every API key
+    """
+    request = {'method': method.upper(), 'url': _redact_url(url), 'body': _redact_body(body)}
+    raw = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    # Hosts differ between a run against the real APIs and one against local stubs: only the path counts
+    keyed = DATE_RE.sub('DATE', raw.replace(urlsplit(url).netloc, ''))
+    return hashlib.sha256(keyed.encode('utf-8')).hexdigest()[:32], request
+
+
+###***********************************************************************************************************************###
+class Cassette:
+    """
+    Args:
+        directory (str): Where the exchanges are written (record) or read from (replay)
+        mode (str): 'record' or 'replay'
+    """
+
+    def __init__(self, directory, mode='replay'):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if mode == 'replay' and not os.path.isdir(directory):
+            raise FileNotFoundError(f"Cassette not found: {directory}")
+        self.directory = directory
+        self.mode = mode
+        self.stats = Counter()  # recorded, replayed, missed
+        self._occurrences = Counter()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _next_path(self, fingerprint):
+        with self._lock:
+            occurrence = self._occurrences[fingerprint]
+            self._occurrences[fingerprint] += 1
+        return os.path.join(self.directory, f"{fingerprint}-{occurrence}.json")
+
+    def record(self, response):
+        """Save an exchange made by the shared HTTP client (a streamed body is read whole, then replayed from memory)."""
+        prepared = response.request
+        fingerprint, request = request_fingerprint(prepared.method, prepared.url, prepared.body)
+        content = response.content
+        try:
+            body = {'text': content.decode('utf-8')}
+        except UnicodeDecodeError:
+            body = {'base64': base64.b64encode(content).decode('ascii')}
+
+        exchange = {
+            'request': request,
+            'response': {
+                'status': response.status_code,
+                'headers': {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+                **body,
+            },
+        }
+        with open(self._next_path(fingerprint), 'w', encoding='utf-8') as f:
+            json.dump(exchange, f, ensure_ascii=False)
+        with self._lock:
+            self.stats['recorded'] += 1
+        return response
+
+    def replay(self, method, url, **kwargs):
+        """
+        Returns:
+            requests.Response: The recorded answer to the same request
+        Raises:
+            CassetteMiss: When the request was not recorded
+        """
+        prepared = requests.Request(method, url, params=kwargs.get('params'), json=kwargs.get('json'),
+                                    data=kwargs.get('data'), headers=kwargs.get('headers')).prepare()
+        fingerprint, request = request_fingerprint(prepared.method, prepared.url, prepared.body)
+        path = self._next_path(fingerprint)
+        if not os.path.exists(path):
+            with self._lock:
+                self.stats['missed'] += 1
+            raise CassetteMiss(f"Request not in cassette {self.directory}: {request['method']} {request['url']}")
+
+        with open(path, encoding='utf-8') as f:
+            recorded = json.load(f)['response']
+
+        response = requests.Response()
+        response.status_code = recorded['status']
+        response.headers = CaseInsensitiveDict(recorded['headers'])
+        response._content = base64.b64decode(recorded['base64']) if 'base64' in recorded else recorded['text'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = prepared.url
+        response.request = prepared
+        response.elapsed = timedelta(0)
+        response._content_consumed = True  # Streamed consumers read the stored body (no raw socket)
+        with self._lock:
+            self.stats['replayed'] += 1
+        return response
+
+    ###*******************************************************************************************************************###
+    def save_state(self, paths):
+        """Snapshot the run state files (caches, indexes) before a recorded run starts."""
+        state_dir = os.path.join(self.directory, STATE_DIR)
+        os.makedirs(state_dir, exist_ok=True)
+        for path in paths:
+            if os.path.exists(path):
+                shutil.copy2(path, os.path.join(state_dir, os.path.basename(path)))
+
+    def restore_state(self):
+        """
+        Returns:
+            str: Scratch directory holding a copy of the recorded run state (the cassette is never modified)
+        """
+        scratch = tempfile.mkdtemp(prefix='job_seeker_replay_')
+        state_dir = os.path.join(self.directory, STATE_DIR)
+        if os.path.isdir(state_dir):
+            for name in os.listdir(state_dir):
+                shutil.copy2(os.path.join(state_dir, name), os.path.join(scratch, name))
+        return scratch
+
+    def print_stats(self):
+        if self.mode == 'record':
+            print(f"[cassette] {self.stats['recorded']} trocas HTTP gravadas em {self.directory}")
+        else:
+            print(f"[cassette] {self.stats['replayed']} trocas HTTP reproduzidas, {self.stats['missed']} ausentes da fita")
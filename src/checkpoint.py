@@ -0,0 +1,148 @@
+"""
+checkpoint.py
+
+Stage-level checkpoints of a run, so a run that fails halfway can be resumed (--resume) instead
+of starting over from the Google searches and spending the day's quota again.
+
+Every run gets a directory output/checkpoints/<run id>/ (the run id of the run archive) holding:
+    - pages/<ats>.json: the search pages of each ATS fetched so far, with the query state, written
+      after every page
+    - <stage>.json: the output of every completed stage (search, filtered, screening, analysis, trello)
+    - manifest.json: run id, start time, completed stages and status
+Every file is written atomically (temporary file, fsync, rename): a crash leaves either the
+previous version or the new one, never a truncated file. A resumed run skips the completed stages
+and the fetched pages, and picks up from the first stage that did not complete.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+CHECKPOINT_DIR = os.path.join(os.path.dirname(__file__), '../output/checkpoints')
+CHECKPOINT_MAX_AGE = 20 * 60 * 60  # Seconds. Older runs are not resumed: their queries carry yesterday's 'after:' date
+CHECKPOINT_KEEP = 7                # Finished runs kept for inspection
+STAGES = ('search', 'filtered', 'screening', 'analysis', 'trello')
+
+
+###***********************************************************************************************************************###
+def atomic_write_json(path, data):
+    """Write `data` as JSON to `path` so that readers (and crashes) never see a partial file."""
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def _read_json(path, default=None):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+class RunCheckpoint:
+    """
+    Args:
+        run_id (int): Run archive id of the run
+        directory (str): Parent directory of the run checkpoints
+    """
+
+    def __init__(self, run_id, directory=None):
+        self.run_id = run_id
+        self.root = directory or CHECKPOINT_DIR
+        self.directory = os.path.join(self.root, str(run_id))
+        self._lock = threading.Lock()
+        self.manifest = _read_json(self._path('manifest'), None) or {
+            'run_id': run_id, 'started_at': time.time(), 'stages': [], 'status': 'running',
+        }
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.json")
+
+    @classmethod
+    def create(cls, run_id, directory=None):
+        checkpoint = cls(run_id, directory)
+        os.makedirs(os.path.join(checkpoint.directory, 'pages'), exist_ok=True)
+        checkpoint._write_manifest()
+        return checkpoint
+
+    @classmethod
+    def latest(cls, directory=None, max_age=CHECKPOINT_MAX_AGE):
+        """
+        Returns:
+            RunCheckpoint: The most recent unfinished run started less than `max_age` seconds ago, or None
+        """
+        root = directory or CHECKPOINT_DIR
+        if not os.path.isdir(root):
+            return None
+        run_ids = sorted((int(name) for name in os.listdir(root) if name.isdigit()), reverse=True)
+        for run_id in run_ids:
+            manifest = _read_json(os.path.join(root, str(run_id), 'manifest.json'))
+            if not manifest:
+                continue
+            if manifest.get('status') == 'running' and time.time() - manifest.get('started_at', 0) < max_age:
+                return cls(run_id, root)
+            # Only the last run is worth resuming: an older unfinished one has been superseded
+            return None
+        return None
+
+    def _write_manifest(self):
+        with self._lock:
+            manifest = dict(self.manifest, stages=list(self.manifest['stages']))
+        atomic_write_json(self._path('manifest'), manifest)
+
+    ###*******************************************************************************************************************###
+    def done(self, stage):
+        return stage in self.manifest['stages']
+
+    def save(self, stage, data):
+        """Store the output of a completed stage, then mark it completed."""
+        atomic_write_json(self._path(stage), data)
+        with self._lock:
+            if stage not in self.manifest['stages']:
+                self.manifest['stages'].append(stage)
+        self._write_manifest()
+
+    def load(self, stage):
+        return _read_json(self._path(stage))
+
+    def save_page(self, source, query, page):
+        """
+            Store a fetched search page of an ATS with the query state that follows it (thread-safe:
+            the queries of different ATS are paginated concurrently, each ATS has its own file).
+        Args:
+            query (dict): Query state ('name', 'num_results', 'finished') after the page
+            page (list): Listings of the page, as dicts
+        """
+        path = os.path.join(self.directory, 'pages', f"{source}.json")
+        saved = _read_json(path, {'pages': []})
+        atomic_write_json(path, {'query': query, 'pages': saved['pages'] + [page]})
+
+    def load_pages(self, source):
+        """
+        Returns:
+            tuple: (query state after the last saved page or None, list of saved pages)
+        """
+        saved = _read_json(os.path.join(self.directory, 'pages', f"{source}.json"), {'query': None, 'pages': []})
+        return saved['query'], saved['pages']
+
+    def finish(self, keep=CHECKPOINT_KEEP):
+        """Mark the run finished (never resumed again) and prune the oldest finished runs."""
+        with self._lock:
+            self.manifest['status'] = 'finished'
+            self.manifest['finished_at'] = time.time()
+        self._write_manifest()
+
+        run_ids = sorted((int(name) for name in os.listdir(self.root) if name.isdigit()), reverse=True)
+        for run_id in run_ids[keep:]:
+            shutil.rmtree(os.path.join(self.root, str(run_id)), ignore_errors=True)
+
+    def print_status(self):
+        completed = ', '.join(self.manifest['stages']) or 'nenhum'
+        print(f"[checkpoint] Execução {self.run_id}: estágios concluídos: {completed}")
@@ -0,0 +1,70 @@
+"""
+concurrency.py
+
+Small helpers to fan out blocking HTTP work (Google, Dify, Trello) across threads
+while keeping results ordered and request rates under each API's limits.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+###***********************************************************************************************************************###
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Args:
+        rate (float): Tokens added per second (sustained requests per second)
+        capacity (int): Max tokens stored, i.e. how many requests may burst at once
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens=1):
+        """
+        Block until `tokens` are available, then consume them.
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+###***********************************************************************************************************************###
+def ordered_map(func, items, max_workers=4):
+    """
+    Run `func` over `items` with a bounded thread pool.
+    Args:
+        func (callable): Function applied to each item
+        items (iterable): Work items
+        max_workers (int): Global concurrency limit
+    Returns:
+        list: Results in the same order as `items`, whatever order they finished in
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(func, items))
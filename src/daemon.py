@@ -0,0 +1,369 @@
+"""
+daemon.py
+
+Long-running search: instead of one run a day, every ATS query of lib/queries.json is polled on
+its own schedule and new postings go through filtering, screening, analysis and Trello within
+minutes of being indexed.
+
+Per source the daemon keeps (output/daemon_state.json, written after every cycle):
+    - a high-water mark: the day of its last successful poll and the URLs of the newest page then.
+      The query asks Google for postings after that day (less DAEMON_OVERLAP_DAYS), newest first
+      (DAEMON_SORT), and pagination stops at the first page with no posting above the mark or in
+      the seen index: a quiet source costs one call per poll. After a downtime the window simply
+      widens back to the last poll.
+    - an adaptive interval: DAEMON_SPEEDUP times shorter after a poll that found new postings,
+      DAEMON_SLOWDOWN times longer after one that did not, between DAEMON_MIN_INTERVAL and
+      DAEMON_MAX_INTERVAL. It is never shorter than what the Google calls left today (see
+      SEARCH_DAILY_BUDGET) allow when spread over the sources until midnight.
+
+Between cycles the stores (seen index, screening cache, run archive), the compiled profile indexes,
+the near-duplicate indexes (reset every day, like the screening token budget), the Trello board cards (fetched again every DAEMON_TRELLO_REFRESH
+seconds) and the HTTP connection pools (http_client) stay alive. Every cycle is archived as a run
+('daemon' mode) and the run report is rewritten after it.
+
+GitHub Actions can't host a long-running process: the daily workflow stays as it is, the daemon
+runs on a machine of its own (a systemd service, a container...).
+
+Usage:
+    python src/job_search.py --daemon [--prometheus]
+"""
+import json
+import os
+import signal
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import http_client
+import instrumentation
+from checkpoint import atomic_write_json
+from job_search import (
+    QUERIES_PATH, DAYS_LOOKBACK, SEARCH_MAX_CONCURRENCY, SEARCH_RATE_PER_SECOND,
+    load_queries, open_run_state, build_query, paginate_query, filter_job_listings, screen_listings, iter_job_analyses, unanalyzed_urls,
+)
+from concurrency import TokenBucket, ordered_map
+from near_duplicates import NearDuplicateIndex
+from profiles import load_profiles, profile_settings
+from prompt_compaction import PromptCompactor
+from query_planner import QueryPlanner, SEARCH_DAILY_BUDGET, PLANNER_HISTORY_DAYS
+from seen_index import canonical_url
+from settings import settings, GOOGLE_SETTINGS, DIFY_SETTINGS, TRELLO_SETTINGS
+from trello_integration import TrelloSync
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+DAEMON_STATE_PATH = os.path.join(os.path.dirname(__file__), '../output/daemon_state.json')
+DAEMON_START_INTERVAL = 60 * 60       # Seconds between polls of a source the daemon knows nothing about yet
+DAEMON_MIN_INTERVAL = 15 * 60
+DAEMON_MAX_INTERVAL = 6 * 60 * 60
+DAEMON_SPEEDUP = 0.5                  # Interval factor after a poll that found new postings
+DAEMON_SLOWDOWN = 2                   # Interval factor after a poll that found none
+DAEMON_PAGES_PER_POLL = 3             # Google pages per source and poll, at most (newest first: new postings come first)
+DAEMON_OVERLAP_DAYS = 1               # The query window starts this many days before the mark (late indexing)
+DAEMON_SORT = 'date'                  # Google 'sort' of the polls ('' keeps the relevance order)
+DAEMON_TRELLO_REFRESH = 60 * 60       # Board cards fetched again after this many seconds (cards moved or deleted by hand)
+DAEMON_MAX_SLEEP = 60                 # The loop wakes at least this often (stop requests, new day)
+RECOMMENDED = ['INVESTIGAR MAIS', 'CANDIDATAR-SE']
+
+
+###***********************************************************************************************************************###
+def seconds_to_midnight(now):
+    moment = datetime.fromtimestamp(now)
+    midnight = (moment + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - moment).total_seconds()
+
+
+def budget_interval(calls_left, sources, now):
+    """
+    Returns:
+        float: Shortest interval (seconds) at which `sources` sources, one call per poll, stay within
+               the Google calls left today; the time to midnight when none are left
+    """
+    if calls_left <= 0:
+        return seconds_to_midnight(now)
+    return seconds_to_midnight(now) * sources / calls_left
+
+
+def next_interval(interval, new_postings):
+    factor = DAEMON_SPEEDUP if new_postings else DAEMON_SLOWDOWN
+    return min(max(interval * factor, DAEMON_MIN_INTERVAL), DAEMON_MAX_INTERVAL)
+
+
+###***********************************************************************************************************************###
+class PollSchedule:
+    """
+        Interval, next poll time and high-water mark of every source, persisted across restarts.
+    Args:
+        sources (list): ATS names (lib/queries.json keys)
+        path (str): State file (default: DAEMON_STATE_PATH)
+    """
+
+    def __init__(self, sources, path=None):
+        self.path = path or DAEMON_STATE_PATH
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                saved = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            saved = {}
+        self.sources = {}
+        for source in sources:
+            self.sources[source] = {
+                'interval': DAEMON_START_INTERVAL, 'next_poll_at': 0, 'mark': None, 'polls': 0, 'new_postings': 0,
+                **saved.get(source, {}),
+            }
+
+    def due(self, now):
+        return [source for source, state in self.sources.items() if state['next_poll_at'] <= now]
+
+    def next_poll_at(self):
+        return min((state['next_poll_at'] for state in self.sources.values()), default=float('inf'))
+
+    def query(self, source, base_query, now):
+        """
+        Returns:
+            str: Query of a poll: postings after the mark day (less the overlap), or after DAYS_LOOKBACK
+                 days when the source has no mark yet
+        """
+        mark = self.sources[source]['mark']
+        if mark is None:
+            return build_query(base_query, DAYS_LOOKBACK)
+        days = (datetime.fromtimestamp(now).date() - datetime.strptime(mark['date'], '%Y-%m-%d').date()).days
+        return build_query(base_query, max(days, 0) + DAEMON_OVERLAP_DAYS)
+
+    def known_urls(self):
+        """
+        Returns:
+            set: Canonical URLs of the newest pages of the last polls
+        """
+        return {url for state in self.sources.values() if state['mark'] for url in state['mark']['urls']}
+
+    def record_poll(self, source, new_postings, head_urls, now, floor):
+        """
+            Move the mark and adapt the interval after a successful poll.
+        Args:
+            new_postings (int): Postings of the poll not seen before
+            head_urls (list): Canonical URLs of the first (newest) page
+            floor (float): Shortest interval the daily budget allows (see budget_interval)
+        """
+        state = self.sources[source]
+        state['interval'] = next_interval(state['interval'], new_postings)
+        state['next_poll_at'] = now + max(state['interval'], floor)
+        state['mark'] = {'date': datetime.fromtimestamp(now).strftime('%Y-%m-%d'), 'urls': head_urls}
+        state['polls'] += 1
+        state['new_postings'] += new_postings
+
+    def postpone(self, source, now, delay):
+        """A source that could not be polled (no budget, search error) keeps its mark and interval."""
+        self.sources[source]['next_poll_at'] = now + delay
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        atomic_write_json(self.path, self.sources)
+
+
+###***********************************************************************************************************************###
+class SearchDaemon:
+    """
+    Args:
+        state_dir (str): Stores and daemon state in this directory instead of output/ (see open_run_state)
+        prometheus_path (str): Also write the metrics there after every cycle
+    """
+
+    def __init__(self, state_dir=None, prometheus_path=None):
+        self.profiles = load_profiles()
+        settings.require(*GOOGLE_SETTINGS, *DIFY_SETTINGS, *TRELLO_SETTINGS, *profile_settings(self.profiles))
+
+        self.queries = load_queries(QUERIES_PATH)
+        # Polls never read the search cache (a same-day response would hide the new postings), they refresh it
+        self.search_cache, self.seen_index, self.screening_cache, self.run_archive = open_run_state(state_dir, refresh=True)
+        self.schedule = PollSchedule(self.queries, os.path.join(state_dir, os.path.basename(DAEMON_STATE_PATH)) if state_dir else None)
+        self.prometheus_path = prometheus_path
+        self._near_duplicates, self._near_duplicates_day = None, None
+        self.rate_limiter = TokenBucket(SEARCH_RATE_PER_SECOND)
+        self.cycles = 0
+        self.counts = Counter()  # Since the start: polls, api_calls, new_postings, screened, cards
+        self._trello_syncs, self._trello_loaded_at = {}, 0
+        self._compactor, self._compactor_day = None, None
+        self._stop = threading.Event()
+
+    ###*******************************************************************************************************************###
+    def trello_syncs(self, now):
+        # One sync per board, kept between cycles; board cards fetched again now and then
+        if now - self._trello_loaded_at >= DAEMON_TRELLO_REFRESH:
+            board_ids = dict.fromkeys(profile.board_id for profile in self.profiles)
+            self._trello_syncs = {board_id: TrelloSync(board_id=board_id) for board_id in board_ids}
+            self._trello_loaded_at = now
+        return self._trello_syncs
+
+    def compactor(self, now):
+        # The screening token budget is daily, like the Google one
+        day = datetime.fromtimestamp(now).strftime('%Y-%m-%d')
+        if day != self._compactor_day:
+            self._compactor, self._compactor_day = PromptCompactor(), day
+        return self._compactor
+
+    def near_duplicates(self, now):
+        # Reset daily too: the indexes would otherwise grow with every posting since the start (the seen
+        # index still catches a URL found again on a later day)
+        day = datetime.fromtimestamp(now).strftime('%Y-%m-%d')
+        if day != self._near_duplicates_day:
+            self._near_duplicates = {profile.name: NearDuplicateIndex() for profile in self.profiles}
+            self._near_duplicates_day = day
+        return self._near_duplicates
+
+    ###*******************************************************************************************************************###
+    def poll(self, sources, run_id, now):
+        """
+            Fetch the postings of `sources` above their marks.
+        Returns:
+            tuple: (QueryPlanner, dict source -> JobListing records not seen before)
+        """
+        calls_left = SEARCH_DAILY_BUDGET - self.run_archive.api_calls_today()
+        known_urls = self.schedule.known_urls()
+        planner = QueryPlanner(
+            sources, self.run_archive.search_history(PLANNER_HISTORY_DAYS, min(profile.min_score for profile in self.profiles)),
+            budget=min(calls_left, DAEMON_PAGES_PER_POLL * len(sources)),
+            known=lambda url: canonical_url(url) in known_urls or url in self.seen_index,
+            min_pages=1, max_pages=DAEMON_PAGES_PER_POLL,
+        )
+        states = {
+            source: {'name': self.schedule.query(source, self.queries[source], now), 'num_results': 1, 'finished': False, 'sort': DAEMON_SORT}
+            for source in sources
+        }
+        results = ordered_map(
+            lambda source: paginate_query(source, states[source], 10 * DAEMON_PAGES_PER_POLL, self.rate_limiter, self.search_cache, planner),
+            sources, max_workers=SEARCH_MAX_CONCURRENCY,
+        )
+
+        floor = budget_interval(calls_left - sum(usage['api_calls'] for usage in planner.usage.values()), len(self.queries), now)
+        found = {}
+        for source, listings in zip(sources, results):
+            if not planner.usage[source]['pages']:
+                # No budget left for it (or the first page failed): tried again later, mark unchanged
+                self.schedule.postpone(source, now, max(DAEMON_MIN_INTERVAL, floor))
+                continue
+            # The mark only stops the pagination: a posting of the last head page left unscreened (budget, error) is still new
+            new_listings, _ = self.seen_index.filter_new(listings)
+            head_urls = [canonical_url(listing.url) for listing in listings[:10]]
+            self.schedule.record_poll(source, len(new_listings), head_urls, now, floor)
+            found[source] = new_listings
+        return planner, found
+
+    def process(self, listings, run_id, now):
+        """
+            Filter, screen, analyze and sync the new postings of a cycle, profile by profile.
+        Returns:
+            int: Cards created
+        """
+        kept = filter_job_listings(listings, save=False, profiles=self.profiles)
+        self.run_archive.record_listings(run_id, listings)
+        kept_urls = {listing.url for profile_listings in kept.values() for listing in profile_listings}
+        # Rejected by every profile for good
+        self.seen_index.mark_seen([listing for listing in listings if listing.url not in kept_urls])
+
+        compactor, trello_syncs, near_duplicates = self.compactor(now), self.trello_syncs(now), self.near_duplicates(now)
+        cards, retry_urls = 0, set()
+        for profile in self.profiles:
+            # A listing left unscreened by an earlier cycle is its own representative, not a duplicate
+            profile_listings = [
+                listing for listing in kept[profile.name] if near_duplicates[profile.name].add(listing) in (None, listing.url)
+            ]
+            if not profile_listings:
+                continue
+            # Failed screening chunks (call or answer failing every retry, not an empty verdict): their listings
+            # are polled and screened again on a later cycle, the ones the agent rejected are marked seen below
+            profile_failed = set()
+            jobs = screen_listings(profile_listings, self.screening_cache, compactor=compactor, profile=profile, failed=profile_failed)
+            self.run_archive.record_screening(run_id, jobs)
+            retry_urls.update(profile_failed)
+            if not jobs:
+                continue
+            self.counts['screened'] += len(jobs)
+            analyses = []
+            for job_analysis in iter_job_analyses(jobs, profile_listings, self.screening_cache, profile=profile):
+                analyses.append(job_analysis)
+                self.run_archive.record_analyses(run_id, [job_analysis])
+                if job_analysis.get('RECOMENDAÇÃO') in RECOMMENDED and \
+                        trello_syncs[profile.board_id].sync_job(job_analysis, list_id=profile.list_id) == 'created':
+                    print(f"Created Trello card for: {job_analysis['EMPRESA']}")
+                    cards += 1
+            # Jobs left without analysis (failed or cut-off seeker stream) go through again on a later cycle
+            missing = unanalyzed_urls(jobs, analyses)
+            retry_urls.update(listing.url for listing in profile_listings if canonical_url(listing.url) in missing)
+
+        # Postings over the token budget, of a failed screening or without analysis are not marked: found again by a later poll
+        retry_urls.update(compactor.deferred)
+        self.seen_index.mark_seen([listing for listing in listings if listing.url in kept_urls and listing.url not in retry_urls])
+        return cards
+
+    def run_cycle(self, now=None):
+        """
+            Poll the sources due at `now` and push their new postings through the pipeline.
+        Returns:
+            dict: Cycle summary: sources polled, api_calls, new_postings, cards
+        """
+        now = time.time() if now is None else now
+        sources = self.schedule.due(now)
+        if not sources:
+            return None
+
+        self.cycles += 1
+        run_id = self.run_archive.start_run('daemon')
+        planner, found = self.poll(sources, run_id, now)
+        listings = [listing for source_listings in found.values() for listing in source_listings]
+        cards = self.process(listings, run_id, now) if listings else 0
+        self.run_archive.record_search_usage(run_id, planner.plan, planner.usage)
+        self.run_archive.finish_run(run_id)
+        self.schedule.save()
+
+        summary = {
+            'sources': len(found), 'api_calls': sum(usage['api_calls'] for usage in planner.usage.values()),
+            'new_postings': len(listings), 'cards': cards,
+        }
+        self.counts.update(polls=summary['sources'], api_calls=summary['api_calls'], new_postings=len(listings), cards=cards)
+        wait = max(self.schedule.next_poll_at() - now, 0)
+        print(f"[daemon] Ciclo {self.cycles}: {summary['sources']} fontes consultadas, {summary['api_calls']} chamadas Google, "
+              f"{len(listings)} vagas novas, {cards} cards criados; próxima consulta em {wait / 60:.0f} min")
+        instrumentation.write_report(prometheus_path=self.prometheus_path, run_id=run_id, mode='daemon',
+                                     cycles=self.cycles, daemon=dict(self.counts))
+        return summary
+
+    ###*******************************************************************************************************************###
+    def run(self, max_cycles=None):
+        """
+            Poll until stopped (SIGINT/SIGTERM, stop()) or after `max_cycles` cycles with due sources.
+            A failing cycle is reported and the loop goes on.
+        """
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: self.stop())
+
+        print(f"[daemon] {len(self.queries)} fontes, {len(self.profiles)} perfis; estado em {self.schedule.path}")
+        try:
+            while not self._stop.is_set() and (max_cycles is None or self.cycles < max_cycles):
+                now = time.time()
+                try:
+                    self.run_cycle(now)
+                except Exception as e:
+                    # Marks unchanged: the sources of the failed cycle are polled again after the shortest interval
+                    print(f"[daemon] Erro no ciclo {self.cycles}: {e}")
+                    for source in self.schedule.due(now):
+                        self.schedule.postpone(source, now, DAEMON_MIN_INTERVAL)
+                self._stop.wait(min(max(self.schedule.next_poll_at() - time.time(), 0), DAEMON_MAX_SLEEP))
+        finally:
+            self.close()
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        print(f"[daemon] Encerrado após {self.cycles} ciclos: {self.counts['api_calls']} chamadas Google, "
+              f"{self.counts['new_postings']} vagas novas, {self.counts['cards']} cards criados")
+        self.schedule.save()
+        self.seen_index.close()
+        self.run_archive.close()
+        self.search_cache.print_stats()
+        self.screening_cache.print_stats()
+        self.screening_cache.close()
+        http_client.print_connection_stats()
@@ -0,0 +1,213 @@
+"""
+dify_stream.py
+
+Incremental consumer of the Dify streaming (SSE) answers.
+
+The answer chunks are collected in a list (joined once, at the end) and the ```json fenced blocks
+are parsed while they arrive: every top-level object of a block (each item of a JSON list, or the
+block itself when it is a single object) is yielded as soon as its closing brace is received,
+instead of waiting for 'workflow_finished' and parsing the whole answer.
+
+Usage:
+    blocks = JsonBlockStream()
+    for chunk in iter_answer_chunks(response):
+        for job in blocks.feed(chunk):
+            ...
+    full_answer = blocks.text()
+"""
+import json
+import re
+
+from json_extractor import decode_json_block, extract_json_blocks, repair_json_block
+from instrumentation import count
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+JSON_FENCE = '```json'
+FENCE = '```'
+
+# Characters that change the parser state inside a block: fences, escapes, string and container delimiters
+_BLOCK_TOKEN_RE = re.compile(r'`+|[\\"{}\[\]]')
+
+
+class DifyStreamError(Exception):
+    """The agent answered with an HTTP error or an 'error' event."""
+
+
+###***********************************************************************************************************************###
+def iter_answer_chunks(response):
+    """
+        Yield the answer text of every 'agent_message' event of a Dify SSE response, until 'workflow_finished'.
+    Raises:
+        DifyStreamError: On an 'error' event
+    """
+    from sseclient import SSEClient  # Deferred: only a streamed Dify answer needs it
+
+    malformed = 0
+    for msg in SSEClient(response).events():
+        if not msg.data:
+            continue
+        count('dify_stream_bytes', len(msg.data.encode('utf-8')))
+        count('dify_stream_events')
+        try:
+            event_data = json.loads(msg.data)
+        except json.JSONDecodeError:
+            malformed += 1
+            continue
+
+        event = event_data.get('event')
+        if event == 'agent_message':
+            yield event_data.get('answer', '')
+        elif event == 'error':
+            raise DifyStreamError(event_data.get('message') or event_data.get('answer', 'Unknown error'))
+        elif event == 'workflow_finished':
+            break
+
+    if malformed:
+        print(f"{malformed} eventos SSE ignorados (JSON inválido)")
+
+
+###***********************************************************************************************************************###
+class JsonBlockStream:
+    """
+    Incremental parser of the ```json fenced blocks of a text received in chunks.
+
+    Only the unprocessed end of the text (at most a partial fence or escape) is kept between
+    calls, so parsing is linear in the answer size. Like extract_json_blocks, a block ends at
+    the first ``` after its opening fence; the complete items of an unclosed final block are
+    kept, and an answer without any fence is decoded by close().
+    """
+
+    def __init__(self):
+        self._chunks = []       # Every chunk received, for text()
+        self._pending = ''      # Received but not processed yet
+        self._in_block = False
+        self._depth = 0         # Open containers in the current block
+        self._item_depth = 0    # Depth at which the yielded objects live (1 inside a top-level list)
+        self._in_string = False
+        self._item = []         # Pieces of the object being received
+        self._item_start = None
+        self._fenced = False
+        self.errors = 0
+
+    def text(self):
+        return ''.join(self._chunks)
+
+    def feed(self, chunk):
+        """
+        Returns:
+            list: Objects completed by this chunk, in order
+        """
+        self._chunks.append(chunk)
+        buffer = self._pending + chunk
+        objects = []
+        position = 0
+
+        while position < len(buffer):
+            if not self._in_block:
+                start = buffer.find(JSON_FENCE, position)
+                if start < 0:
+                    # Keep what may be the beginning of a fence split across chunks
+                    position = max(position, len(buffer) - len(JSON_FENCE) + 1)
+                    break
+                self._open_block()
+                self._fenced = True
+                position = start + len(JSON_FENCE)
+                continue
+
+            position = self._scan_block(buffer, position, objects)
+            if position is None:
+                position = len(buffer)
+                break
+            if not self._in_block:
+                continue
+            # Stopped on an incomplete token at the end of the buffer
+            break
+
+        if self._item_start is not None:
+            # The current object goes on in the next chunk
+            self._item.append(buffer[self._item_start:position])
+            self._item_start = 0
+        self._pending = buffer[position:]
+        return objects
+
+    def close(self):
+        """
+        Returns:
+            list: Objects of an answer that had no ```json fence at all (the items, for a list)
+        """
+        if self._fenced:
+            return []
+        objects = []
+        for block in extract_json_blocks(self.text()):
+            objects.extend(block if isinstance(block, list) else [block])
+        return objects
+
+    def _open_block(self):
+        self._in_block = True
+        self._depth = 0
+        self._item_depth = 0
+        self._in_string = False
+        self._item = []
+        self._item_start = None
+
+    def _scan_block(self, buffer, position, objects):
+        """
+        Process block tokens from `position`. Returns the position where the block closed,
+        the position of an incomplete token at the end of the buffer, or None when all was processed.
+        """
+        while True:
+            match = _BLOCK_TOKEN_RE.search(buffer, position)
+            if match is None:
+                return None
+            token = match.group()
+            start = match.start()
+            position = match.end()
+
+            if token[0] == '`':
+                if len(token) >= len(FENCE):
+                    self._in_block = False
+                    self._item, self._item_start = [], None
+                    return start + len(FENCE)
+                if position == len(buffer):
+                    return start  # May be a fence split across chunks
+                continue
+
+            if self._in_string:
+                if token == '\\':
+                    if position == len(buffer):
+                        return start
+                    position += 1  # The escaped character is never a delimiter
+                elif token == '"':
+                    self._in_string = False
+                continue
+
+            if token == '"':
+                self._in_string = True
+            elif token in '[{':
+                if self._depth == 0 and token == '[':
+                    self._item_depth = 1
+                elif self._depth == self._item_depth:
+                    self._item, self._item_start = [], start
+                self._depth += 1
+            elif token in ']}':
+                self._depth -= 1
+                if self._depth == self._item_depth and self._item_start is not None:
+                    self._item.append(buffer[self._item_start:position])
+                    self._item_start = None
+                    self._emit(''.join(self._item), objects)
+                    self._item = []
+
+    def _emit(self, text, objects):
+        try:
+            objects.append(decode_json_block(text))
+            return
+        except json.JSONDecodeError as e:
+            error = e
+
+        repaired = repair_json_block(text)
+        if repaired is None:
+            self.errors += 1
+            print(f"Erro ao decodificar objeto JSON do stream: {error}")
+        else:
+            objects.append(repaired)
@@ -0,0 +1,237 @@
+"""
+http_client.py
+
+Shared HTTP client for every outbound call (Google, Dify and Trello).
+
+A single requests.Session keeps one connection pool per host, so keep-alive connections
+are reused across calls instead of paying a new TCP+TLS handshake per request. Timeouts
+and retry/backoff are applied to every call: connection errors and 429 for any method, 5xx and
+read errors only for idempotent ones (a POST that reached the server is never sent twice: no
+duplicate Trello card, no Dify call retried under the screening retries).
+
+Usage:
+    import http_client
+    response = http_client.get(url, params=params)
+    print(http_client.connection_stats())
+"""
+import functools
+import threading
+from urllib.parse import urlsplit
+
+from instrumentation import count, observe
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+POOL_CONNECTIONS = 10        # How many per-host pools are kept alive
+POOL_MAXSIZE = 10            # Max keep-alive connections per host (>= the thread pools hitting a same host)
+DEFAULT_TIMEOUT = (10, 60)   # (connect, read) seconds
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 1     # Sleeps 0, 2, 4... seconds between retries (Retry-After is honored for 429)
+RETRY_STATUS_FORCELIST = (429, 500, 502, 503, 504)  # 5xx: idempotent methods only (urllib3 defaults)
+RETRY_ANY_METHOD_STATUSES = (429,)                  # Refused before being processed: safe to send again, POST included
+
+_session = None
+_session_lock = threading.Lock()
+_cassette = None  # Records or replays every exchange (see cassette.py)
+_closed_pool_stats = {}
+
+
+###***********************************************************************************************************************###
+@functools.lru_cache(maxsize=None)
+def counting_adapter_class():
+    """
+        HTTPAdapter that keeps the connection counters of pools evicted from the pool manager,
+        so connection_stats() still covers every host of the run. Built on the first session:
+        requests is only imported once a call is made, not when this module is.
+    """
+    from requests.adapters import HTTPAdapter
+
+    class CountingHTTPAdapter(HTTPAdapter):
+
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+
+            def dispose(pool):
+                _record_pool(pool, _closed_pool_stats)
+                pool.close()
+
+            self.poolmanager.pools.dispose_func = dispose
+
+    return CountingHTTPAdapter
+
+
+def _record_pool(pool, stats):
+    host = f"{pool.scheme}://{pool.host}" if pool.port in (None, 80, 443) else f"{pool.scheme}://{pool.host}:{pool.port}"
+    host_stats = stats.setdefault(host, {'opened': 0, 'requests': 0})
+    host_stats['opened'] += pool.num_connections
+    host_stats['requests'] += pool.num_requests
+
+
+@functools.lru_cache(maxsize=None)
+def retry_class():
+    """
+        urllib3 Retry also retrying the non-idempotent methods on RETRY_ANY_METHOD_STATUSES (Dify and
+        Trello answer 429 on bursts). Built on the first session, as counting_adapter_class.
+    """
+    from urllib3.util.retry import Retry
+
+    class RateLimitRetry(Retry):
+
+        def is_retry(self, method, status_code, has_retry_after=False):
+            if status_code in RETRY_ANY_METHOD_STATUSES:
+                return True
+            return super().is_retry(method, status_code, has_retry_after)
+
+    return RateLimitRetry
+
+
+###***********************************************************************************************************************###
+def _build_session(pool_connections, pool_maxsize, retries, backoff_factor):
+    import requests
+
+    retry = retry_class()(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_FORCELIST,
+        respect_retry_after_header=True,
+        raise_on_status=False          # Hand the last response back, so callers print the status code
+    )
+    adapter = counting_adapter_class()(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def configure(pool_connections=None, pool_maxsize=None, retries=None, backoff_factor=None, timeout=None):
+    """
+    Tune the shared client. Replaces the current session (its pools are closed).
+    Args:
+        pool_connections (int): Per-host pools kept alive
+        pool_maxsize (int): Keep-alive connections per host
+        retries (int): Retries on connection errors, 429 and (idempotent methods) 5xx and read errors
+        backoff_factor (float): Exponential backoff factor between retries
+        timeout (tuple|float): Default (connect, read) timeout
+    """
+    global _session, POOL_CONNECTIONS, POOL_MAXSIZE, RETRY_TOTAL, RETRY_BACKOFF_FACTOR, DEFAULT_TIMEOUT
+
+    with _session_lock:
+        POOL_CONNECTIONS = pool_connections or POOL_CONNECTIONS
+        POOL_MAXSIZE = pool_maxsize or POOL_MAXSIZE
+        RETRY_TOTAL = RETRY_TOTAL if retries is None else retries
+        RETRY_BACKOFF_FACTOR = RETRY_BACKOFF_FACTOR if backoff_factor is None else backoff_factor
+        DEFAULT_TIMEOUT = timeout or DEFAULT_TIMEOUT
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def get_session():
+    """
+    Returns:
+        requests.Session: The process-wide session, created on first use
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session(POOL_CONNECTIONS, POOL_MAXSIZE, RETRY_TOTAL, RETRY_BACKOFF_FACTOR)
+    return _session
+
+
+###***********************************************************************************************************************###
+def request(method, url, timeout=None, **kwargs):
+    """
+    Send a request through the shared session.
+    Args:
+        method (str): HTTP method
+        url (str): Target URL
+        timeout (tuple|float): Overrides DEFAULT_TIMEOUT for this call
+        kwargs: Passed to requests (params, json, headers, stream...)
+    Returns:
+        requests.Response
+    """
+    cassette = _cassette
+    if cassette is not None and cassette.mode == 'replay':
+        response = cassette.replay(method, url, **kwargs)
+    else:
+        response = get_session().request(method, url, timeout=timeout or DEFAULT_TIMEOUT, **kwargs)
+        if cassette is not None:
+            cassette.record(response)
+    _record_request(response, kwargs.get('stream', False))
+    return response
+
+
+def request_attempts(response):
+    """
+    Returns:
+        int: Requests sent to get `response`: 1, plus the retries done by the adapter
+    """
+    retries = getattr(response.raw, 'retries', None)
+    return 1 + (len(retries.history) if retries is not None else 0)
+
+
+def use_cassette(cassette):
+    """
+        Record every following exchange into `cassette`, or answer them from it (see cassette.py).
+        None goes back to the network.
+    """
+    global _cassette
+    _cassette = cassette
+
+
+def _record_request(response, stream):
+    # Per host: calls, latency (to the headers), bytes each way and retries done by the adapter
+    host = urlsplit(response.url).netloc
+    count('http_requests', host=host, status=response.status_code)
+    observe('http_request_seconds', response.elapsed.total_seconds(), host=host)
+    body = response.request.body
+    count('http_bytes_sent', len(body) if body else 0, host=host)
+    # A streamed body is not read here (the consumer counts it): only its announced length, if any
+    received = int(response.headers.get('Content-Length') or 0) if stream else len(response.content)
+    count('http_bytes_received', received, host=host)
+    retries = getattr(response.raw, 'retries', None)
+    if retries is not None and retries.history:
+        count('http_retries', len(retries.history), host=host)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request('PUT', url, **kwargs)
+
+
+###***********************************************************************************************************************###
+def connection_stats():
+    """
+    Connections opened and reused per host since the process started.
+    Returns:
+        dict: {host: {'opened': int, 'requests': int, 'reused': int}}
+    """
+    stats = {host: dict(values) for host, values in _closed_pool_stats.items()}
+
+    session = _session
+    if session is not None:
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    _record_pool(pool, stats)
+
+    for values in stats.values():
+        values['reused'] = max(0, values['requests'] - values['opened'])
+    return stats
+
+
+def print_connection_stats():
+    for host, values in sorted(connection_stats().items()):
+        print(f"[http] {host}: {values['opened']} conexões abertas, {values['reused']} reutilizadas ({values['requests']} requisições)")
@@ -0,0 +1,368 @@
+"""
+instrumentation.py
+
+Lightweight spans and counters, to tell where the time of a run went (Google pagination, Dify
+calls, the SSE stream, Trello posting...).
+
+Every instrumented stage records its calls, errors, items in/out and a latency histogram; the
+shared HTTP client adds requests, bytes and retries per host. At the end of a run the whole
+registry is written as a machine-readable report next to the other outputs (output/run_report.json,
+plus output/run_report.prom in the Prometheus textfile format when asked). With profiling enabled,
+the CPU-bound stages are also run under cProfile and dumped to output/profile/<stage>.prof.
+
+Usage:
+    @instrumented('search_google', items_out=len)
+    def search_google(...): ...
+
+    with span('filter_job_listings', items_in=len(listings)) as stage:
+        ...
+        stage.items_out = len(filtered)
+
+    count('http_bytes_received', 1024, host='api.trello.com')
+    write_report()
+"""
+import cProfile
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+REPORT_PATH = os.path.join(os.path.dirname(__file__), '../output/run_report.json')
+PROMETHEUS_PATH = os.path.join(os.path.dirname(__file__), '../output/run_report.prom')
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), '../output/profile')
+# Histogram upper bounds, in seconds (from a cached page to a Dify analysis)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+METRIC_PREFIX = 'job_seeker_'
+
+
+###***********************************************************************************************************************###
+class Histogram:
+    """Latency histogram: counts[i] observations fell in (buckets[i-1], buckets[i]] (not cumulative, unlike Prometheus)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot: above the highest bound
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (the max for the overflow bucket)."""
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if bucket_count and seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return 0.0
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.total, 6),
+            'max': round(self.max, 6),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': {str(bound): count for bound, count in zip(self.buckets + ('+Inf',), self.counts)},
+        }
+
+
+class Span:
+    """Handle of a running stage: set its items_in/items_out before it ends."""
+
+    __slots__ = ('stage', 'items_in', 'items_out', 'started')
+
+    def __init__(self, stage, items_in=None):
+        self.stage = stage
+        self.items_in = items_in
+        self.items_out = None
+        self.started = time.perf_counter()
+
+
+###***********************************************************************************************************************###
+class Metrics:
+    """Thread-safe registry of counters and latency histograms, keyed by (name, labels)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started_at = time.time()
+        self.info = {}  # Run attributes added to the report (run id, mode...)
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def count(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def end_span(self, span, error=False):
+        self.observe('stage_seconds', time.perf_counter() - span.started, stage=span.stage)
+        self.count('stage_calls', stage=span.stage)
+        if error:
+            self.count('stage_errors', stage=span.stage)
+        if span.items_in is not None:
+            self.count('stage_items_in', span.items_in, stage=span.stage)
+        if span.items_out is not None:
+            self.count('stage_items_out', span.items_out, stage=span.stage)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.info.clear()
+            self.started_at = time.time()
+
+    ###*******************************************************************************************************************###
+    def report(self):
+        """
+        Returns:
+            dict: {'run', 'stages', 'counters', 'histograms'}; 'stages' gathers the stage_* metrics by stage
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {key: histogram.to_dict() for key, histogram in self.histograms.items()}
+
+        stages = {}
+        for (name, labels), value in counters.items():
+            labels = dict(labels)
+            if name.startswith('stage_') and 'stage' in labels:
+                stages.setdefault(labels['stage'], {})[name[len('stage_'):]] = value
+        for (name, labels), histogram in histograms.items():
+            labels = dict(labels)
+            if name == 'stage_seconds' and 'stage' in labels:
+                stages.setdefault(labels['stage'], {})['seconds'] = histogram
+
+        return {
+            'run': {**self.info, 'started_at': self.started_at, 'duration_seconds': round(time.time() - self.started_at, 3)},
+            'stages': stages,
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(counters.items()) if not name.startswith('stage_')
+            ],
+            'histograms': [
+                {'name': name, 'labels': dict(labels), **histogram}
+                for (name, labels), histogram in sorted(histograms.items()) if name != 'stage_seconds'
+            ],
+        }
+
+    def prometheus(self):
+        """
+        Returns:
+            str: Every metric in the Prometheus text exposition format (for node_exporter's textfile collector)
+        """
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, histogram.to_dict()) for key, histogram in self.histograms.items())
+
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{METRIC_PREFIX}{name}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_labels(labels)} {value}")
+
+        for (name, labels), histogram in histograms:
+            metric = f"{METRIC_PREFIX}{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket_count in histogram['buckets'].items():
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{metric}_sum{_labels(labels)} {histogram['sum']}")
+            lines.append(f"{metric}_count{_labels(labels)} {histogram['count']}")
+
+        lines.append(f"# TYPE {METRIC_PREFIX}run_duration_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}run_duration_seconds {time.time() - self.started_at:.3f}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+###***********************************************************************************************************************###
+# Process-wide registry and profiler state
+METRICS = Metrics()
+_profiles = {}
+_profile_lock = threading.Lock()
+_profiling = False
+
+
+def count(name, value=1, **labels):
+    METRICS.count(name, value, **labels)
+
+
+def observe(name, seconds, **labels):
+    METRICS.observe(name, seconds, **labels)
+
+
+@contextmanager
+def span(stage, items_in=None):
+    """
+        Time a block as one call of `stage`.
+    Yields:
+        Span: Set its items_out (or items_in) inside the block
+    """
+    handle = Span(stage, items_in)
+    try:
+        yield handle
+    except GeneratorExit:
+        # A consumer that stops reading an instrumented generator early is no error
+        METRICS.end_span(handle)
+        raise
+    except BaseException:
+        METRICS.end_span(handle, error=True)
+        raise
+    METRICS.end_span(handle)
+
+
+def instrumented(stage, items_in=None, items_out=None, profile=False):
+    """
+        Decorator recording every call of the function as a span of `stage`.
+        A generator function is timed over its whole life (first next() to exhaustion) and its
+        items out are the objects it yielded.
+    Args:
+        items_in (callable): Applied to the first argument (e.g. len)
+        items_out (callable): Applied to the return value (e.g. len)
+        profile (bool): CPU-bound stage, run under cProfile when profiling is enabled
+    """
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                with span(stage, items_in(args[0]) if items_in and args else None) as handle:
+                    handle.items_out = 0
+                    for item in func(*args, **kwargs):
+                        handle.items_out += 1
+                        yield item
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage, items_in(args[0]) if items_in and args else None) as handle:
+                if profile:
+                    with profiled(stage):
+                        result = func(*args, **kwargs)
+                else:
+                    result = func(*args, **kwargs)
+                if items_out is not None:
+                    handle.items_out = items_out(result)
+                return result
+        return wrapper
+    return decorator
+
+
+###***********************************************************************************************************************###
+def enable_profiling(enabled=True):
+    global _profiling
+    _profiling = enabled
+
+
+@contextmanager
+def profiled(stage):
+    """Run the block under the cProfile profiler of `stage` (accumulated over calls) when profiling is enabled."""
+    if not _profiling:
+        yield
+        return
+    with _profile_lock:
+        profiler = _profiles.setdefault(stage, cProfile.Profile())
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is active (e.g. the same stage in another thread): run unprofiled
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+
+
+def dump_profiles(directory=None):
+    """
+    Returns:
+        list: Written .prof files (read them with `python -m pstats` or snakeviz)
+    """
+    directory = directory or PROFILE_DIR
+    paths = []
+    with _profile_lock:
+        profiles = dict(_profiles)
+    if profiles:
+        os.makedirs(directory, exist_ok=True)
+    for stage, profiler in profiles.items():
+        path = os.path.join(directory, f"{stage}.prof")
+        profiler.dump_stats(path)
+        paths.append(path)
+    return paths
+
+
+def write_report(path=None, prometheus_path=None, **info):
+    """
+        Write the run report (JSON), optionally the Prometheus textfile, and the cProfile dumps.
+    Args:
+        path (str): JSON report (default: REPORT_PATH)
+        prometheus_path (str): Also write the metrics there, in the Prometheus textfile format
+        info: Run attributes added to the report (run_id, mode, pipeline stats...)
+    Returns:
+        dict: The report
+    """
+    path = path or REPORT_PATH
+    METRICS.info.update(info)
+    report = METRICS.report()
+    report['profiles'] = dump_profiles() if _profiling else []
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    print(f"Run report written to {path}")
+
+    if prometheus_path:
+        # Written then renamed, so the textfile collector never reads a half-written file
+        temporary = f"{prometheus_path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(METRICS.prometheus())
+        os.replace(temporary, prometheus_path)
+        print(f"Prometheus metrics written to {prometheus_path}")
+    return report
+
+
+def print_report(report=None):
+    report = report or METRICS.report()
+    for stage, values in sorted(report['stages'].items(), key=lambda entry: -entry[1].get('seconds', {}).get('sum', 0)):
+        seconds = values.get('seconds', {})
+        print(f"[métricas] {stage}: {values.get('calls', 0)} chamadas, {seconds.get('sum', 0):.2f}s "
+              f"(p50 ≤{seconds.get('p50', 0)}s, p95 ≤{seconds.get('p95', 0)}s, máx {seconds.get('max', 0):.2f}s), "
+              f"{values.get('items_in', '-')} entradas, {values.get('items_out', '-')} saídas, {values.get('errors', 0)} erros")
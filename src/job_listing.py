@@ -0,0 +1,71 @@
+"""
+job_listing.py
+
+The record a job posting travels in, from the Google result to the Dify screening.
+
+Listings used to go around as "Title: ...\\nURL: ...\\nSnippet: ...\\n---" strings, split back
+into dicts and formatted once more for the prompt (a snippet holding a newline lost everything
+after it). A JobListing is built once from the Google item, flows through search, filter, dedupe
+and screening, and is only converted at the I/O boundaries: to_dict()/from_dict() for the JSON
+files, screening_text() for the Dify prompt.
+"""
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class JobListing:
+    title: str
+    url: str
+    snippet: str
+    source: str = ''                      # ATS name, as in lib/queries.json
+    matches_pt: list | None = None        # Token analysis (see filter_job_listings), None until filtered
+    matches_en: list | None = None
+    total_matches: int | None = None
+    relevance_score: float | None = None  # Weighted profile score (profile_index.py)
+    duplicate_urls: list | None = None    # Near-duplicates this listing stands for
+
+    @classmethod
+    def from_search_item(cls, item, source=''):
+        """Build a listing from a Google Custom Search item."""
+        return cls(item.get('title', ''), item.get('link', ''), item.get('snippet', ''), source)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Read a listing written by to_dict() (e.g. an archived output/job_results.json)."""
+        analysis = data.get('token_analysis') or {}
+        return cls(
+            data.get('Title', ''), data.get('URL', ''), data.get('Snippet', ''), data.get('Source', ''),
+            analysis.get('matches_pt'), analysis.get('matches_en'), analysis.get('total_matches'),
+            analysis.get('relevance_score'), data.get('duplicate_urls'),
+        )
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: The JSON layout of output/job_results.json ('Title', 'URL', 'Snippet', 'token_analysis', 'remove'...)
+        """
+        data = {'Title': self.title, 'URL': self.url, 'Snippet': self.snippet}
+        if self.source:
+            data['Source'] = self.source
+        if self.total_matches is not None:
+            data['token_analysis'] = {
+                'matches_pt': self.matches_pt,
+                'matches_en': self.matches_en,
+                'total_matches': self.total_matches,
+            }
+            if self.relevance_score is not None:
+                data['token_analysis']['relevance_score'] = self.relevance_score
+            data['remove'] = self.total_matches == 0
+        if self.duplicate_urls:
+            data['duplicate_urls'] = self.duplicate_urls
+        return data
+
+    @property
+    def text(self):
+        """Text the profile tokens are matched against."""
+        return f"{self.title} {self.snippet}"
+
+    def screening_text(self):
+        # One line per listing in the prompt
+        snippet = self.snippet.replace('\n', ' ')
+        return f"Title: {self.title} §URL: {self.url} §Snippet: {snippet} §---"
@@ -4,46 +4,69 @@ job_search.py
 This script reads job search queries from lib/queries.json, calls the Google Programmable Search Engine API for each query, and outputs the results to a .txt file for LLM processing.
 
 Usage:
-    python job_search.py
+    python job_search.py [--refresh] [--stream] [--resume] [--daemon] [--prometheus] [--profile] [--record DIR | --replay DIR]
 
 Requirements:
     - requests
     - API key and Search Engine ID from Google Programmable Search Engine
     - queries.json in lib/
 """
+import argparse
+import dataclasses
 import json
-import requests
 import os
 import sys
 from datetime import datetime, timedelta
 import mimetypes
-import time
-import re
-from sseclient import SSEClient
-from trello_integration import create_trello_cards_from_jobs
+import threading
+import trello_integration
+from trello_integration import TrelloSync, create_trello_cards_from_jobs
+from concurrency import TokenBucket, ordered_map
+import http_client
+from search_cache import SearchCache, SEARCH_CACHE_PATH
+from token_matcher import get_matcher
+from profile_index import get_index, fold
+from profiles import load_profiles, profile_settings, profile_suffix, profile_path
+from seen_index import SeenIndex, SEEN_INDEX_PATH, canonical_url
+from near_duplicates import collapse_near_duplicates, NearDuplicateIndex
+from screening_scheduler import screen_in_chunks, screening_items, screen_chunk_with_retries, estimate_tokens
+from screening_scheduler import SCREENING_CHUNK_TOKENS, SCREENING_MAX_CONCURRENCY, ScreeningError
+from pipeline import Stage, BatchStage, run_pipeline, print_pipeline_stats
+from screening_cache import ScreeningCache, agent_identity, SCREENING_CACHE_PATH
+from dify_stream import DifyStreamError, JsonBlockStream, iter_answer_chunks
+from run_archive import RunArchive, RUN_ARCHIVE_PATH
+from job_listing import JobListing
+from query_planner import QueryPlanner, SEARCH_DAILY_BUDGET, PLANNER_HISTORY_DAYS
+import instrumentation
+from checkpoint import RunCheckpoint
+from prompt_compaction import PromptCompactor
+from instrumentation import instrumented
+from settings import settings, GOOGLE_SETTINGS, DIFY_SETTINGS, TRELLO_SETTINGS
 
 # Add the project root directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from lib.profile_tokens import profile_tokens_pt, profile_tokens_en
+from lib.profile_tokens import profile_tokens_pt, profile_tokens_en, profile_token_weights
 from collections import Counter
-GOOGLE_API_KEY = os.environ['GOOGLE_API_KEY']
-SEARCH_ENGINE_ID = os.environ['SEARCH_ENGINE_ID']
-DIFY_API_KEY = os.environ['DIFY_API_KEY']
-DIFY_API_KEY_SEEKER = os.environ['DIFY_API_KEY_SEEKER']
-DIFY_AGENT_URL = os.environ['DIFY_AGENT_URL']
-DIFY_USER = os.environ['DIFY_USER']
 
 # --- CONFIGURATION ---
 ###***********************************************************************************************************************###
-API_KEY = GOOGLE_API_KEY
-SEARCH_ENGINE_ID = SEARCH_ENGINE_ID
 QUERIES_PATH = os.path.join(os.path.dirname(__file__), '../lib/queries.json')
 OUTPUT_PATH = os.path.join(os.path.dirname(__file__), '../output/job_results.json')
 AI_SCREEN_OUTPUT_PATH = os.path.join(os.path.dirname(__file__), '../output/ai_screening.json')
 JOB_ANALYSIS_OUTPUT_PATH = os.path.join(os.path.dirname(__file__), '../output/job_analysis.json')
 DAYS_LOOKBACK = 1  # How many days back to search
 MAX_RESULTS = 50
+GOOGLE_SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+SEARCH_MAX_CONCURRENCY = 4  # How many ATS queries are paginated at the same time
+SEARCH_RATE_PER_SECOND = 2  # Global Google API calls per second, shared by every query (avoids 429)
+GOOGLE_TIMEOUT = (10, 30)  # (connect, read) seconds
+DIFY_TIMEOUT = (10, 600)  # Agents may take minutes to answer a big screening prompt
+DIFY_RATE_PER_SECOND = 1  # Dify calls per second, shared by every concurrent screening chunk
+SCREENING_PROMPT_VERSION = 1  # Bump when the screening prompt or the agents change: cached verdicts are invalidated
+
+DIFY_RATE_LIMITER = TokenBucket(DIFY_RATE_PER_SECOND)
+STATE_PATHS = [SEARCH_CACHE_PATH, SEEN_INDEX_PATH, SCREENING_CACHE_PATH, RUN_ARCHIVE_PATH]  # Run state, snapshotted by --record
 
 # --- FUNCTIONS ---
 ###***********************************************************************************************************************###
@@ -51,6 +74,30 @@ def load_queries(path):
     with open(path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
+###***********************************************************************************************************************###
+def open_run_state(state_dir=None, refresh=False):
+    """
+        Open the stores a run reads and updates: search cache, seen index, screening cache and run archive.
+    Args:
+        state_dir (str): Use the copies in this directory instead of output/ (a replayed run, see cassette.py).
+                         Their cache entries never expire there, however old the cassette is.
+        refresh (bool): Ignore cached Google responses
+    Returns:
+        tuple: (SearchCache, SeenIndex, ScreeningCache, RunArchive)
+    """
+    if state_dir is None:
+        return SearchCache(refresh=refresh), SeenIndex(), ScreeningCache(), RunArchive()
+
+    def path(default):
+        return os.path.join(state_dir, os.path.basename(default))
+
+    return (
+        SearchCache(path(SEARCH_CACHE_PATH), ttl=float('inf'), refresh=refresh),
+        SeenIndex(path(SEEN_INDEX_PATH)),
+        ScreeningCache(path(SCREENING_CACHE_PATH), ttl=float('inf')),
+        RunArchive(path(RUN_ARCHIVE_PATH)),
+    )
+
 ###***********************************************************************************************************************###
 def build_query(base_query, days_lookback):
     date_str = (datetime.now() - timedelta(days=days_lookback)).strftime('%Y-%m-%d')
@@ -58,8 +105,18 @@ def build_query(base_query, days_lookback):
 
 ###***********************************************************************************************************************###
 # Search Google for raw job postings
-def search_google(query, api_key, engine_id, num_results=10, start=1):
-    url = "https://www.googleapis.com/customsearch/v1"
+@instrumented('search_google', items_out=lambda results: len(results['items'][0]) if isinstance(results, dict) else 0)
+def search_google(query, api_key, engine_id, num_results=10, start=1, sort=None, attempts=None):
+    """
+    Args:
+        attempts (list): When given, receives the number of requests the call sent, retries of the
+                         shared HTTP client included (failed calls too: they count against the quota)
+    Returns:
+        dict: {'search_results', 'items'}, or an empty list when the call failed
+    """
+    import requests  # Deferred: importing job_search (filtering, parsing) does not load the HTTP stack
+
+    url = GOOGLE_SEARCH_URL
     params = {
         'key': api_key,
         'cx': engine_id,
@@ -67,8 +124,19 @@ def search_google(query, api_key, engine_id, num_results=10, start=1):
         'num': num_results,
         'start': start
     }
+    if sort:
+        params['sort'] = sort  # e.g. 'date': newest first (daemon polls, see daemon.py)
     
-    response = requests.get(url, params=params)
+    try:
+        response = http_client.get(url, params=params, timeout=GOOGLE_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        print(f"Request failed: {e} for query: {query}")
+        if attempts is not None:
+            # The shared client gave up: every retry was spent
+            attempts.append(1 + http_client.RETRY_TOTAL)
+        return []
+    if attempts is not None:
+        attempts.append(http_client.request_attempts(response))
     j = json.loads(response.text)
 
     if response.status_code == 200:
@@ -83,29 +151,90 @@ def search_google(query, api_key, engine_id, num_results=10, start=1):
         return []
 
 ###***********************************************************************************************************************###
-def format_result(item):
-    title = item.get('title', '')
-    link = item.get('link', '')
-    snippet = item.get('snippet', '')
-    return f"Title: {title}\nURL: {link}\nSnippet: {snippet}\n---\n"
-
-###***********************************************************************************************************************###
-# Group searches Google Search Engine (optimized way)
-def group_search(queries, max_results_per_query=30):
-
+# Paginates a single ATS query, sharing the global rate limiter with the other queries
+def iter_query_pages(name, query, max_results_per_query, rate_limiter=None, cache=None, planner=None, checkpoint=None):
     """
-        Optimize Google Engine searches, avoiding 429 error callbacks.
+        Fetch every page of one ATS query, one page after another, yielding each page as soon as it arrives.
     Args:
-        queries (dict): List of queries to be performed
+        name (str): ATS name, as in lib/queries.json
+        query (dict): Query state with 'name', 'num_results' and 'finished' keys (and an optional Google 'sort')
         max_results_per_query (int): Max items to be provided by google search, for a given query
-    Returns:
-        dict: List of potential job applications, structured in JSON format
+        rate_limiter (TokenBucket): Shared limiter, acquired before every Google call
+        cache (SearchCache): Persistent response cache. Only misses reach the API
+        planner (QueryPlanner): Pages allotted to the ATS and early stop. Replaces max_results_per_query and totalResults
+        checkpoint (RunCheckpoint): Every page is saved there; pages saved by an interrupted run are yielded again, not fetched
+    Yields:
+        list: JobListing records of one page
     """
 
-    current_queries = {}
-    group_results = []
+    if checkpoint is not None:
+        saved_query, saved_pages = checkpoint.load_pages(name)
+        for saved_page in saved_pages:
+            page_results = [JobListing.from_dict(listing) for listing in saved_page]
+            if planner is not None:
+                planner.record_page(name, page_results, cached=True)
+            yield page_results
+        if saved_query is not None:
+            query.update(saved_query)
+
+    while query['finished'] is not True:
+
+        if planner is not None and not planner.has_budget(name):
+            break
+
+        results = cache.get(query['name'], query['num_results'], sort=query.get('sort')) if cache is not None else None
+        cached = results is not None
+        attempts = []
+
+        if results is None:
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+
+            # Google Search Query
+            results = search_google(query['name'], settings.GOOGLE_API_KEY, settings.SEARCH_ENGINE_ID, start=query['num_results'],
+                                    sort=query.get('sort'), attempts=attempts)
+
+            # Only successful responses are cached (errors return a list)
+            if cache is not None and isinstance(results, dict):
+                cache.set(query['name'], query['num_results'], 10, results, sort=query.get('sort'))
+
+        # Accessing query items, appending it to every result found.
+        try:
+            print(f"Consulta de {name}: {results['search_results']} resultados.")
+            page_results = [JobListing.from_search_item(item, source=name) for item in results['items'][0]]
+        except:
+            print(f'Deu um erro no item: {query}')
+            # The failed call (and its retries) still spent quota
+            if planner is not None:
+                planner.record_failure(name, sum(attempts))
+            break
+
+        # Preparando para próximas iterações
+        if planner is not None:
+            query['finished'] = not planner.record_page(name, page_results, cached, api_calls=sum(attempts) or 1)
+            query['num_results'] += 10
+        elif (results['search_results'] > 10) & (query['num_results'] <= max_results_per_query):
+            query['num_results'] += 10
+        else:
+            query['num_results'] = results['search_results']
+            ## print(f"Acabaram consultas de: {name} ({query['num_results']} resultados)")
+            query['finished'] = True
+
+        if checkpoint is not None:
+            checkpoint.save_page(name, query, [listing.to_dict() for listing in page_results])
+        yield page_results
+
+def paginate_query(name, query, max_results_per_query, rate_limiter=None, cache=None, planner=None, checkpoint=None):
+    """
+    Returns:
+        list: JobListing records of every page of one ATS query (see iter_query_pages), in page order
+    """
+    return [result for page in iter_query_pages(name, query, max_results_per_query, rate_limiter, cache, planner, checkpoint) for result in page]
 
+###***********************************************************************************************************************###
+def build_query_states(queries):
     # Transform JSON structure for ATS queries
+    current_queries = {}
     for ats, base_query in queries.items():
 
         current_queries[ats] = {
@@ -113,38 +242,55 @@ def group_search(queries, max_results_per_query=30):
             'num_results': 1,
             'finished': False
         }
+    return current_queries
 
-    # Performing queries to each item in list of queries
-    for name, query in current_queries.items():
+###***********************************************************************************************************************###
+# Group searches Google Search Engine (optimized way)
+@instrumented('group_search', items_in=len, items_out=len)
+def group_search(queries, max_results_per_query=30, max_concurrency=None, rate_per_second=None, cache=None, planner=None, checkpoint=None):
+
+    """
+        Optimize Google Engine searches, avoiding 429 error callbacks.
+        ATS queries run concurrently (pages of a same query stay sequential), while a
+        token bucket keeps the global call rate under the API limit.
+    Args:
+        queries (dict): List of queries to be performed
+        max_results_per_query (int): Max items to be provided by google search, for a given query
+        max_concurrency (int): Queries paginated at the same time (default: SEARCH_MAX_CONCURRENCY)
+        rate_per_second (float): Google calls per second, across all queries (default: SEARCH_RATE_PER_SECOND)
+        cache (SearchCache): Persistent response cache, checked before every Google call
+        planner (QueryPlanner): Spends the daily budget by ATS yield (see query_planner.py)
+        checkpoint (RunCheckpoint): Saves every page, and skips the pages of an interrupted run (see checkpoint.py)
+    Returns:
+        list: JobListing records of potential job applications.
+              Results keep the queries.json order, whatever order the queries finish in.
+    """
+
+    group_results = []
+    max_concurrency = max_concurrency or SEARCH_MAX_CONCURRENCY
+    rate_limiter = TokenBucket(rate_per_second or SEARCH_RATE_PER_SECOND)
 
-        while query['finished'] is not True:
+    # Transform JSON structure for ATS queries
+    current_queries = build_query_states(queries)
 
-            # Google Search Query
-            results = search_google(query['name'], GOOGLE_API_KEY, SEARCH_ENGINE_ID, start=query['num_results'])
-
-            # Accessing query items, appending it to every result found.
-            try:
-                print(f"Consulta de {name}: {results['search_results']} resultados.")
-                for item in results['items'][0]:
-                    formatted = format_result(item)
-                    group_results.append(formatted)
-            except:
-                print(f'Deu um erro no item: {query}')
-                break
-
-            # Preparando para próximas iterações
-            if (results['search_results'] > 10) & (query['num_results'] <= max_results_per_query):
-                query['num_results'] += 10
-            else:
-                query['num_results'] = results['search_results']
-                ## print(f"Acabaram consultas de: {name} ({query['num_results']} resultados)")
-                query['finished'] = True
+    # Performing queries to each item in list of queries
+    per_query_results = ordered_map(
+        lambda entry: paginate_query(entry[0], entry[1], max_results_per_query, rate_limiter, cache, planner, checkpoint),
+        current_queries.items(),
+        max_workers=max_concurrency
+    )
+
+    for query_results in per_query_results:
+        group_results.extend(query_results)
     
     return group_results
 
 ###***********************************************************************************************************************###
 # Send messages to Dify Agents and Assistants
+@instrumented('send_to_dify_agent', items_out=lambda answer: 0 if answer is None else 1)
 def send_to_dify_agent(text, api_key, user, dify_url, response_mode='blocking'):
+    import requests  # Deferred, see search_google
+
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
@@ -157,10 +303,14 @@ def send_to_dify_agent(text, api_key, user, dify_url, response_mode='blocking'):
         "conversation_id": "",
         "user": user
     }
-    time.sleep(1)
+    DIFY_RATE_LIMITER.acquire()
 
     if response_mode == 'blocking':
-        response = requests.post(dify_url, headers=headers, json=data)
+        try:
+            response = http_client.post(dify_url, headers=headers, json=data, timeout=DIFY_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            print(f"Request failed: {e}")
+            return None
         if response.status_code == 200:
             result = response.json()
             # print("Dify Agent Response:\n", result.get("answer", result))
@@ -170,237 +320,311 @@ def send_to_dify_agent(text, api_key, user, dify_url, response_mode='blocking'):
             print(f'{json.loads(response.text)}')
             return None
     
-    # Streaming mode using sseclient-py
+    # Streaming mode: the answer chunks are collected in a list and joined once
     else:
-        full_response_text = ""
+        answer = []
         try:
-            # Create a session with the headers
-            session = requests.Session()
-            session.headers.update(headers)
-            
-            # Make the initial POST request to get the SSE stream
-            response = session.post(dify_url, json=data, stream=True)
-            if response.status_code != 200:
-                print(f"Error from Dify: {response.status_code}")
-                print(f'{response.text}')
-                return None
-
-            # Create SSEClient with the response
-            messages = SSEClient(response)
-            
-            # Process SSE events by iterating over messages.events()
-            for msg in messages.events():
-                try:
-                    if msg.data:
-                        event_data = json.loads(msg.data)
-                        
-                        # Handle different event types
-                        if event_data.get('event') == 'agent_message':
-                            text_content = event_data.get('answer', '')
-                            full_response_text += text_content
-                        elif event_data.get('event') == 'error':
-                            error_msg = event_data.get('answer', 'Unknown error')
-                            print(f"Streaming error: {error_msg}")
-                            return None
-                        elif event_data.get('event') == 'workflow_finished':
-                            # End of stream
-                            break
-                            
-                except json.JSONDecodeError as e:
-                    print(f"Error decoding JSON event: {e}")
-                    continue
-                except Exception as e:
-                    print(f"Error processing event: {e}")
-                    continue
-
-            return full_response_text
-
+            for _ in stream_dify_agent(text, api_key, user, dify_url, answer=answer, rate_limited=False):
+                pass
         except requests.exceptions.Timeout:
             print("Request timed out")
             return None
         except requests.exceptions.RequestException as e:
             print(f"Request failed: {e}")
             return None
+        except DifyStreamError as e:
+            print(f"Streaming error: {e}")
+            return None
         except Exception as e:
             print(f"Unexpected error: {e}")
             return None
+        return ''.join(answer)
 
-###***********************************************************************************************************************###
-## Parses JSON outputs from LLM
-def parse_llm_json(json_from_llm_output):
+@instrumented('stream_dify_agent')
+def stream_dify_agent(text, api_key, user, dify_url, answer=None, rate_limited=True):
     """
+        Send text to a Dify agent in streaming mode and yield every JSON object of its answer
+        as soon as it is complete (each item of a ```json list, see JsonBlockStream).
     Args:
-        json_from_llm_output (str): Text usually generated by LLMs for JSON structures
-    Output:
-        Object
+        answer (list): When given, receives the answer chunks (''.join(answer) is the full answer)
+        rate_limited (bool): Wait for DIFY_RATE_LIMITER before sending
+    Yields:
+        dict: Objects of the answer, in order
+    Raises:
+        DifyStreamError: When Dify answers with an error status or an 'error' event
+        requests.exceptions.RequestException: When the request fails
     """
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
 
-    parsed_data = []
-
-    # Regex to find all blocks starting with ```json and ending with ```
-    # It captures the content between these markers.
-    # The 's' flag makes '.' match newlines as well.
-    json_blocks = re.findall(r"```json\s*(.*?)\s*```", json_from_llm_output, re.DOTALL)
-
-    for block in json_blocks:
-        # Clean the block: remove any trailing commas and strip whitespace
-        cleaned_block = block.strip()
-        if cleaned_block.endswith(','):
-            cleaned_block = cleaned_block[:-1] # Remove the trailing comma
+    data = {
+        "inputs": {},
+        "query": text,
+        "response_mode": 'streaming',
+        "conversation_id": "",
+        "user": user
+    }
+    if rate_limited:
+        DIFY_RATE_LIMITER.acquire()
 
-        try:
-            # Additional cleaning steps for common JSON issues
-            # Replace invalid escape sequences with spaces
-            cleaned_block = re.sub(r'\\[^"\\/bfnrtu]', ' ', cleaned_block)
-            # Replace \xa0 with space
-            cleaned_block = cleaned_block.replace('\\xa0', ' ')
-            # Replace other common problematic characters
-            cleaned_block = cleaned_block.replace('\\u00a0', ' ')
-            cleaned_block = cleaned_block.replace('\\u2014', '-')
-            cleaned_block = cleaned_block.replace('\\u2013', '-')
-            cleaned_block = cleaned_block.replace('\\u2019', "'")
-            cleaned_block = cleaned_block.replace('\\u2018', "'")
-            cleaned_block = cleaned_block.replace('\\u201c', '"')
-            cleaned_block = cleaned_block.replace('\\u201d', '"')
-            
-            # Remove any remaining invalid escape sequences
-            cleaned_block = re.sub(r'\\(?!["\\/bfnrtu])', '', cleaned_block)
-
-            # Parse the cleaned JSON string
-            json_object = json.loads(cleaned_block)
-            parsed_data.append(json_object)
-        except json.JSONDecodeError as e:
-            print(f"Erro ao decodificar JSON: {e}")
-            print(f"Bloco problemático: \n---\n{cleaned_block}\n---")
-            # Try to fix common JSON formatting issues
-            try:
-                # Remove any remaining invalid characters
-                cleaned_block = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', cleaned_block)
-                # Try parsing again
-                json_object = json.loads(cleaned_block)
-                parsed_data.append(json_object)
-            except json.JSONDecodeError as e2:
-                print(f"Falha na segunda tentativa de decodificação: {e2}")
-                continue
-
-    # Optionally, extract the summary text if it's always at the end after all JSON blocks
-    # summary_match = re.search(r"```\s*(Resumo das vagas:.*?)\s*$", json_from_llm_output, re.DOTALL)
-    #summary_text = summary_match.group(1).strip() if summary_match else None
-
-    return parsed_data
+    # Shared keep-alive session; the response is closed even when the consumer stops early
+    response = http_client.post(dify_url, headers=headers, json=data, stream=True, timeout=DIFY_TIMEOUT)
+    try:
+        if response.status_code != 200:
+            raise DifyStreamError(f"Error from Dify: {response.status_code} {response.text}")
+
+        blocks = JsonBlockStream()
+        for chunk in iter_answer_chunks(response):
+            if answer is not None:
+                answer.append(chunk)
+            yield from blocks.feed(chunk)
+        yield from blocks.close()
+    finally:
+        response.close()
 
 ###***********************************************************************************************************************###
 def analyze_text_for_tokens(text, tokens_pt, tokens_en):
     """
-    Analyze text for matching tokens and return detailed results
+    Analyze text for matching tokens and return detailed results.
+    Tokens are compiled once per vocabulary (see token_matcher.py) and matched in a single pass.
     """
-    text_lower = text.lower()
-    matches = {
-        'pt': [],
-        'en': [],
-        'total': 0
-    }
-    
-    # Check Portuguese tokens
-    for token in tokens_pt:
-        if token.lower() in text_lower:
-            matches['pt'].append(token)
-            matches['total'] += 1
-    
-    # Check English tokens
-    for token in tokens_en:
-        if token.lower() in text_lower:
-            matches['en'].append(token)
-            matches['total'] += 1
-    
-    return matches
+    return get_matcher(tokens_pt, tokens_en).match(text)
 
 ###***********************************************************************************************************************###
-def filter_job_listings(raw_job_listings, save=False, min_tokens=1):
+# With profiles the result is a dict of profile name -> kept listings: the listings are counted, not the profiles
+@instrumented('filter_job_listings', items_in=len, profile=True,
+              items_out=lambda kept: sum(len(listings) for listings in kept.values()) if isinstance(kept, dict) else len(kept))
+def filter_job_listings(raw_job_listings, save=False, min_tokens=1, batch=False, rank=False, profiles=None):
     """
         Filter raw job listings based on token matches.
+        With `profiles`, every listing is folded once and scored against each profile in the same
+        pass; each profile gets copies of the listings it keeps, with its own token analysis, and the
+        raw listings keep the analysis of the profile they score best with (run archive).
         Args:
-            raw_job_listings (dict): List of raw job listings saved in "output/job_results.json"
+            raw_job_listings (list): Raw JobListing records (as saved in "output/job_results.json")
             save (bool): Whether to save the filtered job listings to a file.
-            min_tokens (int): Minimum number of tokens to match.
+            min_tokens (float): Relevance score a listing must exceed: the sum of the weights of the profile
+                                tokens it matches (see profile_index.py, tokens weigh 1.0 unless listed in
+                                profile_token_weights).
+            batch (bool): Score the whole batch with a sparse matrix of the profile index entries (see
+                          batch_scoring.py), same scores and listings kept. Meant for backfills.
+            rank (bool): In batch mode, sort the filtered listings by relevance score.
+            profiles (list): Profile records (see profiles.py), each filtering with its own tokens, weights
+                             and min_score. Not available in batch mode.
         Returns:
-            dict: Filtered job listings.
+            list: Filtered job listings, with their token analysis set.
+                  With `profiles`, a dict: profile name -> filtered job listings of the profile.
+        Raises:
+            ValueError: When both `profiles` and `batch` are given
     """
+    if profiles is not None and batch:
+        raise ValueError("Batch mode scores the default vocabulary only: filter with profiles one listing at a time")
+    if profiles is not None:
+        filtered_by_profile = {profile.name: [] for profile in profiles}
+        for listing in raw_job_listings:
+            folded = fold(listing.text)
+            best = None
+            for profile in profiles:
+                token_matches = profile.index.match(folded, folded=True)
+                if best is None or token_matches['score'] > best['score']:
+                    best = token_matches
+                if token_matches['score'] > profile.min_score:
+                    filtered_by_profile[profile.name].append(dataclasses.replace(
+                        listing, matches_pt=token_matches['pt'], matches_en=token_matches['en'],
+                        total_matches=token_matches['total'], relevance_score=token_matches['score'],
+                    ))
+            listing.matches_pt, listing.matches_en = best['pt'], best['en']
+            listing.total_matches, listing.relevance_score = best['total'], best['score']
+
+        if save:
+            with open('output/job_results_filtered.json', 'w', encoding='utf-8') as f:
+                json.dump({name: [listing.to_dict() for listing in listings] for name, listings in filtered_by_profile.items()},
+                          f, indent=2, ensure_ascii=False)
+        return filtered_by_profile
+
+    if batch:
+        # Imported here: NumPy/SciPy are only needed for backfills
+        from batch_scoring import score_listings
+
+        filtered_job_listings = score_listings(raw_job_listings, profile_tokens_pt, profile_tokens_en, profile_token_weights,
+                                               min_score=min_tokens, rank=rank)
+        if save:
+            with open('output/job_results_filtered.json', 'w', encoding='utf-8') as f:
+                json.dump([listing.to_dict() for listing in filtered_job_listings], f, indent=2, ensure_ascii=False)
+        return filtered_job_listings
+
+    # Accent/case-folded, whole-word, weighted index of the profile tokens, cached on disk
+    index = get_index(profile_tokens_pt, profile_tokens_en, profile_token_weights)
 
     # Process each listing
     for listing in raw_job_listings:
-        # Combine title and snippet for analysis
-        text_to_check = f"{listing['Title']} {listing['Snippet']}"
+        # Analyze title and snippet for tokens
+        token_matches = index.match(listing.text)
         
-        # Analyze text for tokens
-        token_matches = analyze_text_for_tokens(text_to_check, profile_tokens_pt, profile_tokens_en)
-        
-        # Add analysis results to listing
-        listing['token_analysis'] = {
-            'matches_pt': token_matches['pt'],
-            'matches_en': token_matches['en'],
-            'total_matches': token_matches['total']
-        }
-        
-        # Add remove flag (True if no tokens found)
-        listing['remove'] = token_matches['total'] == 0
+        # Add analysis results to listing (serialized with a 'remove' flag when no tokens are found)
+        listing.matches_pt = token_matches['pt']
+        listing.matches_en = token_matches['en']
+        listing.total_matches = token_matches['total']
+        listing.relevance_score = token_matches['score']
 
     # Print detailed results
     # print(f"Total listings: {len(raw_job_listings)}")
     # print(f"Listings to remove: {sum(1 for listing in raw_job_listings if listing['remove'])}")
     # print(f"Listings to keep: {sum(1 for listing in raw_job_listings if not listing['remove'])}")
 
-    # Filter job listings that has at least two token matches
-    filtered_job_listings = [job for job in raw_job_listings if job['token_analysis']['total_matches'] > min_tokens]
+    # Filter job listings scoring above the threshold (with default weights: at least two token matches)
+    filtered_job_listings = [job for job in raw_job_listings if job.relevance_score > min_tokens]
 
     # Save updated listings
     if save:
         with open('output/job_results_filtered.json', 'w', encoding='utf-8') as f:
-            json.dump(filtered_job_listings, f, indent=2, ensure_ascii=False)
+            json.dump([listing.to_dict() for listing in filtered_job_listings], f, indent=2, ensure_ascii=False)
 
     return filtered_job_listings
 
+###***********************************************************************************************************************###
+def build_screening_prompt(formatted_listings):
+    # Create screening prompt with formatted listings
+    return f"""Please analyze these job listings and provide insights on their relevance and fit.
+    ---
+    {chr(10).join(formatted_listings)}
+    """
+
+###***********************************************************************************************************************###
+@instrumented('screen_listings', items_in=len, items_out=len)
+def screen_listings(listings, screening_cache=None, chunked=True, compactor=None, profile=None, failed=None):
+    """
+        Screen listings with the Dify screening agent, sending only the listings without a cached verdict.
+    Args:
+        listings (list): Filtered job listings
+        screening_cache (ScreeningCache): Verdicts of previous runs (None disables the cache)
+        chunked (bool): Split into concurrent token-budgeted chunks (see screen_in_chunks), or send as one batch
+        compactor (PromptCompactor): Compacts the listings and fits them into the run token budget
+                                     (see prompt_compaction.py). None sends them whole.
+        profile (Profile): Profile whose screening agent is called (default: DIFY_API_KEY)
+        failed (set): When given, receives the URLs of the listings whose screening failed every attempt
+                      (not to be marked seen: they are screened again on the next run)
+    Returns:
+        list: Screened jobs, cached verdicts first
+    """
+    api_key = profile.dify_api_key if profile is not None else settings.DIFY_API_KEY
+    agent = agent_identity(api_key, settings.DIFY_AGENT_URL, SCREENING_PROMPT_VERSION)
+    cached, to_screen = screening_cache.lookup(listings, agent, 'screening') if screening_cache else ([], listings)
+    if not to_screen:
+        return cached
+
+    def screen_chunk(chunk):
+        return send_to_dify_agent(build_screening_prompt(chunk), api_key, settings.DIFY_USER, settings.DIFY_AGENT_URL)
+
+    if compactor is not None:
+        sent = []
+        formatted_listings = compactor.fit(to_screen, kept_listings=sent)
+        if not formatted_listings:
+            return cached
+    else:
+        sent = to_screen
+        formatted_listings = [listing.screening_text() for listing in to_screen]
+    failed_positions = []
+    if chunked:
+        screened = screen_in_chunks(formatted_listings, screen_chunk, failed=failed_positions)
+    else:
+        screened = screen_chunk_with_retries(formatted_listings, screen_chunk)
+        if screened is None:
+            failed_positions, screened = range(len(sent)), []
+    if failed is not None:
+        failed.update(sent[position].url for position in failed_positions)
+    if compactor is not None:
+        # The agent echoes the listing IDs: URLs again before the cache (or anything else) reads the jobs
+        compactor.restore(screened)
+
+    if screening_cache:
+        screening_cache.store(to_screen, screened, agent, 'screening', url_field='link')
+    return cached + screened
+
+@instrumented('iter_job_analyses', items_in=len)
+def iter_job_analyses(jobs, listings, screening_cache=None, answer=None, strict=False, profile=None):
+    """
+        Yield the seeker agent analysis of every screened job: cached analyses first, then the others
+        as soon as the streaming answer completes each one. Jobs whose analysis is cached are not sent.
+    Args:
+        jobs (list): Screened jobs (with 'link')
+        listings (list): Listings the jobs come from, used as cache keys
+        screening_cache (ScreeningCache): Verdicts of previous runs (None disables the cache)
+        answer (list): When given, receives the raw seeker answer chunks
+        strict (bool): Raise when the agent call fails, instead of ending with the analyses received so far
+        profile (Profile): Profile whose seeker agent is called (default: DIFY_API_KEY_SEEKER)
+    Yields:
+        dict: Job analyses ('EMPRESA', 'CLASSIFICAÇÃO', 'ANÁLISE', 'RECOMENDAÇÃO', 'URL')
+    """
+    api_key = profile.dify_api_key_seeker if profile is not None else settings.DIFY_API_KEY_SEEKER
+    agent = agent_identity(api_key, settings.DIFY_AGENT_URL, SCREENING_PROMPT_VERSION)
+    to_analyze = jobs
+
+    if screening_cache:
+        screened_urls = {canonical_url(str(job.get('link', ''))) for job in jobs}
+        screened_listings = [listing for listing in listings if canonical_url(listing.url) in screened_urls]
+        cached, missing = screening_cache.lookup(screened_listings, agent, 'analysis')
+        cached_urls = {canonical_url(listing.url) for listing in screened_listings} - {canonical_url(listing.url) for listing in missing}
+        to_analyze = [job for job in jobs if canonical_url(str(job.get('link', ''))) not in cached_urls]
+        yield from cached
+
+    if not to_analyze:
+        return
+
+    import requests  # Deferred, see search_google
+
+    analyses = []
+    try:
+        for analysis in stream_dify_agent(parse_ai_screening_results(to_analyze), api_key, settings.DIFY_USER, settings.DIFY_AGENT_URL, answer=answer):
+            analyses.append(analysis)
+            yield analysis
+    except (requests.exceptions.RequestException, DifyStreamError) as e:
+        print(f"Falha na análise das vagas: {e}")
+        if strict:
+            raise
+    finally:
+        if screening_cache:
+            screening_cache.store(listings, analyses, agent, 'analysis', url_field='URL')
+
+def unanalyzed_urls(jobs, analyses):
+    """
+    Returns:
+        set: Canonical URLs of the screened jobs with no analysis among `analyses` (see iter_job_analyses)
+    """
+    analyzed = {canonical_url(str(job_analysis.get('URL', ''))) for job_analysis in analyses if isinstance(job_analysis, dict)}
+    return {canonical_url(str(job.get('link', ''))) for job in jobs} - analyzed
+
 ###***********************************************************************************************************************###
 def parse_ai_screening_results(json_content):
     """
     Parse the AI screening results from JSON format into a readable text format.
     
     Args:
-        json_content (str): The JSON content from ai_screening.json
+        json_content (str|list): The JSON content from ai_screening.json
         
     Returns:
         str: Formatted text containing the job listings
     """
     try:
-        # If the content is already a string, try to parse it directly
-        if isinstance(json_content, str):
-            # Remove the ```json wrapper if present
-            if json_content.startswith('```json'):
-                json_content = json_content[7:]
-            if json_content.endswith('```'):
-                json_content = json_content[:-3]
-            
-            # Clean up escaped characters
-            json_content = json_content.replace('\\n', ' ').replace('\\xa0', ' ')
-            json_content = json_content.strip()
-            
-            # Parse the JSON content
-            job_listings = json.loads(json_content)
-        else:
-            # If it's already a parsed JSON object, use it directly
-            job_listings = json_content
+        # Strings are unwrapped from ```json and parsed; an already parsed object (e.g. the
+        # merged chunks of screen_in_chunks) is used directly
+        job_listings = screening_items(json_content) if isinstance(json_content, str) else json_content
         
-        # Format each job listing
-        formatted_text = "AI Screening Results:\n\n"
+        # Format each job listing (parts joined once: repeated concatenation is quadratic on merged archives, see rescreen.py)
+        formatted_parts = ["AI Screening Results:\n\n"]
         for idx, job in enumerate(job_listings, 1):
-            formatted_text += f"Job #{idx}\n"
-            formatted_text += f"Title: {job['title']}\n"
-            formatted_text += f"Fit Score: {job['fit_score']}/100\n"
-            formatted_text += f"Description: {job['snippet']}\n"
-            formatted_text += f"Link: {job['link']}\n"
-            formatted_text += "-" * 80 + "\n\n"
+            formatted_parts.append(
+                f"Job #{idx}\n"
+                f"Title: {job['title']}\n"
+                f"Fit Score: {job['fit_score']}/100\n"
+                f"Description: {job['snippet']}\n"
+                f"Link: {job['link']}\n"
+                + "-" * 80 + "\n\n"
+            )
             
-        return formatted_text
+        return ''.join(formatted_parts)
         
     except json.JSONDecodeError as e:
         print(f"Error parsing JSON content: {e}")
@@ -410,7 +634,15 @@ def parse_ai_screening_results(json_content):
         return None
 
 ############################################# MAIN ###################################################
-def main():
+def main(refresh=False, prometheus_path=None, state_dir=None, resume=False):
+    """
+        Staged run: search -> token filter -> dedupe -> screening -> analysis -> Trello.
+        Every stage output (and every search page) is checkpointed under the run id; with resume=True
+        the last unfinished run of the day picks up from its first incomplete stage (see checkpoint.py).
+    """
+    ## Every credential checked before any API call: a missing one fails here, not after the searches
+    profiles = load_profiles()
+    settings.require(*GOOGLE_SETTINGS, *DIFY_SETTINGS, *TRELLO_SETTINGS, *profile_settings(profiles))
 
     # """
     # NO API CALL SECTION (FOR DEV PURPOSES) - 31/05
@@ -420,22 +652,14 @@ def main():
     
     # # Load job listings
     # with open('output/job_results.json', 'r', encoding='utf-8') as f:
-    #     job_listings = json.load(f)
+    #     job_listings = [JobListing.from_dict(listing) for listing in json.load(f)]
 
     # #### Filtering:
     # #### 1. Filtering by tokenized words from CV
     # filtered_job_listings = filter_job_listings(job_listings, save=False, min_tokens=1)
 
     # # Format job listings into readable format for AIs
-    # formatted_listings = []
-    # for listing in filtered_job_listings:
-
-    #     formatted_listings.append(
-    #         f"Title: {listing['Title']} §"
-    #         f"URL: {listing['URL']} §"
-    #         f"Snippet: {listing['Snippet']} §"
-    #         "---"
-    #     )
+    # formatted_listings = [listing.screening_text() for listing in filtered_job_listings]
 
     # # Saving filtered job listings to a file
     # with open('output/formmatted_job_listings.json', 'w', encoding='utf-8') as f:
@@ -456,7 +680,7 @@ def main():
     # with open('output/job_analysis.json', 'r', encoding='utf-8') as f:
     #     response = json.load(f)
 
-    # parsed_json = parse_llm_json(response)[0]
+    # parsed_json = extract_json_blocks(response)[0]
     
     """********************************************
             PRODUCTION CODE SECTION - 31/05
@@ -466,97 +690,353 @@ def main():
 
     ## TEMPORARY SECTION: USED TO AVOID GOOGLE SEARCHING DURING DEV    
     ## (26/05/2025): Testing a group function
-    all_results = group_search(queries) ## DESCOMENTAR P/ PERFORMAR NOVAS BUSCAS
+    search_cache, seen_index, screening_cache, run_archive = open_run_state(state_dir, refresh)
+    checkpoint_dir = os.path.join(state_dir, 'checkpoints') if state_dir else None
+
+    ## Resuming the last interrupted run, when asked (and there is one), or starting a new one
+    checkpoint = RunCheckpoint.latest(checkpoint_dir) if resume else None
+    if checkpoint is not None and run_archive.resume_run(checkpoint.run_id):
+        run_id = checkpoint.run_id
+        checkpoint.print_status()
+    else:
+        if resume:
+            print("[checkpoint] Nenhuma execução interrompida para retomar, iniciando uma nova")
+        run_id = run_archive.start_run('staged')
+        checkpoint = RunCheckpoint.create(run_id, checkpoint_dir)
+
+    if checkpoint.done('search'):
+        job_listings = [JobListing.from_dict(listing) for listing in checkpoint.load('search')]
+    else:
+        ## Pages per ATS planned from past yields, within what is left of today's Google budget
+        planner = QueryPlanner(
+            queries, run_archive.search_history(PLANNER_HISTORY_DAYS, min(profile.min_score for profile in profiles)),
+            budget=SEARCH_DAILY_BUDGET - run_archive.api_calls_today(), known=seen_index.__contains__
+        )
+        planner.print_plan()
+        job_listings = group_search(queries, cache=search_cache, planner=planner, checkpoint=checkpoint) ## DESCOMENTAR P/ PERFORMAR NOVAS BUSCAS
+        planner.print_usage()
+        run_archive.record_search_usage(run_id, planner.plan, planner.usage)
+        checkpoint.save('search', [listing.to_dict() for listing in job_listings])
     os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
     
     ## New section: Write results as JSON
     json_output_path = os.path.join(os.path.dirname(__file__), '../output/job_results.json')
-    job_listings = []
-    for result in all_results:
-        lines = result.strip().split('\n')
-        if len(lines) >= 3:
-            title = lines[0].replace('Title: ', '')
-            url = lines[1].replace('URL: ', '')
-            snippet = lines[2].replace('Snippet: ', '')
-            job_listings.append({
-                "Title": title,
-                "URL": url,
-                "Snippet": snippet
-            })
     
     ### For log purposes
     with open(json_output_path, 'w', encoding='utf-8') as f:
-        f.write(json.dumps(job_listings, indent=2))
+        f.write(json.dumps([listing.to_dict() for listing in job_listings], indent=2))
     print(f"Search results written to {json_output_path}")
 
-    ### Filtering:
-    ### 1. Filtering by tokenized words from CV
-    filtered_job_listings = filter_job_listings(job_listings, save=False, min_tokens=1)
-
-    # Format job listings into readable format for AIs
-    formatted_listings = []
-    for listing in filtered_job_listings:
-
-        formatted_listings.append(
-            f"Title: {listing['Title']} §"
-            f"URL: {listing['URL']} §"
-            f"Snippet: {listing['Snippet']} §"
-            "---"
-        )
-
-    # Saving filtered job listings to a file
-    with open('output/formmatted_job_listings.json', 'w', encoding='utf-8') as f:
-        json.dump(formatted_listings, f, indent=2, ensure_ascii=False)
-
-    # Create screening prompt with formatted listings
-    screening_prompt = f"""Please analyze these job listings and provide insights on their relevance and fit.
-    ---
-    {chr(10).join(formatted_listings)}
-    """
-
-    ## (30/05) - RESPONSE COMMENTED TO REDUCE API CONSUMPTION. UNCOMMENT WHEN IN PRD
-    response = send_to_dify_agent(screening_prompt, DIFY_API_KEY, DIFY_USER, DIFY_AGENT_URL)
+    if checkpoint.done('filtered'):
+        filtered = checkpoint.load('filtered')
+        job_listings = [JobListing.from_dict(listing) for listing in filtered['new']]
+        filtered_by_profile = {
+            name: [JobListing.from_dict(listing) for listing in listings] for name, listings in filtered['filtered'].items()
+        }
+    else:
+        ### Every raw listing goes to the run archive, completed below as the run goes on
+        run_archive.record_listings(run_id, job_listings)
+
+        ### Dropping postings already processed in previous runs (marked as seen once this run succeeds)
+        job_listings, already_seen = seen_index.filter_new(job_listings)
+        print(f"{already_seen} vagas descartadas por já terem sido vistas, {len(job_listings)} novas")
+
+        ### Filtering:
+        ### 1. Filtering by tokenized words from CV, for every profile in a single pass
+        filtered_by_profile = filter_job_listings(job_listings, save=False, profiles=profiles)
+        run_archive.record_listings(run_id, job_listings)
+
+        ### 2. Collapsing near-duplicates (same role posted on several boards) to one representative
+        for profile in profiles:
+            filtered_by_profile[profile.name], collapsed = collapse_near_duplicates(filtered_by_profile[profile.name])
+            label = f"[{profile.name}] " if len(profiles) > 1 else ''
+            print(f"{label}{collapsed} vagas quase duplicadas agrupadas, {len(filtered_by_profile[profile.name])} seguem para triagem")
+        checkpoint.save('filtered', {
+            'new': [listing.to_dict() for listing in job_listings],
+            'filtered': {name: [listing.to_dict() for listing in listings] for name, listings in filtered_by_profile.items()},
+        })
+
+    ## Listings compacted (boilerplate, URLs as IDs) and fitted to the run token budget, shared by every
+    ## profile; deferred ones are not marked seen
+    compactor = PromptCompactor()
+    ## Listings of screening chunks that failed every retry, any profile: not marked seen, screened again on the next run
+    failed_urls = set()
+
+    def run_profile(profile, filtered_job_listings):
+        # Stages and output files of every profile apart ('' suffix with a single profile: the usual names)
+        suffix = profile_suffix(profile, profiles)
+
+        # Format job listings into readable format for AIs
+        formatted_listings = [listing.screening_text() for listing in filtered_job_listings]
+
+        # Saving filtered job listings to a file
+        with open(profile_path('output/formmatted_job_listings.json', profile, profiles), 'w', encoding='utf-8') as f:
+            json.dump(formatted_listings, f, indent=2, ensure_ascii=False)
+
+        ## (30/05) - RESPONSE COMMENTED TO REDUCE API CONSUMPTION. UNCOMMENT WHEN IN PRD
+        ## Screening in token-budgeted chunks, screened concurrently and merged into a single list of jobs.
+        ## Listings screened in previous runs reuse their cached verdicts.
+        if checkpoint.done(f'screening{suffix}'):
+            screening = checkpoint.load(f'screening{suffix}')
+            response = screening['jobs']
+            compactor.deferred.update(screening['deferred'])
+        else:
+            profile_failed = set()
+            response = screen_listings(filtered_job_listings, screening_cache, compactor=compactor, profile=profile, failed=profile_failed)
+            run_archive.record_screening(run_id, response)
+            if profile_failed:
+                ## Only calls or answers that failed every retry land here, never listings the agent rejected.
+                ## Not a completed stage: the profile stops here and --resume screens it again (the verdicts
+                ## of the successful chunks are cached, only the failed ones reach the agent)
+                failed_urls.update(profile_failed)
+                print(f"{len(profile_failed)} vagas sem triagem: análise e cards deste perfil ficam para o --resume")
+                return
+            checkpoint.save(f'screening{suffix}', {'jobs': response, 'deferred': sorted(compactor.deferred)})
+
+        ## Write AI screening response to JSON file
+        ai_screen_output_path = profile_path(AI_SCREEN_OUTPUT_PATH, profile, profiles)
+        os.makedirs(os.path.dirname(ai_screen_output_path), exist_ok=True)
+        with open(ai_screen_output_path, 'w', encoding='utf-8') as f:
+            json.dump(response, f, indent=2, ensure_ascii=False)
+        print(f"AI screening results written to {ai_screen_output_path}")
+
+        ## (30/05) - RESPONSE COMMENTED TO REDUCE API CONSUMPTION. UNCOMMENT WHEN IN PRD
+        ## A failed analysis stops the run here: --resume retries it without searching or screening again
+        if checkpoint.done(f'analysis{suffix}'):
+            analysis = checkpoint.load(f'analysis{suffix}')
+            parsed_json, listings_analysis = analysis['analyses'], analysis['answer']
+        else:
+            analysis_answer = []
+            parsed_json = list(iter_job_analyses(response, filtered_job_listings, screening_cache, answer=analysis_answer, strict=True, profile=profile))
+            listings_analysis = ''.join(analysis_answer) or None
+            run_archive.record_analyses(run_id, parsed_json)
+            checkpoint.save(f'analysis{suffix}', {'analyses': parsed_json, 'answer': listings_analysis})
 
-    ## Write AI screening response to JSON file
-    os.makedirs(os.path.dirname(AI_SCREEN_OUTPUT_PATH), exist_ok=True)
-    with open(AI_SCREEN_OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(response, f, indent=2, ensure_ascii=False)
-    print(f"AI screening results written to {AI_SCREEN_OUTPUT_PATH}")
+        ## Write AI screening response to JSON file
+        job_analysis_output_path = profile_path(JOB_ANALYSIS_OUTPUT_PATH, profile, profiles)
+        os.makedirs(os.path.dirname(job_analysis_output_path), exist_ok=True)
 
-    parsed_json = parse_ai_screening_results(response)
+        with open(job_analysis_output_path, 'w', encoding='utf-8') as f:
+            json.dump(listings_analysis, f, indent=2, ensure_ascii=False)
 
-    ## (30/05) - RESPONSE COMMENTED TO REDUCE API CONSUMPTION. UNCOMMENT WHEN IN PRD
-    listings_analysis = send_to_dify_agent(parsed_json, DIFY_API_KEY_SEEKER, DIFY_USER, DIFY_AGENT_URL, response_mode='streaming')
+        print(f"Job analysis written into {job_analysis_output_path}")
 
-    ## Write AI screening response to JSON file
-    os.makedirs(os.path.dirname(JOB_ANALYSIS_OUTPUT_PATH), exist_ok=True)
-       
-    with open(JOB_ANALYSIS_OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(listings_analysis, f, indent=2, ensure_ascii=False)
+        """********************************************
+              [END] PRODUCTION CODE SECTION - 31/05
+        ********************************************"""
 
-    parsed_json = parse_llm_json(listings_analysis)[0]
+        recomendados = ['INVESTIGAR MAIS', 'CANDIDATAR-SE']
 
-    print(f"Job analysis written into {JOB_ANALYSIS_OUTPUT_PATH}")
+        try:
+            trello_cards = [job for job in parsed_json if job['RECOMENDAÇÃO'] in recomendados]
+
+            # Create Trello cards for recommended jobs in the profile list (jobs with a card already are skipped, see TrelloSync)
+            if checkpoint.done(f'trello{suffix}'):
+                print("\nTrello cards already created by this run")
+            elif trello_cards:
+                print(f"\nCreating Trello cards for {len(trello_cards)} recommended jobs...")
+                created_cards = create_trello_cards_from_jobs(trello_cards, list_id=profile.list_id, board_id=profile.board_id)
+                print(f"Successfully created {len(created_cards)} Trello cards")
+                checkpoint.save(f'trello{suffix}', [card.get('id') for card in created_cards])
+            else:
+                print("\nNo jobs to create Trello cards for")
+                checkpoint.save(f'trello{suffix}', [])
 
-    """********************************************
-          [END] PRODUCTION CODE SECTION - 31/05
-    ********************************************"""
+        except Exception as e:
+            print(f'Failed to create trello cards: {e}')
+
+    for profile in profiles:
+        if len(profiles) > 1:
+            print(f"\n[perfil] {profile.name}: {len(filtered_by_profile.get(profile.name, []))} vagas filtradas")
+        run_profile(profile, filtered_by_profile.get(profile.name, []))
+    compactor.print_report()
+
+    seen_index.mark_seen([listing for listing in job_listings if listing.url not in compactor.deferred and listing.url not in failed_urls])
+    seen_index.close()
+    if failed_urls:
+        ## The run stays unfinished (checkpoint and archive), so --resume picks it up from the failed screening
+        run_archive.close()
+        screening_cache.close()
+        raise ScreeningError(f"Triagem falhou para {len(failed_urls)} vagas após todas as tentativas, retome com --resume")
+    run_archive.finish_run(run_id)
+    run_archive.close()
+    checkpoint.finish()
+
+    search_cache.print_stats()
+    screening_cache.print_stats()
+    screening_cache.close()
+    http_client.print_connection_stats()
+    instrumentation.print_report(instrumentation.write_report(prometheus_path=prometheus_path, run_id=run_id, mode='staged', compaction=compactor.report()))
+
+############################################# STREAMING MAIN ###################################################
+def main_streaming(refresh=False, prometheus_path=None, state_dir=None):
+    """
+        Same stages as main(), as a streaming pipeline: search -> token filter -> dedupe -> screening
+        -> analysis -> Trello. Every listing moves on as soon as its stage is done, bounded queues
+        between stages keep memory flat, and the first card is created long before the last search page.
+        With several profiles, the token filter fans every listing out to the profiles keeping it, and
+        the later stages carry (profile, item) pairs.
+    """
+    profiles = load_profiles()
+    settings.require(*GOOGLE_SETTINGS, *DIFY_SETTINGS, *TRELLO_SETTINGS, *profile_settings(profiles))
 
+    queries = load_queries(QUERIES_PATH)
+    search_cache, seen_index, screening_cache, run_archive = open_run_state(state_dir, refresh)
+    near_duplicates = {profile.name: NearDuplicateIndex() for profile in profiles}
+    run_id = run_archive.start_run('streaming')
+    planner = QueryPlanner(
+        queries, run_archive.search_history(PLANNER_HISTORY_DAYS, min(profile.min_score for profile in profiles)),
+        budget=SEARCH_DAILY_BUDGET - run_archive.api_calls_today(), known=seen_index.__contains__
+    )
+    planner.print_plan()
+    rate_limiter = TokenBucket(SEARCH_RATE_PER_SECOND)
+    # One sync per board: board cards fetched on the first job, jobs with a card already are skipped
+    trello_syncs = {board_id: TrelloSync(board_id=board_id) for board_id in dict.fromkeys(profile.board_id for profile in profiles)}
+    compactor = PromptCompactor()  # One token budget for every batch of the run
     recomendados = ['INVESTIGAR MAIS', 'CANDIDATAR-SE']
+    counters = Counter()
+    failed_urls, failed_lock = set(), threading.Lock()  # Listings of failed screening batches, any profile
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
 
-    try:
-        trello_cards = [job for job in parsed_json if job['RECOMENDAÇÃO'] in recomendados]
-
-        # Create Trello cards for recommended jobs
-        if trello_cards:
-            print(f"\nCreating Trello cards for {len(trello_cards)} recommended jobs...")
-            created_cards = create_trello_cards_from_jobs(trello_cards)
-            print(f"Successfully created {len(created_cards)} Trello cards")
-        else:
-            print("\nNo jobs to create Trello cards for")
-
-    except Exception as e:
-        print(f'Failed to create trello cards: {e}')
+    def search(entry):
+        name, query = entry
+        for page in iter_query_pages(name, query, 30, rate_limiter, search_cache, planner):
+            yield from page
+
+    def token_filter(listing):
+        kept = filter_job_listings([listing], save=False, profiles=profiles)
+        run_archive.record_listings(run_id, [listing])
+        if not any(kept.values()):
+            # Rejected by every profile for good: no need to look at it again tomorrow
+            seen_index.mark_seen([listing])
+            return
+        # Checked before the fan-out: once a profile screens the listing it is seen, the others must still get it
+        if listing.url in seen_index:
+            counters['already_seen'] += 1
+            return
+        for profile in profiles:
+            for profile_listing in kept[profile.name]:
+                yield profile, profile_listing
+
+    def dedupe(item):
+        profile, listing = item
+        if near_duplicates[profile.name].add(listing) is not None:
+            counters['near_duplicates'] += 1
+            return
+        yield item
+
+    def screening(batch):
+        # Batches are per profile (see the batch stage): screened with the profile agent
+        profile, listings = batch[0][0], [listing for _, listing in batch]
+        batch_failed = set()
+        jobs = screen_listings(listings, screening_cache, chunked=False, compactor=compactor, profile=profile, failed=batch_failed)
+        run_archive.record_screening(run_id, jobs)
+        if batch_failed:
+            # Not marked seen by the later batches of other profiles either: tried again on the next run
+            with failed_lock:
+                failed_urls.update(batch_failed)
+        if jobs:
+            # Marked seen by the analysis stage, once the analyses came back
+            yield profile, jobs, listings
+        elif not batch_failed:
+            # The agent kept none of them: nothing to analyze, done with the batch
+            with failed_lock:
+                seen_index.mark_seen([listing for listing in listings if listing.url not in compactor.deferred and listing.url not in failed_urls])
+
+    def analysis(screened):
+        # Every analysis goes on to Trello as soon as the agent finishes writing it
+        profile, jobs, batch = screened
+        analyses = []
+        for job_analysis in iter_job_analyses(jobs, batch, screening_cache, profile=profile):
+            analyses.append(job_analysis)
+            run_archive.record_analyses(run_id, [job_analysis])
+            yield profile, job_analysis
+        # Only listings done with are marked: a failed batch, a listing over the budget or a job left without
+        # analysis (failed or cut-off seeker stream) is tried again on the next run
+        missing = unanalyzed_urls(jobs, analyses)
+        with failed_lock:
+            seen_index.mark_seen([listing for listing in batch if listing.url not in compactor.deferred
+                                  and listing.url not in failed_urls and canonical_url(listing.url) not in missing])
+
+    # Yields the job when its card was created (the trello stage output count is the number of cards)
+    def trello(item):
+        profile, job = item
+        if job.get('RECOMENDAÇÃO') in recomendados and trello_syncs[profile.board_id].sync_job(job, list_id=profile.list_id) == 'created':
+            print(f"Created Trello card for: {job['EMPRESA']}")
+            yield job
+
+    stats = run_pipeline(build_query_states(queries).items(), [
+        Stage('search', search, workers=SEARCH_MAX_CONCURRENCY),
+        Stage('token_filter', token_filter),
+        Stage('dedupe', dedupe),
+        BatchStage('batch', lambda item: estimate_tokens(compactor.compact(item[1])) + 1, SCREENING_CHUNK_TOKENS,
+                   key_fn=lambda item: item[0].name),
+        Stage('screening', screening, workers=SCREENING_MAX_CONCURRENCY),
+        Stage('analysis', analysis, workers=2),
+        Stage('trello', trello, workers=2),
+    ])
+
+    print(f"{counters['already_seen']} vagas já vistas, {counters['near_duplicates']} quase duplicadas, {stats['trello']['out']} cards criados")
+    print_pipeline_stats(stats)
+    for trello_sync in trello_syncs.values():
+        trello_sync.print_report()
+    compactor.print_report()
+    planner.print_usage()
+    run_archive.record_search_usage(run_id, planner.plan, planner.usage)
+    seen_index.close()
+    run_archive.finish_run(run_id)
+    run_archive.close()
+    search_cache.print_stats()
+    screening_cache.print_stats()
+    screening_cache.close()
+    http_client.print_connection_stats()
+    instrumentation.print_report(instrumentation.write_report(prometheus_path=prometheus_path, run_id=run_id, mode='streaming', pipeline=stats, compaction=compactor.report()))
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # daemon.py imports this module by name: the same module object, not a second copy, so the
+    # overrides below (--replay rate limits) reach it
+    sys.modules.setdefault('job_search', sys.modules[__name__])
+    parser = argparse.ArgumentParser(description="Daily job search: Google -> token filter -> Dify screening -> Trello")
+    parser.add_argument('--refresh', action='store_true', help="Ignore cached Google responses and query the API again")
+    parser.add_argument('--stream', action='store_true', help="Run the stages as a streaming pipeline (cards are created as listings arrive)")
+    parser.add_argument('--prometheus', action='store_true', help="Also write the run metrics in the Prometheus textfile format (output/run_report.prom)")
+    parser.add_argument('--profile', action='store_true', help="Run the CPU-bound stages under cProfile (dumped to output/profile/)")
+    parser.add_argument('--resume', action='store_true', help="Pick up today's interrupted run from its last completed stage or search page")
+    parser.add_argument('--daemon', action='store_true', help="Keep running: poll every ATS on its own adaptive interval and process new postings as they appear (see daemon.py)")
+    cassette_mode = parser.add_mutually_exclusive_group()
+    cassette_mode.add_argument('--record', metavar='DIR', help="Save every Google, Dify and Trello exchange (and the run state) to a cassette directory")
+    cassette_mode.add_argument('--replay', metavar='DIR', help="Run offline, answering every request from a recorded cassette directory")
+    args = parser.parse_args()
+
+    instrumentation.enable_profiling(args.profile)
+    prometheus_path = instrumentation.PROMETHEUS_PATH if args.prometheus else None
+
+    cassette, state_dir = None, None
+    if args.record or args.replay:
+        from cassette import Cassette
+    if args.record:
+        cassette = Cassette(args.record, 'record')
+        cassette.save_state(STATE_PATHS)
+    elif args.replay:
+        cassette = Cassette(args.replay, 'replay')
+        state_dir = cassette.restore_state()
+        # No API on the other side: no quota to protect
+        SEARCH_RATE_PER_SECOND = DIFY_RATE_PER_SECOND = trello_integration.TRELLO_RATE_PER_SECOND = 10 ** 6
+        DIFY_RATE_LIMITER = TokenBucket(DIFY_RATE_PER_SECOND)
+    http_client.use_cassette(cassette)
+
+    if args.daemon:
+        if args.stream or args.resume:
+            parser.error("--daemon runs its own incremental cycles (no --stream or --resume)")
+        # Imported here: daemon.py imports this module, and the usual runs don't need it
+        from daemon import SearchDaemon
+        SearchDaemon(state_dir=state_dir, prometheus_path=prometheus_path).run()
+    elif args.stream:
+        if args.resume:
+            parser.error("--resume applies to the staged run (the streaming run marks listings as seen batch by batch)")
+        main_streaming(refresh=args.refresh, prometheus_path=prometheus_path, state_dir=state_dir)
+    else:
+        main(refresh=args.refresh, prometheus_path=prometheus_path, state_dir=state_dir, resume=args.resume)
+
+    if cassette is not None:
+        cassette.print_stats() 
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""
+json_extractor.py
+
+Extracts the JSON written by the LLM agents in their answers (```json fenced blocks).
+
+Produces the same objects parse_llm_json did, with precompiled patterns and a single scan per
+block: the escape cleanup (invalid escapes, escaped non-breaking spaces, dashes and smart quotes)
+is one regex substitution instead of a chain of str.replace copies. When a block can't be decoded
+as is, or the answer has no complete block at all, it also tries to recover:
+    - trailing commas before a closing bracket ([{...},] or {"a": 1,})
+    - a truncated final block (unclosed fence): the complete items of its list are kept
+    - a missing fence: the first JSON list/object of the answer is decoded
+"""
+import json
+import re
+
+from instrumentation import instrumented
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+JSON_FENCE = '```json'
+FENCE = '```'
+_LEADING_SPACES_RE = re.compile(r'\s*')
+
+# A run of backslashes followed by an escape JSON rejects, an escaped punctuation sign or the end of the block
+_ESCAPE_RE = re.compile(r'(\\+)(u00a0|u201[3489cd]|[^"\\/bfnrtu]|\Z)')
+_ESCAPED_PUNCTUATION = {
+    'u00a0': ' ',
+    'u2013': '-',
+    'u2014': '-',
+    'u2018': "'",
+    'u2019': "'",
+    'u201c': '"',
+    'u201d': '"',
+}
+_CONTROL_CHARS_RE = re.compile(r'[\x00-\x1f\x7f-\x9f]')
+_TRAILING_COMMA_RE = re.compile(r'("(?:[^"\\]|\\.)*")|,(\s*[}\]])', re.DOTALL)
+_STRUCTURE_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]', re.DOTALL)
+_JSON_START_RE = re.compile(r'[\[{]')
+
+_decoder = json.JSONDecoder()
+
+
+###***********************************************************************************************************************###
+def _normalize_escape(match):
+    backslashes, escaped = len(match.group(1)), match.group(2)
+    if not escaped:
+        # Dangling backslash at the end of the block
+        return '\\' * (backslashes - 1)
+
+    replacement = _ESCAPED_PUNCTUATION.get(escaped, ' ')
+    if backslashes == 1:
+        return replacement
+    # The backslash before the replacement is dropped, unless it now escapes a quote
+    return '\\' * (backslashes - 2) + ('\\"' if replacement == '"' else replacement)
+
+
+def normalize_block(block):
+    """
+    Strip a block, drop one trailing comma and clean its escapes (same result as the cleaning parse_llm_json did).
+    """
+    cleaned = block.strip()
+    if cleaned.endswith(','):
+        cleaned = cleaned[:-1]
+    if '\\' in cleaned:
+        cleaned = _ESCAPE_RE.sub(_normalize_escape, cleaned)
+    return cleaned
+
+
+def decode_json_block(block):
+    """
+    Decode one block written by the LLM.
+    Raises:
+        json.JSONDecodeError: When the block is not valid JSON, even without its control characters
+    """
+    cleaned = normalize_block(block)
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        return json.loads(_CONTROL_CHARS_RE.sub('', cleaned))
+
+
+###***********************************************************************************************************************###
+def _without_trailing_commas(text):
+    return _TRAILING_COMMA_RE.sub(lambda match: match.group(1) or match.group(2), text)
+
+
+def _complete_items(text):
+    """
+    Decode the complete items of a truncated JSON list (the list is cut after its last complete item).
+    Returns:
+        list: None when `text` is not a list or no item is complete
+    """
+    if not text.startswith('['):
+        return None
+
+    depth = 0
+    item_ends = []
+    for match in _STRUCTURE_RE.finditer(text):
+        token = match.group()
+        if token in '[{':
+            depth += 1
+        elif token in ']}':
+            depth -= 1
+            if depth == 1:
+                item_ends.append(match.end())
+
+    # An unterminated string may hold brackets: fall back to the previous item ends
+    for end in reversed(item_ends[-3:]):
+        try:
+            return json.loads(_without_trailing_commas(text[:end] + ']'))
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def repair_json_block(block):
+    """
+    Decode a block decode_json_block rejected: trailing commas are dropped, and a truncated list keeps its complete items.
+    Returns:
+        Object, or None when the block can't be recovered
+    """
+    cleaned = _CONTROL_CHARS_RE.sub('', normalize_block(block))
+    try:
+        return json.loads(_without_trailing_commas(cleaned))
+    except json.JSONDecodeError:
+        return _complete_items(cleaned)
+
+
+def _decode_unfenced(text):
+    match = _JSON_START_RE.search(text)
+    if match is None:
+        return None
+    candidate = text[match.start():]
+    try:
+        # The answer may go on after the JSON
+        return _decoder.raw_decode(_CONTROL_CHARS_RE.sub('', normalize_block(candidate)))[0]
+    except json.JSONDecodeError:
+        return repair_json_block(candidate)
+
+
+###***********************************************************************************************************************###
+def iter_fenced_blocks(text):
+    """
+    Yield the content of every ```json fenced block, like re.findall(r"```json\s*(.*?)\s*```", text, re.DOTALL)
+    but with plain substring searches (the lazy pattern tests for a fence at every character).
+    An unclosed final block is yielded last, with closed=False.
+    Yields:
+        tuple: (block, closed)
+    """
+    position = 0
+    while True:
+        start = text.find(JSON_FENCE, position)
+        if start < 0:
+            return
+        content_start = _LEADING_SPACES_RE.match(text, start + len(JSON_FENCE)).end()
+        end = text.find(FENCE, content_start)
+        if end < 0:
+            yield text[content_start:], False
+            return
+        yield text[content_start:end].rstrip(), True
+        position = end + len(FENCE)
+
+
+@instrumented('extract_json_blocks', items_out=len, profile=True)
+def extract_json_blocks(text, repair=True):
+    """
+    Args:
+        text (str): Answer of an LLM agent, with its JSON in ```json fenced blocks
+        repair (bool): Try to recover blocks that can't be decoded, a truncated final block and an answer without fences
+    Returns:
+        list: Decoded blocks, in order (blocks that can't be decoded nor recovered are skipped)
+    """
+    parsed_data = []
+    fenced = False
+
+    for block, closed in iter_fenced_blocks(text):
+        fenced = True
+        if not closed:
+            # Truncated answer: the last block was never closed
+            repaired = repair_json_block(block) if repair else None
+            if repaired is not None:
+                parsed_data.append(repaired)
+            continue
+
+        try:
+            parsed_data.append(decode_json_block(block))
+            continue
+        except json.JSONDecodeError as e:
+            error = e
+
+        repaired = repair_json_block(block) if repair else None
+        if repaired is None:
+            print(f"Erro ao decodificar JSON: {error}")
+            print(f"Bloco problemático: \n---\n{block.strip()}\n---")
+        else:
+            parsed_data.append(repaired)
+
+    if repair and not fenced:
+        # No fence at all
+        unfenced = _decode_unfenced(text)
+        if unfenced is not None:
+            parsed_data.append(unfenced)
+
+    return parsed_data
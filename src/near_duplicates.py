@@ -0,0 +1,210 @@
+"""
+near_duplicates.py
+
+Near-duplicate detection for job listings, using SimHash over title+snippet shingles.
+
+A same role often shows up on several ATS boards with a slightly different title or snippet.
+Each listing gets a 64-bit SimHash fingerprint; candidate pairs come from LSH banding (listings
+sharing any 16-bit band), so the stage runs in roughly linear time. Pairs within the Hamming
+distance threshold are clustered and each cluster is collapsed to one representative.
+"""
+import hashlib
+import re
+import unicodedata
+
+from instrumentation import instrumented
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3          # Words per shingle
+BAND_COUNT = 4            # 4 bands of 16 bits: pairs up to 3 bits apart always share a band
+MAX_HAMMING_DISTANCE = 3  # Similarity threshold, in differing bits out of 64 (0 = identical text only)
+
+_WORD_RE = re.compile(r'\w+')
+_COMBINING_RE = re.compile('[\u0300-\u036f]')
+
+
+###***********************************************************************************************************************###
+def _normalize(text):
+    text = text.lower()
+    if text.isascii():
+        return text
+    return _COMBINING_RE.sub('', unicodedata.normalize('NFKD', text))
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    words = _WORD_RE.findall(_normalize(text))
+    if len(words) <= size:
+        return [' '.join(words)] if words else []
+    return [' '.join(words[index:index + size]) for index in range(len(words) - size + 1)]
+
+
+def _shingle_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def fingerprints(texts, size=SHINGLE_SIZE):
+    """
+        SimHash of many texts at once: shingle hashes are unpacked to a bit matrix and
+        summed per text with NumPy, instead of a Python loop over 64 bits per shingle.
+    Returns:
+        list: 64-bit fingerprints (int). Similar texts get fingerprints a few bits apart.
+              None for texts without any word: they have nothing to compare, so they duplicate nothing.
+    """
+    import numpy as np  # Deferred: importing job_search (filtering, parsing) does not load NumPy
+
+    hashes = []
+    offsets = []
+    # Boilerplate shingles repeat across listings: each distinct one is hashed once
+    known = {}
+    for text in texts:
+        offsets.append(len(hashes))
+        for shingle in shingles(text, size):
+            value = known.get(shingle)
+            if value is None:
+                value = known[shingle] = _shingle_hash(shingle)
+            hashes.append(value)
+    if not hashes:
+        return [None] * len(offsets)
+
+    bits = np.unpackbits(np.array(hashes, dtype=np.uint64).view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+
+    # Bit set in more than half of the shingles (same as summing +1/-1 votes)
+    offsets = np.asarray(offsets)
+    counts = np.diff(np.append(offsets, len(hashes)))
+    non_empty = counts > 0
+    set_counts = np.zeros((len(offsets), SIMHASH_BITS), dtype=np.int32)
+    set_counts[non_empty] = np.add.reduceat(bits, offsets[non_empty], axis=0, dtype=np.int32)
+
+    packed = np.packbits(2 * set_counts > counts[:, None], axis=1, bitorder='little')
+    return [int(value) if has_shingles else None for value, has_shingles in zip(packed.view(np.uint64).ravel(), non_empty)]
+
+
+def simhash(text, size=SHINGLE_SIZE):
+    return fingerprints([text], size)[0]
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+###***********************************************************************************************************************###
+def cluster_listings(listings, max_distance=MAX_HAMMING_DISTANCE, text_fields=('title', 'snippet')):
+    """
+    Group near-duplicate listings.
+    Args:
+        listings (list): JobListing records
+        max_distance (int): Max Hamming distance between fingerprints of a same cluster
+        text_fields (tuple): JobListing attributes hashed together
+    Returns:
+        list: Clusters, as lists of listing indexes (clusters and members in input order)
+    """
+    values = fingerprints([' '.join(getattr(listing, field) for field in text_fields) for listing in listings])
+    parents = list(range(len(listings)))
+
+    def find(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    def union(first, second):
+        # The smallest index stays root, so clusters are represented by their first occurrence
+        root_first, root_second = find(first), find(second)
+        if root_first != root_second:
+            parents[max(root_first, root_second)] = min(root_first, root_second)
+
+    # Identical fingerprints are merged up front; banding then only compares distinct ones
+    by_fingerprint = {}
+    for index, fingerprint in enumerate(values):
+        if fingerprint is None:
+            # Empty title and snippet: kept as a cluster of its own
+            continue
+        if fingerprint in by_fingerprint:
+            union(by_fingerprint[fingerprint], index)
+        else:
+            by_fingerprint[fingerprint] = index
+
+    band_bits = SIMHASH_BITS // BAND_COUNT
+    band_mask = (1 << band_bits) - 1
+    for band in range(BAND_COUNT):
+        buckets = {}
+        for fingerprint, index in by_fingerprint.items():
+            buckets.setdefault(fingerprint >> (band * band_bits) & band_mask, []).append((fingerprint, index))
+
+        for members in buckets.values():
+            for position, (first_fingerprint, first) in enumerate(members):
+                for second_fingerprint, second in members[position + 1:]:
+                    if hamming_distance(first_fingerprint, second_fingerprint) <= max_distance:
+                        union(first, second)
+
+    clusters = {}
+    for index in range(len(listings)):
+        clusters.setdefault(find(index), []).append(index)
+    return list(clusters.values())
+
+
+@instrumented('collapse_near_duplicates', items_in=len, items_out=lambda result: len(result[0]), profile=True)
+def collapse_near_duplicates(listings, max_distance=MAX_HAMMING_DISTANCE):
+    """
+        Keep one representative per near-duplicate cluster.
+        The representative is the listing with most token matches (first occurrence on ties),
+        and records the URLs of the listings it replaces in its duplicate_urls.
+    Args:
+        listings (list): Filtered job listings
+        max_distance (int): Similarity threshold (see MAX_HAMMING_DISTANCE)
+    Returns:
+        tuple: (representative listings in input order, number of listings collapsed)
+    """
+    representatives = []
+    for members in cluster_listings(listings, max_distance):
+        best = max(members, key=lambda index: (listings[index].total_matches or 0, -index))
+        representative = listings[best]
+        if len(members) > 1:
+            representative.duplicate_urls = [listings[index].url for index in members if index != best]
+        representatives.append((best, representative))
+
+    representatives.sort(key=lambda entry: entry[0])
+    return [listing for _, listing in representatives], len(listings) - len(representatives)
+
+
+###***********************************************************************************************************************###
+class NearDuplicateIndex:
+    """
+    Incremental version of cluster_listings, for the streaming pipeline: listings arrive one by one
+    and the first listing of each cluster is the representative.
+    Args:
+        max_distance (int): Similarity threshold (see MAX_HAMMING_DISTANCE)
+    """
+
+    def __init__(self, max_distance=MAX_HAMMING_DISTANCE, text_fields=('title', 'snippet')):
+        self.max_distance = max_distance
+        self.text_fields = text_fields
+        self._representatives = {}
+        self._buckets = [{} for _ in range(BAND_COUNT)]
+
+    def add(self, listing):
+        """
+        Returns:
+            str: URL of the representative this listing duplicates, or None when the listing is new
+                 (always for a listing without title or snippet text)
+        """
+        fingerprint = simhash(' '.join(getattr(listing, field) for field in self.text_fields))
+        if fingerprint is None:
+            return None
+        if fingerprint in self._representatives:
+            return self._representatives[fingerprint]
+
+        band_bits = SIMHASH_BITS // BAND_COUNT
+        band_mask = (1 << band_bits) - 1
+        bands = [fingerprint >> (band * band_bits) & band_mask for band in range(BAND_COUNT)]
+        for band, value in enumerate(bands):
+            for candidate in self._buckets[band].get(value, ()):
+                if hamming_distance(fingerprint, candidate) <= self.max_distance:
+                    return self._representatives[candidate]
+
+        self._representatives[fingerprint] = listing.url
+        for band, value in enumerate(bands):
+            self._buckets[band].setdefault(value, []).append(fingerprint)
+        return None
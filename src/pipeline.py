@@ -0,0 +1,173 @@
+"""
+pipeline.py
+
+Minimal threaded streaming pipeline: items flow from stage to stage through bounded queues,
+so each item moves on as soon as it is ready, and a slow stage blocks its upstream stages
+(backpressure) instead of letting results pile up in memory.
+
+Usage:
+    stats = run_pipeline(sources, [
+        Stage('search', search_fn, workers=4),
+        BatchStage('batch', size_fn, budget=3000, flush_seconds=5),
+        Stage('screening', screen_fn, workers=3),
+    ])
+
+Each Stage function receives one item and returns (or yields) zero or more items for the next stage.
+"""
+import queue
+import threading
+import time
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+STAGE_QUEUE_SIZE = 100  # Max items waiting in front of a stage
+
+_DONE = object()
+
+
+###***********************************************************************************************************************###
+class Stage:
+    """
+    Args:
+        name (str): Stage name, used in the stats
+        func (callable): item -> iterable of output items (None means no output)
+        workers (int): Threads running `func` concurrently
+        maxsize (int): Input queue size
+    """
+
+    def __init__(self, name, func, workers=1, maxsize=STAGE_QUEUE_SIZE):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.maxsize = maxsize
+
+
+class BatchStage(Stage):
+    """
+    Groups incoming items into lists whose summed `size_fn` stays under `budget`.
+    A partial batch is flushed when no item arrives for `flush_seconds`, or at the end.
+    With `key_fn`, items of different keys never share a batch (one open batch per key).
+    """
+
+    def __init__(self, name, size_fn, budget, flush_seconds=5, maxsize=STAGE_QUEUE_SIZE, key_fn=None):
+        super().__init__(name, None, workers=1, maxsize=maxsize)
+        self.size_fn = size_fn
+        self.budget = budget
+        self.flush_seconds = flush_seconds
+        self.key_fn = key_fn
+
+
+###***********************************************************************************************************************###
+def run_pipeline(sources, stages):
+    """
+        Feed `sources` into the first stage and run every stage until all items are drained.
+    Args:
+        sources (iterable): Input items of the first stage
+        stages (list): Stage / BatchStage objects, in order
+    Returns:
+        dict: Per stage {'in', 'out', 'errors', 'first_output_at', 'busy_seconds'}, times relative to the start
+    """
+    started = time.monotonic()
+    queues = [queue.Queue(maxsize=stage.maxsize) for stage in stages]
+    stats = {stage.name: {'in': 0, 'out': 0, 'errors': 0, 'first_output_at': None, 'busy_seconds': 0.0} for stage in stages}
+    finished_workers = [0] * len(stages)
+    lock = threading.Lock()
+
+    def emit(index, item):
+        stage_stats = stats[stages[index].name]
+        with lock:
+            stage_stats['out'] += 1
+            if stage_stats['first_output_at'] is None:
+                stage_stats['first_output_at'] = time.monotonic() - started
+        if index + 1 < len(stages):
+            queues[index + 1].put(item)  # Blocks while the next stage is full (backpressure)
+
+    def finish(index):
+        # The last worker of a stage to finish tells every worker of the next stage to stop
+        with lock:
+            finished_workers[index] += 1
+            last = finished_workers[index] == stages[index].workers
+        if last and index + 1 < len(stages):
+            for _ in range(stages[index + 1].workers):
+                queues[index + 1].put(_DONE)
+
+    def run_stage(index):
+        stage = stages[index]
+        while True:
+            item = queues[index].get()
+            if item is _DONE:
+                break
+            with lock:
+                stats[stage.name]['in'] += 1
+            busy = time.monotonic()
+            try:
+                for output in stage.func(item) or ():
+                    emit(index, output)
+            except Exception as e:
+                print(f"[pipeline] Erro no estágio {stage.name}: {e}")
+                with lock:
+                    stats[stage.name]['errors'] += 1
+            with lock:
+                stats[stage.name]['busy_seconds'] += time.monotonic() - busy
+        finish(index)
+
+    def run_batch_stage(index):
+        stage = stages[index]
+        batches = {}  # key -> [open batch, its size]
+        while True:
+            try:
+                item = queues[index].get(timeout=stage.flush_seconds)
+            except queue.Empty:
+                # Upstream is slow: don't hold a partial batch back
+                for batch, _ in batches.values():
+                    emit(index, batch)
+                batches.clear()
+                continue
+
+            if item is _DONE:
+                for batch, _ in batches.values():
+                    emit(index, batch)
+                break
+
+            with lock:
+                stats[stage.name]['in'] += 1
+            size = stage.size_fn(item)
+            key = stage.key_fn(item) if stage.key_fn else None
+            open_batch = batches.get(key)
+            if open_batch and open_batch[1] + size > stage.budget:
+                emit(index, open_batch[0])
+                open_batch = None
+            if open_batch is None:
+                open_batch = batches[key] = [[], 0]
+            open_batch[0].append(item)
+            open_batch[1] += size
+        finish(index)
+
+    threads = []
+    for index, stage in enumerate(stages):
+        target = run_batch_stage if isinstance(stage, BatchStage) else run_stage
+        for worker in range(stage.workers):
+            thread = threading.Thread(target=target, args=(index,), name=f"{stage.name}-{worker}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+    for item in sources:
+        queues[0].put(item)
+    for _ in range(stages[0].workers):
+        queues[0].put(_DONE)
+
+    for thread in threads:
+        thread.join()
+
+    stats['total_seconds'] = time.monotonic() - started
+    return stats
+
+
+def print_pipeline_stats(stats):
+    for name, values in stats.items():
+        if name == 'total_seconds':
+            continue
+        first = f"{values['first_output_at']:.1f}s" if values['first_output_at'] is not None else '-'
+        print(f"[pipeline] {name}: {values['in']} entradas, {values['out']} saídas, {values['errors']} erros, "
+              f"primeira saída em {first}")
+    print(f"[pipeline] Tempo total: {stats['total_seconds']:.1f}s")
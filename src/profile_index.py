@@ -0,0 +1,251 @@
+"""
+profile_index.py
+
+Compiled, weighted index of the profile tokens (lib/profile_tokens.py), scoring the listings in
+filter_job_listings.
+
+The token matcher (token_matcher.py) looks for every token as a lowercase substring: "sql" is found
+in "nosql", "dados" in "cuidados", "credit" in "accredited", "análise" misses "analise", and a
+concept listed more than once ("produto" twice, "produtos", or "python" in both lists) counts
+once per listing. Every such false positive that clears the filter costs screening tokens.
+
+The index, instead:
+    - folds accents and case on both sides: "Operações", "OPERACOES" and "operações" are one form
+    - matches whole words only, a hyphen, slash or run of spaces between words reading as one space
+    - expands every token word to its singular/plural variants (produto/produtos, operação/operações,
+      operacional/operacionais, company/companies), and maps all the tokens sharing a singular form,
+      in either list, to one entry: an entry counts once per listing
+    - weighs every entry (profile_token_weights, 1.0 by default): the relevance score of a listing
+      is the sum of the weights of the entries it mentions
+
+Building it (folding, variants, the trie-shaped regex) is done once per vocabulary and cached on
+disk, one file per vocabulary (output/profile_index/<hash>.json, the hash of the token lists, the
+weights and INDEX_VERSION: profiles don't overwrite each other's index); a changed vocabulary
+builds a new one.
+
+Usage:
+    index = get_index(profile_tokens_pt, profile_tokens_en, profile_token_weights)
+    index.match(text)  # {'pt': [...], 'en': [...], 'total': entries matched, 'score': weighted score}
+"""
+import hashlib
+import itertools
+import json
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+from checkpoint import atomic_write_json
+from token_matcher import trie_pattern
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+PROFILE_INDEX_DIR = os.path.join(os.path.dirname(__file__), '../output/profile_index')
+INDEX_VERSION = 1        # Bump when folding or variant rules change: cached indexes get rebuilt
+DEFAULT_WEIGHT = 1.0
+MIN_STEM_LENGTH = 5      # Shorter words get no variants (data/datas, dados/dado "given", apis/api)
+
+# Plural -> singular, first matching suffix wins (folded words: no accents)
+SINGULAR_RULES = [
+    ('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ies', 'y'), ('sses', 'ss'),
+    ('ches', 'ch'), ('shes', 'sh'), ('xes', 'x'), ('zes', 'z'), ('ores', 'or'),
+    ('ss', 'ss'), ('us', 'us'), ('is', 'is'), ('s', ''),
+]
+
+_COMBINING_RE = re.compile('[\u0300-\u036f]')
+_SEPARATOR_RE = re.compile(r'[\s\-_/]+')
+
+
+###***********************************************************************************************************************###
+def fold(text):
+    """
+    Returns:
+        str: `text` casefolded, without accents
+    """
+    text = text.casefold()
+    if not text.isascii():
+        text = _COMBINING_RE.sub('', unicodedata.normalize('NFKD', text)).replace('’', "'")
+    return text
+
+
+def singular(word):
+    """
+    Returns:
+        str: Singular form of a folded word, or the word itself when it is short or not alphabetic
+    """
+    if not word.isalpha():
+        return word
+    for suffix, replacement in SINGULAR_RULES:
+        if word.endswith(suffix):
+            stem = word[:len(word) - len(suffix)] + replacement
+            return stem if len(stem) >= MIN_STEM_LENGTH else word
+    return word
+
+
+def word_variants(word):
+    """
+    Returns:
+        list: Folded forms of a folded word matched in the text: the word, its singular and plurals
+    """
+    stem = singular(word)
+    if len(stem) < MIN_STEM_LENGTH or not stem.isalpha():
+        return [word]
+    if stem.endswith('ao'):
+        plurals = [stem[:-2] + 'oes', stem[:-2] + 'aes']
+    elif stem.endswith(('al', 'el')):
+        plurals = [stem[:-2] + stem[-2] + 'is', stem + 's']
+    elif stem.endswith('y') and stem[-2] not in 'aeiou':
+        plurals = [stem[:-1] + 'ies']
+    elif stem.endswith(('s', 'x', 'z', 'ch', 'sh', 'or')):
+        plurals = [stem + 'es', stem + 's']
+    else:
+        plurals = [stem + 's']
+    return list(dict.fromkeys([word, stem] + plurals))
+
+
+def index_key(tokens_pt, tokens_en, weights=None):
+    """
+    Returns:
+        str: Hash identifying a vocabulary: token lists, weights and index version
+    """
+    vocabulary = [INDEX_VERSION, list(tokens_pt), list(tokens_en), sorted((weights or {}).items())]
+    return hashlib.sha256(json.dumps(vocabulary, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _nested_entries(variant, variants):
+    """
+    Returns:
+        set: Entry positions of `variant` and of every variant made of consecutive words of it
+    """
+    words = variant.split(' ')
+    return {
+        variants[' '.join(words[start:end])]
+        for start in range(len(words)) for end in range(start + 1, len(words) + 1)
+        if ' '.join(words[start:end]) in variants
+    }
+
+
+###***********************************************************************************************************************###
+class ProfileIndex:
+    """
+    Args:
+        key (str): index_key of the vocabulary
+        entries (list): One dict per concept: {'key', 'pt', 'en', 'weight'}
+        variants (dict): Folded variant -> entry position
+    """
+
+    def __init__(self, key, entries, variants):
+        self.key = key
+        self.entries = entries
+        self.variants = variants
+        # Longest variant starting and ending on a word boundary, any run of separators between words.
+        # A match consumes its words: the variants nested in it ("dados" in "análise de dados") are
+        # precomputed below, variants only partly overlapping it are not found.
+        pattern = trie_pattern(variants, {' ': _SEPARATOR_RE.pattern})
+        self._pattern = re.compile(rf'(?<!\w)(?:{pattern})(?!\w)') if variants else None
+        self._nested = {variant: sorted(_nested_entries(variant, variants)) for variant in variants}
+
+    @classmethod
+    def build(cls, tokens_pt, tokens_en, weights=None):
+        key = index_key(tokens_pt, tokens_en, weights)
+        weights = {token.lower(): weight for token, weight in (weights or {}).items()}
+        entries = []
+        positions = {}  # singular form -> entry position
+        variants = {}
+        for language, tokens in (('pt', tokens_pt), ('en', tokens_en)):
+            for token in tokens:
+                words = [word for word in _SEPARATOR_RE.split(fold(token)) if word]
+                if not words:
+                    continue
+                form = ' '.join(singular(word) for word in words)
+                if form not in positions:
+                    positions[form] = len(entries)
+                    entries.append({'key': form, 'pt': [], 'en': [], 'weight': None})
+                entry = entries[positions[form]]
+                if token not in entry[language]:
+                    entry[language].append(token)
+                weight = weights.get(token.lower(), DEFAULT_WEIGHT)
+                entry['weight'] = weight if entry['weight'] is None else max(entry['weight'], weight)
+                for combination in itertools.product(*(word_variants(word) for word in words)):
+                    variants.setdefault(' '.join(combination), positions[form])
+        return cls(key, entries, variants)
+
+    def to_dict(self):
+        return {'key': self.key, 'entries': self.entries, 'variants': self.variants}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['key'], data['entries'], data['variants'])
+
+    ###*******************************************************************************************************************###
+    def find(self, text, folded=False):
+        """
+        Args:
+            folded (bool): `text` went through fold() already (one text scored against several indexes)
+        Returns:
+            set: Positions of the entries mentioned in `text`
+        """
+        found = set()
+        if self._pattern is None:
+            return found
+        for longest in set(self._pattern.findall(text if folded else fold(text))):
+            if longest not in self._nested:
+                longest = _SEPARATOR_RE.sub(' ', longest)
+            found.update(self._nested[longest])
+        return found
+
+    def match(self, text, folded=False):
+        """
+        Returns:
+            dict: {'pt': [...], 'en': [...], 'total': int, 'score': float}, the matched tokens of each
+                  list, the number of entries matched and the sum of their weights
+        """
+        entries = [self.entries[position] for position in sorted(self.find(text, folded))]
+        return {
+            'pt': [token for entry in entries for token in entry['pt']],
+            'en': [token for entry in entries for token in entry['en']],
+            'total': len(entries),
+            'score': round(sum(entry['weight'] for entry in entries), 2),
+        }
+
+
+###***********************************************************************************************************************###
+def load_index(tokens_pt, tokens_en, weights=None, directory=None):
+    """
+        Read the index of a vocabulary from the disk cache, building (and caching) it when there is
+        none for this vocabulary yet.
+    Args:
+        directory (str): Cache directory, one file per index_key (default: PROFILE_INDEX_DIR)
+    Returns:
+        ProfileIndex
+    """
+    key = index_key(tokens_pt, tokens_en, weights)
+    path = os.path.join(directory or PROFILE_INDEX_DIR, f'{key}.json')
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('key') == key:
+            return ProfileIndex.from_dict(data)
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        pass
+
+    index = ProfileIndex.build(tokens_pt, tokens_en, weights)
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        atomic_write_json(path, index.to_dict())
+    except OSError as e:
+        print(f"[profile_index] Cache não gravado ({e}), o índice será reconstruído na próxima execução")
+    return index
+
+
+@lru_cache(maxsize=16)
+def _cached_index(tokens_pt, tokens_en, weights):
+    return load_index(tokens_pt, tokens_en, dict(weights))
+
+
+def get_index(tokens_pt, tokens_en, weights=None):
+    """
+    Returns:
+        ProfileIndex: Loaded (or built) once per distinct vocabulary, then reused
+    """
+    return _cached_index(tuple(tokens_pt), tuple(tokens_en), tuple(sorted((weights or {}).items())))
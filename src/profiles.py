@@ -0,0 +1,158 @@
+"""
+profiles.py
+
+Candidate profiles served by a run. One search pass (Google quota, search time) is shared by every
+profile: each listing is scored against all of them (see filter_job_listings), then every profile
+gets its own screening and analysis (its own Dify agents) and its own Trello list.
+
+Profiles are read from lib/profiles.json when it exists:
+    [
+        {
+            "name": "ana",                                   # Letters, digits, '-' and '_' (file names)
+            "tokens_pt": ["operações", ...],
+            "tokens_en": ["operations", ...],
+            "weights": {"operações": 1.5},                   # Optional, see profile_index.py
+            "min_score": 1,                                  # Optional, filter threshold
+            "trello_list_id": "...",                         # Optional, default: TRELLO_LIST_ID
+            "trello_board_id": "...",                        # Optional, default: TRELLO_BOARD_ID
+            "dify_api_key_env": "DIFY_API_KEY_ANA",          # Optional, default: DIFY_API_KEY
+            "dify_api_key_seeker_env": "DIFY_API_KEY_SEEKER_ANA"  # Optional, default: DIFY_API_KEY_SEEKER
+        }
+    ]
+API keys stay in the environment, the file only names the variables. Without the file the run has
+a single profile, 'default', made of lib/profile_tokens.py and the credentials of settings.py, and
+writes its outputs and checkpoints under the usual names.
+
+A posting gets at most one card per Trello board (see TrelloSync): profiles that should each get a
+card for the same posting need boards of their own.
+"""
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+
+from profile_index import get_index
+from settings import settings
+
+# Add the project root directory to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+PROFILES_PATH = os.path.join(os.path.dirname(__file__), '../lib/profiles.json')
+DEFAULT_PROFILE = 'default'
+
+_NAME_RE = re.compile(r'^[\w-]+$')
+
+
+###***********************************************************************************************************************###
+@dataclass(slots=True)
+class Profile:
+    name: str
+    tokens_pt: list
+    tokens_en: list
+    weights: dict = field(default_factory=dict)
+    min_score: float = 1                      # Relevance score a listing must exceed (see filter_job_listings)
+    trello_list_id: str | None = None         # None: TRELLO_LIST_ID
+    trello_board_id: str | None = None        # None: TRELLO_BOARD_ID
+    dify_api_key_env: str = 'DIFY_API_KEY'    # Environment variables holding the agent keys
+    dify_api_key_seeker_env: str = 'DIFY_API_KEY_SEEKER'
+    _index: object = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_dict(cls, data):
+        name = str(data.get('name', ''))
+        if not _NAME_RE.match(name):
+            raise ValueError(f"Invalid profile name {name!r} (letters, digits, '-' and '_' only)")
+        fields = {key: data[key] for key in (
+            'weights', 'min_score', 'trello_list_id', 'trello_board_id', 'dify_api_key_env', 'dify_api_key_seeker_env',
+        ) if data.get(key) is not None}
+        return cls(name, list(data.get('tokens_pt') or []), list(data.get('tokens_en') or []), **fields)
+
+    @property
+    def index(self):
+        """ProfileIndex of the profile tokens, loaded on first use (see profile_index.py)."""
+        if self._index is None:
+            self._index = get_index(self.tokens_pt, self.tokens_en, self.weights)
+        return self._index
+
+    @property
+    def dify_api_key(self):
+        return settings.get(self.dify_api_key_env)
+
+    @property
+    def dify_api_key_seeker(self):
+        return settings.get(self.dify_api_key_seeker_env)
+
+    @property
+    def list_id(self):
+        return self.trello_list_id or settings.TRELLO_LIST_ID
+
+    @property
+    def board_id(self):
+        return self.trello_board_id or settings.TRELLO_BOARD_ID
+
+    def required_settings(self):
+        """
+        Returns:
+            list: Names of the settings the profile needs (see Settings.require)
+        """
+        names = [self.dify_api_key_env, self.dify_api_key_seeker_env]
+        if self.trello_list_id is None:
+            names.append('TRELLO_LIST_ID')
+        if self.trello_board_id is None:
+            names.append('TRELLO_BOARD_ID')
+        return names
+
+
+###***********************************************************************************************************************###
+def default_profile():
+    from lib.profile_tokens import profile_tokens_pt, profile_tokens_en, profile_token_weights
+
+    return Profile(DEFAULT_PROFILE, profile_tokens_pt, profile_tokens_en, profile_token_weights)
+
+
+def load_profiles(path=None):
+    """
+    Returns:
+        list: Profiles of lib/profiles.json (or `path`), [default_profile()] when there is no such file
+    Raises:
+        ValueError: When a profile name is invalid or used twice
+    """
+    path = path or PROFILES_PATH
+    if not os.path.exists(path):
+        return [default_profile()]
+
+    with open(path, encoding='utf-8') as f:
+        profiles = [Profile.from_dict(data) for data in json.load(f)]
+    names = [profile.name for profile in profiles]
+    if not profiles or len(set(names)) != len(names):
+        raise ValueError(f"{path}: profile names must be unique, and at least one profile is needed")
+    return profiles
+
+
+def profile_settings(profiles):
+    """
+    Returns:
+        list: Names of the settings every profile of the run needs, without repetitions
+    """
+    return list(dict.fromkeys(name for profile in profiles for name in profile.required_settings()))
+
+
+def profile_suffix(profile, profiles):
+    """
+    Returns:
+        str: Suffix of the per-profile output files and checkpoint stages ('' for a single profile,
+             which keeps the usual names)
+    """
+    return '' if len(profiles) == 1 else f"-{profile.name}"
+
+
+def profile_path(path, profile, profiles):
+    """
+    Returns:
+        str: `path` with the profile suffix before its extension (output/ai_screening-ana.json)
+    """
+    root, extension = os.path.splitext(path)
+    return f"{root}{profile_suffix(profile, profiles)}{extension}"
@@ -0,0 +1,219 @@
+"""
+prompt_compaction.py
+
+Compaction of the screening payload sent to Dify: input tokens are what sets the screening latency
+(and cost), and a good share of them carried nothing the agent needs.
+
+Each listing line keeps the screening_text() layout ("Title: ... §URL: ... §Snippet: ... §---"), with:
+    - ATS boilerplate stripped from titles and snippets ("Apply now", "Powered by Lever",
+      "Remote - LATAM", "3 days ago ...", " - Greenhouse"...), whitespace collapsed
+    - the URL (tracking parameters and all) replaced by a short stable ID, derived from the
+      canonical URL: the same posting gets the same ID on every run and in every chunk, so
+      prompts stay cacheable and replayable. IDs the agent echoes back in 'link' are mapped
+      back to the URLs (restore) before anything else reads the answer.
+    - when the estimated tokens (see screening_scheduler.estimate_tokens) go over the run budget,
+      the snippets of the lowest-matching listings are shortened first, then those listings are
+      deferred: they are not marked as seen, so the next run screens them.
+
+Usage:
+    compactor = PromptCompactor()                # run budget: SCREENING_TOKEN_BUDGET
+    lines = compactor.fit(listings)          # formatted lines of the listings that fit the budget
+    jobs = compactor.restore(screened_jobs)  # IDs back to URLs
+    compactor.print_report()
+"""
+import base64
+import hashlib
+import re
+import threading
+from collections import Counter
+
+from screening_scheduler import estimate_tokens
+from seen_index import canonical_url
+from instrumentation import count
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+SCREENING_TOKEN_BUDGET = 60000  # Estimated listing tokens screened per run (float('inf'): no limit)
+SNIPPET_MIN_WORDS = 16          # Snippets are cut down to this many words before any listing is deferred
+URL_ID_PREFIX = 'J'
+URL_ID_LENGTH = 7               # Base32 characters (35 bits): collisions are resolved, not just unlikely
+
+# Phrases the ATS pages and Google add to every title/snippet (case-insensitive regexes)
+SNIPPET_BOILERPLATE = [
+    r'^(?:\d{1,2}\s+(?:hours?|days?|weeks?|months?)\s+ago|há\s+\d{1,2}\s+(?:horas?|dias?|semanas?|meses?)'
+    r'|[A-Z][a-z]{2}\s+\d{1,2},\s+\d{4}|\d{1,2}\s+(?:de\s+)?[a-z]{3}\.?\s+(?:de\s+)?\d{4})\s*(?:\.\.\.|…|·|-|—)?',
+    r'\bapply\s+(?:now|for\s+this\s+(?:job|position|role))\b[.!]?',
+    r'\b(?:candidate-se|candidatar-se)\s+(?:agora|a\s+esta\s+vaga)\b[.!]?',
+    r'\bpowered\s+by\s+(?:lever|greenhouse|workable|ashby|jobvite|teamtailor|workday|jobsoid|zoho\s+recruit|inhire)\b',
+    r'\b(?:back\s+to\s+(?:all\s+)?jobs|view\s+all\s+jobs|share\s+this\s+job|see\s+all\s+open\s+positions)\b[.!]?',
+    r'\bremote\s*[-,–|/]\s*latam\b[.,]?',
+    r'\.\.\.|…',
+]
+TITLE_BOILERPLATE = [
+    r'^job\s+application\s+for\s+',
+    r'\s*[-|–]\s*(?:lever|greenhouse|workable|ashby(?:hq)?|jobvite|teamtailor|workday|jobsoid|zoho\s+recruit|inhire|linkedin)\s*$',
+    r'\s*[-|–]\s*(?:careers?|jobs?)\s*$',
+]
+
+_SNIPPET_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in SNIPPET_BOILERPLATE), re.IGNORECASE)
+_TITLE_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in TITLE_BOILERPLATE), re.IGNORECASE)
+_SPACES_RE = re.compile(r'\s+')
+_DANGLING_RE = re.compile(r'^[\s.,;:·|–—-]+|[\s,;:·|–—-]+$')
+
+
+###***********************************************************************************************************************###
+def _clean(text, pattern):
+    text = pattern.sub(' ', text.replace('§', ' '))
+    return _DANGLING_RE.sub('', _SPACES_RE.sub(' ', text))
+
+
+def strip_title(title):
+    return _clean(title, _TITLE_RE)
+
+
+def strip_snippet(snippet):
+    return _clean(snippet, _SNIPPET_RE)
+
+
+def url_id(url, length=URL_ID_LENGTH):
+    """
+    Returns:
+        str: Short ID of a posting URL, the same for every URL variant of the posting (see canonical_url)
+    """
+    digest = hashlib.blake2b(canonical_url(url).encode('utf-8'), digest_size=10).digest()
+    return URL_ID_PREFIX + base64.b32encode(digest).decode('ascii')[:length]
+
+
+###***********************************************************************************************************************###
+class PromptCompactor:
+    """
+    Args:
+        budget (int): Estimated listing tokens for the whole run (default: SCREENING_TOKEN_BUDGET)
+        snippet_min_words (int): Words a snippet is cut down to when over budget
+    """
+
+    def __init__(self, budget=None, snippet_min_words=None):
+        self.budget = SCREENING_TOKEN_BUDGET if budget is None else budget
+        self.snippet_min_words = snippet_min_words or SNIPPET_MIN_WORDS
+        self.ids = {}           # ID -> URL
+        self.deferred = set()   # URLs of the listings left for the next run
+        self.spent = 0          # Estimated tokens sent so far
+        self.stats = Counter()  # listings, bytes_before/after, tokens_before/after, truncated, deferred, restored
+        self._lock = threading.RLock()  # compact() takes it too, also from inside fit()
+
+    def _id_for(self, url):
+        with self._lock:
+            length = URL_ID_LENGTH
+            while True:
+                identifier = url_id(url, length)
+                known = self.ids.setdefault(identifier, url)
+                if known == url or canonical_url(known) == canonical_url(url):
+                    return identifier
+                length += 1  # Collision with another posting: a longer ID for this one
+
+    def compact(self, listing, snippet_words=None):
+        """
+        Returns:
+            str: Prompt line of a listing, screening_text() layout without boilerplate, URL as an ID
+        """
+        snippet = strip_snippet(listing.snippet)
+        if snippet_words is not None:
+            words = snippet.split(' ')
+            if len(words) > snippet_words:
+                snippet = ' '.join(words[:snippet_words])
+        return f"Title: {strip_title(listing.title)} §URL: {self._id_for(listing.url)} §Snippet: {snippet} §---"
+
+    def fit(self, listings, kept_listings=None):
+        """
+            Compact listings and fit them into what is left of the run budget: the listings with the
+            fewest profile matches get their snippets shortened first, then are deferred to the next run.
+        Args:
+            listings (list): JobListing records to screen
+            kept_listings (list): When given, receives the listings kept, in the order of the lines
+        Returns:
+            list: Prompt lines of the listings kept, in listing order
+        """
+        lines = [self.compact(listing) for listing in listings]
+        costs = [estimate_tokens(line) + 1 for line in lines]  # + the newline joining listings
+        before = [listing.screening_text() for listing in listings]
+        before_costs = [estimate_tokens(text) + 1 for text in before]
+        ranked = sorted(range(len(listings)), key=lambda index: (listings[index].total_matches or 0, -index))
+
+        # Concurrent batches (streaming run) share the budget: one fit at a time
+        with self._lock:
+            remaining = self.budget - self.spent
+            total = sum(costs)
+            truncated = 0
+            for index in ranked:
+                if total <= remaining:
+                    break
+                shorter = self.compact(listings[index], self.snippet_min_words)
+                if shorter != lines[index]:
+                    shorter_cost = estimate_tokens(shorter) + 1
+                    total -= costs[index] - shorter_cost
+                    lines[index], costs[index] = shorter, shorter_cost
+                    truncated += 1
+
+            kept = set(range(len(listings)))
+            for index in ranked:
+                if total <= remaining:
+                    break
+                kept.discard(index)
+                total -= costs[index]
+
+            self.spent += total
+            for index in kept:
+                self.stats['bytes_before'] += len(before[index].encode('utf-8')) + 1
+                self.stats['bytes_after'] += len(lines[index].encode('utf-8')) + 1
+                self.stats['tokens_before'] += before_costs[index]
+                self.stats['tokens_after'] += costs[index]
+            self.stats['listings'] += len(kept)
+            self.stats['truncated'] += truncated
+            self.stats['deferred'] += len(listings) - len(kept)
+            self.deferred.update(listings[index].url for index in range(len(listings)) if index not in kept)
+
+        count('prompt_tokens_saved', sum(before_costs[index] - costs[index] for index in kept))
+        if kept_listings is not None:
+            kept_listings.extend(listings[index] for index in sorted(kept))
+        return [lines[index] for index in sorted(kept)]
+
+    def restore(self, jobs, field='link'):
+        """
+        Returns:
+            list: The screened jobs, with the IDs the agent echoed in `field` mapped back to the posting URLs
+        """
+        restored = 0
+        for job in jobs:
+            value = str(job.get(field, '')).strip()
+            if value in self.ids:
+                job[field] = self.ids[value]
+                restored += 1
+        with self._lock:
+            self.stats['restored'] += restored
+        return jobs
+
+    ###*******************************************************************************************************************###
+    def report(self):
+        """
+        Returns:
+            dict: Bytes and estimated tokens before/after compaction, and the listings shortened or deferred
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        stats['bytes_saved'] = stats.get('bytes_before', 0) - stats.get('bytes_after', 0)
+        stats['tokens_saved'] = stats.get('tokens_before', 0) - stats.get('tokens_after', 0)
+        stats['budget'] = None if self.budget == float('inf') else self.budget
+        return stats
+
+    def print_report(self):
+        stats = self.report()
+        if not stats.get('listings') and not stats.get('deferred'):
+            return
+
+        def saved(before, after):
+            return f"{before} → {after} (-{(before - after) / before:.0%})" if before else f"{before} → {after}"
+
+        print(f"[compactação] {stats.get('listings', 0)} vagas na triagem: "
+              f"bytes {saved(stats.get('bytes_before', 0), stats.get('bytes_after', 0))}, "
+              f"~tokens {saved(stats.get('tokens_before', 0), stats.get('tokens_after', 0))}, "
+              f"{stats.get('truncated', 0)} snippets encurtados, {stats.get('deferred', 0)} vagas adiadas para a próxima execução")
@@ -0,0 +1,165 @@
+"""
+query_planner.py
+
+Spends the daily Google Custom Search budget where it pays off.
+
+Before the search, every ATS gets a number of pages from its historical yield (postings kept
+by the token filter and recommended by the seeker agent, per page fetched, from the run
+archive): each source gets MIN pages, the rest of the budget goes page by page to the source
+with the best expected yield, a source's every extra page being worth PAGE_DECAY times the
+previous one. While searching, a query stops early when a page is short (end of the results)
+or brings no new URL (every posting already seen in this run or in a previous one), instead
+of trusting Google's unreliable totalResults.
+
+The plan and the actual usage are printed and archived per run (RunArchive.record_search_usage).
+"""
+import heapq
+import threading
+
+from seen_index import canonical_url
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+SEARCH_DAILY_BUDGET = 100      # Google Custom Search calls per day (free tier)
+PLANNER_MIN_PAGES = 1          # Pages every ATS gets, whatever its history
+PLANNER_MAX_PAGES = 10         # Google serves at most 100 results (10 pages) per query
+PLANNER_HISTORY_DAYS = 30
+PAGE_DECAY = 0.6               # Expected yield of a source's next page, relative to the previous one
+RECOMMENDED_WEIGHT = 3         # A recommended posting is worth this many filtered ones
+PRIOR_PAGES = 2                # Smoothing: a source's yield starts from the average yield over this many pages
+PAGE_SIZE = 10
+
+
+###***********************************************************************************************************************###
+def source_yields(sources, history):
+    """
+    Args:
+        sources (list): ATS names
+        history (dict): source -> {'pages', 'filtered', 'recommended'} (see RunArchive.search_history)
+    Returns:
+        dict: source -> expected value of its first page
+    """
+    def value(entry):
+        return entry['filtered'] + RECOMMENDED_WEIGHT * entry['recommended']
+
+    known = [history[source] for source in sources if history.get(source, {}).get('pages')]
+    total_pages = sum(entry['pages'] for entry in known)
+    # Sources without history start at the average yield (1 when nothing is known yet)
+    average = sum(value(entry) for entry in known) / total_pages if total_pages else 1.0
+
+    yields = {}
+    for source in sources:
+        entry = history.get(source) or {'pages': 0, 'filtered': 0, 'recommended': 0}
+        yields[source] = (value(entry) + average * PRIOR_PAGES) / (entry['pages'] + PRIOR_PAGES)
+    return yields
+
+
+def allocate_pages(yields, budget, min_pages=PLANNER_MIN_PAGES, max_pages=PLANNER_MAX_PAGES):
+    """
+    Returns:
+        dict: source -> pages, summing to at most `budget`
+    """
+    plan = {source: 0 for source in yields}
+    remaining = max(0, budget)
+
+    # Minimum pages first, best sources first when the budget can't cover everyone
+    for source in sorted(yields, key=lambda source: -yields[source]):
+        plan[source] = min(min_pages, max_pages, remaining)
+        remaining -= plan[source]
+
+    heap = [(-yields[source] * PAGE_DECAY ** plan[source], source) for source in yields if plan[source] < max_pages]
+    heapq.heapify(heap)
+    while remaining > 0 and heap:
+        _, source = heapq.heappop(heap)
+        plan[source] += 1
+        remaining -= 1
+        if plan[source] < max_pages:
+            heapq.heappush(heap, (-yields[source] * PAGE_DECAY ** plan[source], source))
+    return plan
+
+
+###***********************************************************************************************************************###
+class QueryPlanner:
+    """
+    Args:
+        sources (list): ATS names (lib/queries.json keys)
+        history (dict): Past yield per source (see RunArchive.search_history)
+        budget (int): Google calls left for today
+        known (callable): url -> bool, postings processed in previous runs (e.g. a SeenIndex)
+    """
+
+    def __init__(self, sources, history=None, budget=SEARCH_DAILY_BUDGET, known=None,
+                 min_pages=PLANNER_MIN_PAGES, max_pages=PLANNER_MAX_PAGES):
+        self.budget = budget
+        self.yields = source_yields(list(sources), history or {})
+        self.plan = allocate_pages(self.yields, budget, min_pages, max_pages)
+        self.usage = {source: {'pages': 0, 'api_calls': 0, 'cache_hits': 0, 'new_urls': 0, 'stop_reason': ''} for source in self.plan}
+        self._known = known
+        self._urls = set()
+        # Queries are paginated concurrently
+        self._lock = threading.Lock()
+
+    def has_budget(self, source):
+        with self._lock:
+            if self.usage[source]['pages'] < self.plan[source]:
+                return True
+            self.usage[source]['stop_reason'] = self.usage[source]['stop_reason'] or 'plano'
+            return False
+
+    def record_page(self, source, listings, cached=False, api_calls=1):
+        """
+            Account for a fetched page and decide whether its query goes on.
+        Args:
+            listings (list): JobListing records of the page
+            cached (bool): The page came from the search cache (no API call)
+            api_calls (int): Requests the page cost, retries included (see search_google)
+        Returns:
+            bool: True when the next page is worth fetching
+        """
+        # Postings processed in previous runs don't count as new (the seen index has its own lock)
+        candidates = {canonical_url(listing.url): listing.url for listing in listings}
+        if self._known is not None:
+            fresh = {key for key, url in candidates.items() if not self._known(url)}
+        else:
+            fresh = set(candidates)
+
+        with self._lock:
+            usage = self.usage[source]
+            usage['pages'] += 1
+            if cached:
+                usage['cache_hits'] += 1
+            else:
+                usage['api_calls'] += api_calls
+            new = fresh - self._urls
+            self._urls.update(candidates)
+            usage['new_urls'] += len(new)
+            if len(listings) < PAGE_SIZE:
+                usage['stop_reason'] = 'fim dos resultados'
+            elif not new:
+                usage['stop_reason'] = 'página sem URLs novas'
+            elif usage['pages'] >= self.plan[source]:
+                usage['stop_reason'] = 'plano'
+            else:
+                return True
+            return False
+
+    def record_failure(self, source, api_calls=1):
+        """Account for a page that could not be fetched: its calls count against the budget, the query stops."""
+        with self._lock:
+            self.usage[source]['api_calls'] += api_calls
+            self.usage[source]['stop_reason'] = 'erro na busca'
+
+    def print_plan(self):
+        print(f"[planner] Orçamento: {self.budget} chamadas, {sum(self.plan.values())} páginas planejadas")
+        for source, pages in sorted(self.plan.items(), key=lambda entry: -entry[1]):
+            print(f"[planner] {source}: {pages} páginas (rendimento esperado {self.yields[source]:.2f}/página)")
+
+    def print_usage(self):
+        totals = {'pages': 0, 'api_calls': 0, 'cache_hits': 0, 'new_urls': 0}
+        for source, usage in self.usage.items():
+            for key in totals:
+                totals[key] += usage[key]
+            print(f"[planner] {source}: {usage['pages']}/{self.plan[source]} páginas, {usage['api_calls']} chamadas, "
+                  f"{usage['cache_hits']} do cache, {usage['new_urls']} URLs novas ({usage['stop_reason'] or '-'})")
+        print(f"[planner] Total: {totals['pages']} páginas, {totals['api_calls']} chamadas de {self.budget}, "
+              f"{totals['cache_hits']} do cache, {totals['new_urls']} URLs novas")
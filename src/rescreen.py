@@ -0,0 +1,284 @@
+"""
+rescreen.py
+
+Re-runs the offline stages of past runs over their archived outputs, after the profile tokens or
+the parsing of the agent answers changed, instead of one main() per archived file:
+    - job_results*.json (raw listings): filter_job_listings, for every profile (see profiles.py)
+    - ai_screening*.json (screening agent answers): screening_items, then parse_ai_screening_results
+    - job_analysis*.json (seeker agent answers): extract_json_blocks, with its JSON repair
+
+Matching and JSON repair are CPU-bound: the files are sharded over a ProcessPoolExecutor, one file
+per task. Only paths go to the workers (each one reads and parses its file) and at most
+RESCREEN_TASKS_PER_WORKER tasks per worker are in flight, so the archive is streamed, never held
+in memory. A progress line is printed every RESCREEN_PROGRESS_SECONDS.
+
+Merged results go to output/rescreen/ (a posting found in several archives is kept once, from the
+last file in path order: with dated archive names, the most recent run):
+    - job_results_filtered.json: profile name -> listings kept by the profile
+    - ai_screening.json and ai_screening.txt (parse_ai_screening_results)
+    - job_analysis.json
+    - summary.json: counts, and the files that could not be read
+
+Usage:
+    python src/rescreen.py [PATH ...] [--workers N] [--output DIR]
+    (PATH: archived files or directories, searched recursively; default: output/)
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from job_listing import JobListing
+from job_search import filter_job_listings, parse_ai_screening_results
+from json_extractor import extract_json_blocks
+from profiles import load_profiles
+from screening_scheduler import screening_items
+from seen_index import canonical_url
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+ARCHIVE_DIR = os.path.join(os.path.dirname(__file__), '../output')
+RESCREEN_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '../output/rescreen')
+RESCREEN_TASKS_PER_WORKER = 4    # Files queued per worker: keeps every worker busy, bounds the results waiting
+RESCREEN_PROGRESS_SECONDS = 1.0
+
+# File name prefix -> kind of archive (job_results_filtered files are a subset of job_results: skipped)
+ARCHIVE_KINDS = [('job_results_filtered', None), ('job_results', 'listings'), ('ai_screening', 'screening'), ('job_analysis', 'analysis')]
+
+_profiles = None  # Profiles of a worker process, loaded once by _init_worker
+
+
+###***********************************************************************************************************************###
+def archive_kind(path):
+    """
+    Returns:
+        str: 'listings', 'screening' or 'analysis', or None when the file is no archived output
+    """
+    name = os.path.basename(path)
+    if not name.endswith('.json'):
+        return None
+    for prefix, kind in ARCHIVE_KINDS:
+        if name.startswith(prefix):
+            return kind
+    return None
+
+
+def iter_archives(paths, exclude=None):
+    """
+    Yields:
+        str: Archived output files among `paths` (directories are searched recursively, in name order)
+    """
+    exclude = os.path.abspath(exclude) if exclude else None
+    for path in paths:
+        if os.path.isfile(path):
+            if archive_kind(path):
+                yield path
+            continue
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories[:] = sorted(name for name in subdirectories if os.path.abspath(os.path.join(directory, name)) != exclude)
+            for name in sorted(files):
+                if archive_kind(name):
+                    yield os.path.join(directory, name)
+
+
+###***********************************************************************************************************************###
+def _init_worker(profiles_path):
+    global _profiles
+    _profiles = load_profiles(profiles_path)
+
+
+def rescreen_file(path):
+    """
+        Re-run the stage of one archived file (in a worker process).
+    Returns:
+        dict: {'path', 'kind', 'items' (records read), 'error'} and, by kind, 'filtered' (profile name ->
+              listing dicts), 'jobs' (screened jobs) or 'analyses' (job analyses), as (canonical URL, record)
+              pairs: the URLs are canonicalized here, in parallel, not by the merge
+    """
+    kind = archive_kind(path)
+    result = {'path': path, 'kind': kind, 'items': 0, 'error': None}
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+
+        if kind == 'listings':
+            listings = [JobListing.from_dict(listing) for listing in data]
+            filtered = filter_job_listings(listings, profiles=_profiles)
+            result['items'] = len(listings)
+            result['filtered'] = {
+                name: [(canonical_url(listing.url), listing.to_dict()) for listing in kept] for name, kept in filtered.items()
+            }
+        elif kind == 'screening':
+            jobs = screening_items(data)
+            result['items'] = len(jobs)
+            result['jobs'] = [(canonical_url(job.get('link') or ''), job) for job in jobs if isinstance(job, dict)]
+        elif kind == 'analysis':
+            # The raw answer of the seeker agent (None when the run had nothing to analyze)
+            blocks = extract_json_blocks(data) if isinstance(data, str) else [data or []]
+            analyses = [item for block in blocks for item in (block if isinstance(block, list) else [block])]
+            result['items'] = len(analyses)
+            result['analyses'] = [(canonical_url(item.get('URL') or ''), item) for item in analyses if isinstance(item, dict)]
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+
+###***********************************************************************************************************************###
+class RescreenMerge:
+    """
+        Merges the file results as they complete, one record per posting (the last file in path order wins).
+    Args:
+        profiles (list): Profile names
+    """
+
+    def __init__(self, profiles):
+        self.filtered = {name: {} for name in profiles}  # profile name -> canonical URL -> ((file position, index), listing)
+        self.jobs = {}
+        self.analyses = {}
+        self.counts = Counter()
+        self.errors = []
+
+    @staticmethod
+    def _keep(records, key, position, record):
+        # position: (file position, index in the file), so the merged order doesn't depend on which worker finished first
+        if key and (key not in records or records[key][0] <= position):
+            records[key] = (position, record)
+
+    def add(self, position, result):
+        self.counts['files'] += 1
+        if result['error'] is not None:
+            self.errors.append({'path': result['path'], 'error': result['error']})
+            return
+        self.counts[result['kind']] += 1
+        self.counts[f"{result['kind']}_items"] += result['items']
+        for name, listings in result.get('filtered', {}).items():
+            records = self.filtered.setdefault(name, {})
+            for index, (key, listing) in enumerate(listings):
+                self._keep(records, key, (position, index), listing)
+        for index, (key, job) in enumerate(result.get('jobs', [])):
+            self._keep(self.jobs, key, (position, index), job)
+        for index, (key, job_analysis) in enumerate(result.get('analyses', [])):
+            self._keep(self.analyses, key, (position, index), job_analysis)
+
+    @staticmethod
+    def _records(records):
+        return [record for _, record in sorted(records.values(), key=lambda entry: entry[0])]
+
+    def write(self, output_dir):
+        """
+        Returns:
+            dict: The summary, also written to summary.json
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        filtered = {name: self._records(records) for name, records in self.filtered.items()}
+        jobs, analyses = self._records(self.jobs), self._records(self.analyses)
+        outputs = {
+            'job_results_filtered.json': filtered,
+            'ai_screening.json': jobs,
+            'job_analysis.json': analyses,
+        }
+        for name, data in outputs.items():
+            # One-shot and without indentation: the C encoder (indent falls back to the pure Python one,
+            # the merge of a long archive would be written by a single core for seconds)
+            with open(os.path.join(output_dir, name), 'w', encoding='utf-8') as f:
+                f.write(json.dumps(data, ensure_ascii=False))
+
+        screening_text = parse_ai_screening_results(jobs)
+        if screening_text is not None:
+            with open(os.path.join(output_dir, 'ai_screening.txt'), 'w', encoding='utf-8') as f:
+                f.write(screening_text)
+
+        summary = {
+            'files': self.counts['files'],
+            'archives': {kind: self.counts[kind] for kind in ('listings', 'screening', 'analysis')},
+            'records_read': {kind: self.counts[f"{kind}_items"] for kind in ('listings', 'screening', 'analysis')},
+            'filtered': {name: len(listings) for name, listings in filtered.items()},
+            'screened': len(jobs),
+            'analyses': len(analyses),
+            'errors': self.errors,
+        }
+        with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        return summary
+
+
+def print_progress(done, total, records, start, final=False):
+    elapsed = time.monotonic() - start
+    rate = done / elapsed if elapsed else 0.0
+    eta = (total - done) / rate if rate else 0.0
+    print(f"[rescreen] {done}/{total} arquivos ({done / max(total, 1):.0%}), {records} registros, "
+          f"{rate:.1f} arquivos/s, {'total' if final else 'faltam'} {elapsed if final else eta:.1f}s", flush=True)
+
+
+###***********************************************************************************************************************###
+def rescreen_archives(paths=None, output_dir=None, workers=None, profiles_path=None, progress=True):
+    """
+        Re-run filtering and answer parsing over every archived output among `paths`, in parallel.
+    Args:
+        paths (list): Files or directories (default: ARCHIVE_DIR)
+        output_dir (str): Where the merged results go (default: RESCREEN_OUTPUT_DIR, never read as input)
+        workers (int): Worker processes (default: os.cpu_count())
+        profiles_path (str): Profiles file (default: see profiles.load_profiles)
+        progress (bool): Print a progress line every RESCREEN_PROGRESS_SECONDS
+    Returns:
+        dict: Summary (see RescreenMerge.write), with 'workers' and 'seconds'
+    """
+    paths = paths or [ARCHIVE_DIR]
+    output_dir = output_dir or RESCREEN_OUTPUT_DIR
+    workers = workers or os.cpu_count() or 1
+    archives = list(iter_archives(paths, exclude=output_dir))  # Names only: contents are read by the workers
+    merge = RescreenMerge([profile.name for profile in load_profiles(profiles_path)])
+
+    start = last_report = time.monotonic()
+    records = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(profiles_path,)) as executor:
+        pending = {}
+        queue = iter(enumerate(archives))
+        while True:
+            while len(pending) < workers * RESCREEN_TASKS_PER_WORKER:
+                position, path = next(queue, (None, None))
+                if path is None:
+                    break
+                pending[executor.submit(rescreen_file, path)] = position
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                merge.add(pending.pop(future), result)
+                records += result['items']
+            if progress and time.monotonic() - last_report >= RESCREEN_PROGRESS_SECONDS:
+                print_progress(merge.counts['files'], len(archives), records, start)
+                last_report = time.monotonic()
+
+    summary = merge.write(output_dir)
+    summary.update(workers=workers, seconds=round(time.monotonic() - start, 3))
+    if progress:
+        print_progress(merge.counts['files'], len(archives), records, start, final=True)
+    return summary
+
+
+############################################# MAIN ###################################################
+def main():
+    parser = argparse.ArgumentParser(description="Re-run filtering and answer parsing over archived run outputs, in parallel")
+    parser.add_argument('paths', nargs='*', help="Archived output files or directories (default: output/)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument('--output', default=None, help="Directory of the merged results (default: output/rescreen/)")
+    parser.add_argument('--profiles', default=None, help="Profiles file (default: lib/profiles.json, or the default profile)")
+    args = parser.parse_args()
+
+    summary = rescreen_archives(args.paths, args.output, args.workers, args.profiles)
+    print(f"{summary['files']} arquivos ({summary['archives']['listings']} de vagas, {summary['archives']['screening']} de triagem, "
+          f"{summary['archives']['analysis']} de análise) em {summary['seconds']:.1f}s com {summary['workers']} processos")
+    for name, kept in summary['filtered'].items():
+        print(f"[{name}] {kept} vagas mantidas pelo filtro")
+    print(f"{summary['screened']} vagas triadas, {summary['analyses']} análises")
+    for error in summary['errors']:
+        print(f"Erro em {error['path']}: {error['error']}")
+    print(f"Resultados em {args.output or RESCREEN_OUTPUT_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+run_archive.py
+
+Append-only archive of every run, stored in SQLite under output/.
+
+Each run gets a row in `runs`; every raw listing it found gets a row in `postings` (run id,
+run timestamp and day, ATS source), later completed with its token analysis (matched tokens and
+relevance score, see profile_index.py), screening score
+and the seeker agent classification/recommendation. The output/*.json files are still written
+for inspection, but they only hold the last run: history questions are answered from here.
+
+Usage:
+    python src/run_archive.py per-day [--since 2025-01-01]
+    python src/run_archive.py rate [--recommendation CANDIDATAR-SE] [--since 2025-01-01]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from seen_index import canonical_url
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+RUN_ARCHIVE_PATH = os.path.join(os.path.dirname(__file__), '../output/run_archive.sqlite')
+
+# Host suffix -> ATS name, as in lib/queries.json. Other hosts are archived under their own domain.
+ATS_HOSTS = {
+    'lever.co': 'lever',
+    'workable.com': 'workable',
+    'ashbyhq.com': 'ashby',
+    'greenhouse.io': 'greenhouse',
+    'jobvite.com': 'jobvite',
+    'teamtailor.com': 'teamtailor',
+    'myworkdayjobs.com': 'workday',
+    'applytojob.com': 'applytojob',
+    'jobsoid.com': 'jobsoid',
+    'linkedin.com': 'linkedin',
+    'inhire.app': 'inhire',
+    'zohorecruit.com': 'zoho',
+}
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY, started_at REAL, day TEXT, mode TEXT, finished_at REAL)",
+    "CREATE TABLE IF NOT EXISTS postings ("
+    " run_id INTEGER, run_at REAL, day TEXT, source TEXT, url_key TEXT, url TEXT, title TEXT, snippet TEXT,"
+    " total_matches INTEGER, matches_pt TEXT, matches_en TEXT, fit_score REAL,"
+    " classification TEXT, recommendation TEXT, analysis TEXT, relevance_score REAL,"
+    " PRIMARY KEY (run_id, url_key))",
+    # Covering indexes of the history queries
+    "CREATE INDEX IF NOT EXISTS postings_day_source ON postings (day, source, url_key)",
+    "CREATE INDEX IF NOT EXISTS postings_source_recommendation ON postings (source, recommendation, day)",
+    # Google pages planned and spent per ATS (see query_planner.py)
+    "CREATE TABLE IF NOT EXISTS search_usage ("
+    " run_id INTEGER, day TEXT, source TEXT, planned_pages INTEGER, pages INTEGER, api_calls INTEGER,"
+    " cache_hits INTEGER, new_urls INTEGER, stop_reason TEXT, PRIMARY KEY (run_id, source))",
+]
+# Columns added after the first archives were written: (table, column, type)
+ADDED_COLUMNS = [('postings', 'relevance_score', 'REAL')]
+RECOMMENDED = ('INVESTIGAR MAIS', 'CANDIDATAR-SE')  # Recommendations that become Trello cards
+
+
+###***********************************************************************************************************************###
+def ats_source(url):
+    """
+    Returns:
+        str: ATS name of a posting URL (see ATS_HOSTS), or its domain
+    """
+    host = urlsplit(url.strip()).netloc.lower().split('@')[-1].split(':')[0]
+    for suffix, name in ATS_HOSTS.items():
+        if host == suffix or host.endswith('.' + suffix):
+            return name
+    return host[4:] if host.startswith('www.') else host
+
+
+class RunArchive:
+    """
+    Args:
+        path (str): SQLite file
+    """
+
+    def __init__(self, path=RUN_ARCHIVE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Shared by the threads of the streaming pipeline
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+        for table, column, column_type in ADDED_COLUMNS:
+            if column not in {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        self._conn.commit()
+        self._runs = {}  # run_id -> (started_at, day)
+
+    def start_run(self, mode='staged', started_at=None):
+        """
+        Returns:
+            int: Id of the new run
+        """
+        started_at = started_at or time.time()
+        day = datetime.fromtimestamp(started_at).strftime('%Y-%m-%d')
+        with self._lock:
+            run_id = self._conn.execute(
+                "INSERT INTO runs (started_at, day, mode) VALUES (?, ?, ?)", (started_at, day, mode)
+            ).lastrowid
+            self._conn.commit()
+        self._runs[run_id] = (started_at, day)
+        return run_id
+
+    def resume_run(self, run_id):
+        """
+            Continue an unfinished run (see checkpoint.py): listings recorded again update its rows.
+        Returns:
+            bool: False when the run is not in the archive
+        """
+        row = self.query("SELECT started_at, day FROM runs WHERE run_id = ?", (run_id,))
+        if not row:
+            return False
+        self._runs[run_id] = tuple(row[0])
+        return True
+
+    def finish_run(self, run_id):
+        with self._lock:
+            self._conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+            self._conn.commit()
+
+    def record_listings(self, run_id, listings):
+        """
+            Archive raw JobListing records (with their token analysis once filtered).
+            A listing recorded again in the same run only gets its token analysis updated.
+        """
+        run_at, day = self._runs[run_id]
+        rows = []
+        for listing in listings:
+            rows.append((
+                run_id, run_at, day, listing.source or ats_source(listing.url), canonical_url(listing.url), listing.url,
+                listing.title, listing.snippet, listing.total_matches,
+                _json_or_none(listing.matches_pt), _json_or_none(listing.matches_en), listing.relevance_score,
+            ))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO postings (run_id, run_at, day, source, url_key, url, title, snippet, total_matches, matches_pt, matches_en,"
+                " relevance_score) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(run_id, url_key) DO UPDATE SET"
+                " total_matches = COALESCE(excluded.total_matches, total_matches),"
+                " matches_pt = COALESCE(excluded.matches_pt, matches_pt),"
+                " matches_en = COALESCE(excluded.matches_en, matches_en),"
+                " relevance_score = COALESCE(excluded.relevance_score, relevance_score)",
+                rows
+            )
+            self._conn.commit()
+
+    def record_screening(self, run_id, jobs):
+        """Archive the screening agent scores (jobs with 'link' and 'fit_score')."""
+        rows = [(job.get('fit_score'), run_id, canonical_url(str(job.get('link', '')))) for job in jobs if isinstance(job, dict)]
+        with self._lock:
+            self._conn.executemany("UPDATE postings SET fit_score = ? WHERE run_id = ? AND url_key = ?", rows)
+            self._conn.commit()
+
+    def record_analyses(self, run_id, analyses):
+        """Archive the seeker agent analyses (with 'URL', 'CLASSIFICAÇÃO', 'RECOMENDAÇÃO', 'ANÁLISE')."""
+        rows = [
+            (analysis.get('CLASSIFICAÇÃO'), analysis.get('RECOMENDAÇÃO'), analysis.get('ANÁLISE'), run_id, canonical_url(str(analysis.get('URL', ''))))
+            for analysis in analyses if isinstance(analysis, dict)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE postings SET classification = ?, recommendation = ?, analysis = ? WHERE run_id = ? AND url_key = ?", rows
+            )
+            self._conn.commit()
+
+    def record_search_usage(self, run_id, plan, usage):
+        """
+            Archive the query plan of a run and what it actually spent.
+        Args:
+            plan (dict): source -> planned pages
+            usage (dict): source -> {'pages', 'api_calls', 'cache_hits', 'new_urls', 'stop_reason'}
+        """
+        _, day = self._runs[run_id]
+        rows = [
+            (run_id, day, source, planned, usage[source]['pages'], usage[source]['api_calls'],
+             usage[source]['cache_hits'], usage[source]['new_urls'], usage[source]['stop_reason'])
+            for source, planned in plan.items()
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO search_usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    ###*******************************************************************************************************************###
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def postings_per_source_per_day(self, since=None, until=None):
+        """
+        Returns:
+            list: (day, source, distinct postings) rows, by day then source
+        """
+        return self.query(
+            "SELECT day, source, COUNT(DISTINCT url_key) FROM postings"
+            " WHERE day >= ? AND day <= ? GROUP BY day, source ORDER BY day, source",
+            (since or '', until or '9999'),
+        )
+
+    def recommendation_rate_by_source(self, recommendation='CANDIDATAR-SE', since=None, until=None):
+        """
+        Returns:
+            list: (source, postings, analyzed, recommended, rate) rows, rate = recommended / analyzed
+        """
+        rows = self.query(
+            "SELECT source, COUNT(*), COUNT(recommendation), SUM(recommendation = ?) FROM postings"
+            " WHERE day >= ? AND day <= ? GROUP BY source ORDER BY source",
+            (recommendation, since or '', until or '9999'),
+        )
+        return [(source, total, analyzed, recommended, recommended / analyzed if analyzed else 0.0)
+                for source, total, analyzed, recommended in rows]
+
+    def search_history(self, days=30, min_score=1):
+        """
+            Yield of every ATS over the last `days` days, for the query planner.
+        Args:
+            min_score (float): Relevance score a posting must exceed to count as kept by the token filter
+                               (with several profiles, the lowest min_score: the raw postings keep the
+                               score of the profile they score best with)
+        Returns:
+            dict: source -> {'pages', 'filtered', 'recommended'} (pages fetched, postings kept by the
+                  token filter, postings recommended by the seeker agent)
+        """
+        since = datetime.fromtimestamp(time.time() - days * 86400).strftime('%Y-%m-%d')
+        history = {}
+        for source, pages in self.query("SELECT source, SUM(pages) FROM search_usage WHERE day >= ? GROUP BY source", (since,)):
+            history[source] = {'pages': pages or 0, 'filtered': 0, 'recommended': 0}
+
+        # Distinct postings: a posting found again by a later run is no extra yield
+        # Postings archived before relevance_score fall back to their token count (the score with default weights)
+        placeholders = ','.join('?' * len(RECOMMENDED))
+        rows = self.query(
+            "SELECT source, COUNT(DISTINCT CASE WHEN COALESCE(relevance_score, total_matches) > ? THEN url_key END),"
+            f" COUNT(DISTINCT CASE WHEN recommendation IN ({placeholders}) THEN url_key END) FROM postings"
+            " WHERE day >= ? GROUP BY source",
+            (min_score, *RECOMMENDED, since),
+        )
+        for source, filtered, recommended in rows:
+            # Postings of runs without usage records (older runs) don't tell a yield per page
+            if source in history:
+                history[source].update(filtered=filtered or 0, recommended=recommended or 0)
+        return history
+
+    def api_calls_today(self):
+        day = datetime.now().strftime('%Y-%m-%d')
+        return self.query("SELECT COALESCE(SUM(api_calls), 0) FROM search_usage WHERE day = ?", (day,))[0][0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _json_or_none(value):
+    return None if value is None else json.dumps(value, ensure_ascii=False)
+
+
+###***********************************************************************************************************************###
+def main():
+    parser = argparse.ArgumentParser(description="Query the run archive")
+    parser.add_argument('report', choices=['per-day', 'rate'])
+    parser.add_argument('--since', default=None, help="First day (YYYY-MM-DD)")
+    parser.add_argument('--until', default=None, help="Last day (YYYY-MM-DD)")
+    parser.add_argument('--recommendation', default='CANDIDATAR-SE')
+    parser.add_argument('--path', default=RUN_ARCHIVE_PATH)
+    args = parser.parse_args()
+
+    archive = RunArchive(args.path)
+    if args.report == 'per-day':
+        for day, source, postings in archive.postings_per_source_per_day(args.since, args.until):
+            print(f"{day}  {source:<20} {postings:>6}")
+    else:
+        for source, total, analyzed, recommended, rate in archive.recommendation_rate_by_source(args.recommendation, args.since, args.until):
+            print(f"{source:<20} {total:>7} vagas {analyzed:>6} analisadas {recommended:>6} {args.recommendation} ({rate:.1%})")
+    archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+screening_cache.py
+
+Persistent cache of the Dify verdicts per listing, stored in SQLite under output/.
+
+A verdict (screening item with 'fit_score', or seeker analysis with 'CLASSIFICAÇÃO',
+'RECOMENDAÇÃO', 'ANÁLISE') is keyed on a hash of the normalized title+URL+snippet of the
+listing, the agent identity and the prompt version. Changing the agent or bumping the
+prompt version invalidates the old verdicts. Entries expire after a TTL and the least
+recently used ones are evicted past a size cap.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from seen_index import canonical_url
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+SCREENING_CACHE_PATH = os.path.join(os.path.dirname(__file__), '../output/screening_cache.sqlite')
+SCREENING_CACHE_TTL = 30 * 24 * 60 * 60   # Seconds. A posting's text rarely changes within a month
+SCREENING_CACHE_MAX_ENTRIES = 50000
+
+_SPACES_RE = re.compile(r'\s+')
+
+
+###***********************************************************************************************************************###
+def agent_identity(api_key, agent_url, prompt_version):
+    """
+    Identify an agent without storing its API key.
+    """
+    key_hash = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+    return f"{agent_url}|{key_hash}|v{prompt_version}"
+
+
+def listing_key(listing, agent):
+    title = _SPACES_RE.sub(' ', listing.title).strip().lower()
+    snippet = _SPACES_RE.sub(' ', listing.snippet).strip().lower()
+    raw = json.dumps([title, canonical_url(listing.url), snippet, agent], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ScreeningCache:
+    """
+    Args:
+        path (str): SQLite file
+        ttl (int): Seconds a verdict stays valid
+        max_entries (int): Entries kept (least recently used are evicted first)
+    """
+
+    def __init__(self, path=SCREENING_CACHE_PATH, ttl=SCREENING_CACHE_TTL, max_entries=SCREENING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, kind TEXT, url TEXT, created_at REAL, last_access REAL, verdict TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_last_access ON verdicts (last_access)")
+        self._conn.execute("DELETE FROM verdicts WHERE created_at < ?", (time.time() - self.ttl,))
+        self._conn.commit()
+
+    def _count(self, kind, name, value=1):
+        kind_stats = self.stats.setdefault(kind, {'hits': 0, 'misses': 0, 'stored': 0})
+        kind_stats[name] += value
+
+    def lookup(self, listings, agent, kind):
+        """
+        Split listings into cached verdicts and listings still to be sent to the agent.
+        Args:
+            listings (list): JobListing records
+            agent (str): agent_identity() of the agent producing the verdicts
+            kind (str): 'screening' or 'analysis'
+        Returns:
+            tuple: (cached verdicts in listing order, listings missing from the cache)
+        """
+        now = time.time()
+        verdicts = []
+        missing = []
+
+        with self._lock:
+            for listing in listings:
+                key = f"{kind}:{listing_key(listing, agent)}"
+                row = self._conn.execute(
+                    "SELECT verdict FROM verdicts WHERE key = ? AND created_at >= ?", (key, now - self.ttl)
+                ).fetchone()
+                if row is None:
+                    missing.append(listing)
+                    self._count(kind, 'misses')
+                else:
+                    self._conn.execute("UPDATE verdicts SET last_access = ? WHERE key = ?", (now, key))
+                    verdicts.append(json.loads(row[0]))
+                    self._count(kind, 'hits')
+            self._conn.commit()
+
+        return verdicts, missing
+
+    def store(self, listings, verdicts, agent, kind, url_field):
+        """
+        Save verdicts, matched back to their listing by canonical URL.
+        Args:
+            listings (list): Listings that were sent to the agent
+            verdicts (list): Objects returned by the agent
+            url_field (str): Verdict key holding the listing URL ('link' for screening, 'URL' for analysis)
+        Returns:
+            int: Verdicts stored (verdicts without a matching listing are skipped)
+        """
+        by_url = {canonical_url(listing.url): listing for listing in listings}
+        now = time.time()
+        rows = []
+        for verdict in verdicts:
+            listing = by_url.get(canonical_url(str(verdict.get(url_field, '')))) if isinstance(verdict, dict) else None
+            if listing is not None:
+                key = f"{kind}:{listing_key(listing, agent)}"
+                rows.append((key, kind, listing.url, now, now, json.dumps(verdict, ensure_ascii=False)))
+
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._count(kind, 'stored', len(rows))
+
+            # LRU eviction past the cap
+            excess = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY last_access LIMIT ?)", (excess,)
+                )
+            self._conn.commit()
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def print_stats(self):
+        for kind, values in sorted(self.stats.items()):
+            lookups = values['hits'] + values['misses']
+            hit_rate = 100 * values['hits'] / lookups if lookups else 0
+            print(f"[{kind} cache] {values['hits']} hits, {values['misses']} misses ({hit_rate:.0f}% hit rate), {values['stored']} stored")
@@ -0,0 +1,147 @@
+"""
+screening_scheduler.py
+
+Splits the Dify screening of job listings into token-budgeted chunks, screens the chunks
+concurrently (bounded parallelism) and merges the per-chunk answers into one list of jobs,
+the structure parse_ai_screening_results expects. A failed chunk is retried on its own,
+so one bad response no longer loses the whole day.
+"""
+import json
+import re
+import time
+
+from concurrency import ordered_map
+from instrumentation import count
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+SCREENING_CHUNK_TOKENS = 3000   # Estimated input tokens of listings per Dify call
+SCREENING_MAX_CONCURRENCY = 3   # Chunks screened at the same time
+SCREENING_RETRIES = 2           # Extra attempts per failed chunk
+SCREENING_RETRY_BACKOFF = 2     # Seconds, doubled at every retry
+CHARS_PER_TOKEN = 6             # Letters per token of a word, for mixed PT/EN text (see estimate_tokens)
+DIGITS_PER_TOKEN = 3            # Tokenizers split digit runs in groups of up to 3
+
+# One match per estimated token: runs of up to CHARS_PER_TOKEN letters, of up to DIGITS_PER_TOKEN digits, or a symbol
+_TOKEN_PIECE_RE = re.compile(rf'[^\W\d_]{{1,{CHARS_PER_TOKEN}}}|\d{{1,{DIGITS_PER_TOKEN}}}|[^\w\s]|_')
+
+
+###***********************************************************************************************************************###
+class ScreeningError(Exception):
+    """
+        Raised by a run whose screening chunks failed every retry (call failed or answer not a JSON
+        list; a chunk answered with an empty list is screened): the run is left resumable.
+    """
+
+
+def estimate_tokens(text):
+    """
+        Local estimate of the input tokens of `text` (no tokenizer call): words cost a token per
+        CHARS_PER_TOKEN letters, digit runs a token per DIGITS_PER_TOKEN digits and every symbol one.
+        Close to len(text) / 4 on prose, but URLs, IDs and numbers are charged the many short
+        pieces a BPE tokenizer cuts them into.
+    """
+    return len(_TOKEN_PIECE_RE.findall(text))
+
+
+def chunk_listings(formatted_listings, token_budget=SCREENING_CHUNK_TOKENS):
+    """
+    Group formatted listings in order, each group staying under `token_budget`
+    (a single listing larger than the budget gets a chunk of its own).
+    Returns:
+        list: Lists of formatted listings
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for listing in formatted_listings:
+        tokens = estimate_tokens(listing) + 1  # + the newline joining listings
+        if current and current_tokens + tokens > token_budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(listing)
+        current_tokens += tokens
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def screening_items(answer):
+    """
+    Parse a screening answer (```json fenced list, as returned by the agent) into a list of jobs.
+    Raises:
+        json.JSONDecodeError, TypeError: When the answer is not a JSON list
+    """
+    if isinstance(answer, str):
+        # Remove the ```json wrapper if present
+        if answer.startswith('```json'):
+            answer = answer[7:]
+        if answer.endswith('```'):
+            answer = answer[:-3]
+
+        # Clean up escaped characters
+        answer = answer.replace('\\n', ' ').replace('\\xa0', ' ')
+        answer = answer.strip()
+
+        answer = json.loads(answer)
+
+    if not isinstance(answer, list):
+        raise TypeError(f"Expected a list of jobs, got {type(answer).__name__}")
+    return answer
+
+
+###***********************************************************************************************************************###
+def screen_chunk_with_retries(chunk, screen_chunk, retries=SCREENING_RETRIES, label=''):
+    """
+        Screen one chunk, retrying with backoff while the call fails or the answer is not a JSON list.
+    Returns:
+        list: Screened jobs (empty when the agent kept none of the listings), None when every attempt failed
+    """
+    for attempt in range(retries + 1):
+        if attempt:
+            count('screening_retries')
+            time.sleep(SCREENING_RETRY_BACKOFF * 2 ** (attempt - 1))
+        try:
+            return screening_items(screen_chunk(chunk))
+        except (json.JSONDecodeError, TypeError) as e:
+            print(f"Lote {label} falhou (tentativa {attempt + 1}): {e}")
+    print(f"Lote {label} descartado após {retries + 1} tentativas ({len(chunk)} vagas)")
+    return None
+
+
+def screen_in_chunks(formatted_listings, screen_chunk, token_budget=SCREENING_CHUNK_TOKENS,
+                     max_concurrency=SCREENING_MAX_CONCURRENCY, retries=SCREENING_RETRIES, failed=None):
+    """
+        Screen listings chunk by chunk, concurrently.
+    Args:
+        formatted_listings (list): Listings already formatted for the agent
+        screen_chunk (callable): Receives a list of formatted listings, returns the agent answer (None on failure)
+        token_budget (int): Estimated tokens of listings per chunk
+        max_concurrency (int): Chunks in flight at the same time
+        retries (int): Extra attempts for a chunk whose call fails or whose answer is not a JSON list
+        failed (list): When given, receives the positions (in formatted_listings) of the listings of the
+                       chunks that failed every attempt, so the caller can try them again later
+    Returns:
+        list: Jobs of every successful chunk, in listing order
+    """
+    chunks = chunk_listings(formatted_listings, token_budget)
+    starts = [0]
+    for chunk in chunks:
+        starts.append(starts[-1] + len(chunk))
+    print(f"Triagem em {len(chunks)} lotes (~{token_budget} tokens cada, {max_concurrency} em paralelo)")
+
+    def run(entry):
+        index, chunk = entry
+        return screen_chunk_with_retries(chunk, screen_chunk, retries, label=f"{index + 1}/{len(chunks)}")
+
+    merged = []
+    for index, items in enumerate(ordered_map(run, enumerate(chunks), max_workers=max_concurrency)):
+        if items is None:
+            # Failed every attempt (an empty list is an answer: none of the chunk's listings fit)
+            if failed is not None:
+                failed.extend(range(starts[index], starts[index + 1]))
+            continue
+        merged.extend(items)
+    return merged
@@ -0,0 +1,120 @@
+"""
+search_cache.py
+
+Persistent cache of Google Custom Search responses, stored in SQLite under output/.
+
+Entries are content-addressed by a hash of (query, start, num, and the Google 'sort' when there is
+one: date-sorted pages of the daemon never answer a relevance-ordered query), expire after a TTL and the
+file is capped in size (oldest entries are evicted first). A crashed run or a same-day
+re-run fetches again only the pages it does not have yet, saving API quota.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+SEARCH_CACHE_PATH = os.path.join(os.path.dirname(__file__), '../output/search_cache.sqlite')
+SEARCH_CACHE_TTL = 20 * 60 * 60            # Seconds. Queries carry an 'after:' date, so a day is the useful lifetime
+SEARCH_CACHE_MAX_BYTES = 50 * 1024 * 1024  # Size cap of the stored responses
+
+
+###***********************************************************************************************************************###
+def cache_key(query, start, num, sort=None):
+    # Without a sort, the key of the entries written before sorted queries existed
+    raw = json.dumps([query, int(start), int(num)] + ([sort] if sort else []), ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class SearchCache:
+    """
+    Args:
+        path (str): SQLite file
+        ttl (int): Seconds an entry stays valid
+        max_bytes (int): Max total size of stored responses
+        refresh (bool): Ignore stored entries (still stores the new responses)
+    """
+
+    def __init__(self, path=SEARCH_CACHE_PATH, ttl=SEARCH_CACHE_TTL, max_bytes=SEARCH_CACHE_MAX_BYTES, refresh=False):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, query TEXT, start INTEGER, num INTEGER,"
+            " created_at REAL, size INTEGER, body TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+        self._conn.commit()
+        self.evict_expired()
+
+    def get(self, query, start, num=10, sort=None):
+        """
+        Args:
+            sort (str): Google 'sort' of the query (None: relevance order)
+        Returns:
+            dict: Cached search_google output, or None on a miss
+        """
+        with self._lock:
+            row = None
+            if not self.refresh:
+                row = self._conn.execute(
+                    "SELECT body FROM responses WHERE key = ? AND created_at >= ?",
+                    (cache_key(query, start, num, sort), time.time() - self.ttl)
+                ).fetchone()
+
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+
+            self.stats['hits'] += 1
+            return json.loads(row[0])
+
+    def set(self, query, start, num, value, sort=None):
+        body = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, query, start, num, created_at, size, body) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key(query, start, num, sort), query, int(start), int(num), time.time(), len(body), body)
+            )
+            self.stats['stored'] += 1
+            self._enforce_size_cap()
+            self._conn.commit()
+
+    def evict_expired(self):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+            self.stats['evicted'] += cursor.rowcount
+            self._conn.commit()
+
+    def _enforce_size_cap(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Drops the oldest entries until the cap is respected
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY created_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.stats['evicted'] += 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def print_stats(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        hit_rate = 100 * self.stats['hits'] / lookups if lookups else 0
+        print(f"[search cache] {self.stats['hits']} hits, {self.stats['misses']} misses ({hit_rate:.0f}% hit rate), "
+              f"{self.stats['stored']} stored, {self.stats['evicted']} evicted")
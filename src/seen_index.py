@@ -0,0 +1,153 @@
+"""
+seen_index.py
+
+Persistent index of job postings already processed in previous runs, stored in SQLite under output/.
+
+Postings are keyed on a canonical URL (tracking params stripped, host lowercased, ATS path
+variants such as '/apply' pages collapsed), so a posting found again by another query or
+on another day is dropped before it costs Dify tokens or a duplicate Trello card.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+SEEN_INDEX_PATH = os.path.join(os.path.dirname(__file__), '../output/seen_postings.sqlite')
+
+# Params identifying a posting (gh_jid, ashby_jid...) are kept: career pages embedding an ATS rely on them
+TRACKING_PARAMS = {
+    'gh_src', 'lever-source', 'lever-origin', 'source', 'src', 'ref', 'refid', 'referrer', 'trk', 'trkinfo',
+    'trackingid', 'gclid', 'fbclid', 'mc_cid', 'mc_eid', 'iis', 'iisn',
+}
+
+# (host regex, path regex, canonical path template). The first match wins.
+ATS_PATH_RULES = [
+    (r'(^|\.)lever\.co$', r'^/([^/]+)/([0-9a-f-]{36})', '/{0}/{1}'),
+    (r'(^|\.)ashbyhq\.com$', r'^/([^/]+)/([0-9a-f-]{36})', '/{0}/{1}'),
+    (r'(^|\.)greenhouse\.io$', r'^/([^/]+)/jobs/(\d+)', '/{0}/jobs/{1}'),
+    (r'(^|\.)workable\.com$', r'^/([^/]+)/j/([0-9A-Za-z]+)', '/{0}/j/{1}'),
+    (r'(^|\.)jobvite\.com$', r'^/([^/]+)/job/([0-9A-Za-z]+)', '/{0}/job/{1}'),
+    (r'(^|\.)teamtailor\.com$', r'^/(?:[a-z]{2}(?:-[a-z]{2})?/)?jobs/(\d+)', '/jobs/{0}'),
+    (r'(^|\.)myworkdayjobs\.com$', r'^/(?:[a-z]{2}-[a-z]{2}/)?(.+?_[A-Za-z0-9-]+)(?:/apply.*)?$', '/{0}'),
+    (r'(^|\.)linkedin\.com$', r'^/jobs/view/(?:[^/]*?-)?(\d+)', '/jobs/view/{0}'),
+]
+_COMPILED_RULES = [(re.compile(host), re.compile(path, re.IGNORECASE), template) for host, path, template in ATS_PATH_RULES]
+
+
+###***********************************************************************************************************************###
+def canonical_url(url):
+    """
+    Normalize a job posting URL, so the variants of a same posting share one key.
+    Args:
+        url (str): URL as returned by Google
+    Returns:
+        str: Canonical URL (no scheme, lowercase host, no tracking params or fragment). The path keeps
+             its case: ATS such as Workable and Workday have case-sensitive posting IDs
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().split('@')[-1].split(':')[0]
+    if host.startswith('www.'):
+        host = host[4:]
+    # Country mirrors (br.linkedin.com, pt.linkedin.com...) and board variants (job-boards.greenhouse.io)
+    if host.endswith('.linkedin.com'):
+        host = 'linkedin.com'
+    if host.endswith('greenhouse.io'):
+        host = 'boards.greenhouse.io'
+
+    path = re.sub(r'/+', '/', parts.path).rstrip('/')
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    ]
+
+    # Greenhouse embeds: /embed/job_app?for=company&token=123
+    if host == 'boards.greenhouse.io' and path.endswith('/embed/job_app'):
+        params = dict(query)
+        if 'for' in params and 'token' in params:
+            path, query = f"/{params['for']}/jobs/{params['token']}", []
+
+    # LinkedIn search pages pointing at a posting
+    if host == 'linkedin.com':
+        params = dict(query)
+        if 'currentJobId' in params:
+            path, query = f"/jobs/view/{params['currentJobId']}", []
+
+    for host_pattern, path_pattern, template in _COMPILED_RULES:
+        if host_pattern.search(host):
+            match = path_pattern.match(path)
+            if match:
+                path = template.format(*match.groups())
+                query = []
+            break
+
+    return urlunsplit(('', host, path, urlencode(sorted(query)), '')).lstrip('/')
+
+
+###***********************************************************************************************************************###
+class SeenIndex:
+    """
+    Args:
+        path (str): SQLite file
+    """
+
+    def __init__(self, path=SEEN_INDEX_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Shared by the threads of the streaming pipeline
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen (url_key TEXT PRIMARY KEY, url TEXT, title TEXT, first_seen REAL, last_seen REAL)"
+        )
+        self._conn.commit()
+
+    def __contains__(self, url):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM seen WHERE url_key = ?", (canonical_url(url),)).fetchone() is not None
+
+    def filter_new(self, job_listings):
+        """
+            Drop postings seen in a previous run, and repeated postings within this run.
+        Args:
+            job_listings (list): JobListing records
+        Returns:
+            tuple: (new listings, number of listings dropped as already seen)
+        """
+        keys = [canonical_url(listing.url) for listing in job_listings]
+
+        seen = set()
+        unique_keys = list(dict.fromkeys(keys))
+        # SQLite caps the number of bound parameters, so lookups go in chunks
+        with self._lock:
+            for index in range(0, len(unique_keys), 500):
+                chunk = unique_keys[index:index + 500]
+                placeholders = ','.join('?' * len(chunk))
+                seen.update(row[0] for row in self._conn.execute(f"SELECT url_key FROM seen WHERE url_key IN ({placeholders})", chunk))
+
+        new_listings = []
+        for key, listing in zip(keys, job_listings):
+            if key in seen:
+                continue
+            seen.add(key)
+            new_listings.append(listing)
+
+        return new_listings, len(job_listings) - len(new_listings)
+
+    def mark_seen(self, job_listings):
+        now = time.time()
+        rows = [(canonical_url(listing.url), listing.url, listing.title, now, now) for listing in job_listings]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO seen (url_key, url, title, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(url_key) DO UPDATE SET last_seen = excluded.last_seen",
+                rows
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,92 @@
+"""
+settings.py
+
+API credentials of the run (Google, Dify and Trello), read from the environment on first use
+instead of at import time.
+
+Modules that never call an API (token filtering, JSON parsing, re-scoring scripts, benchmarks)
+import without any secret set; a run checks every credential it needs up front (require), so a
+missing one fails before any API quota is spent rather than halfway through.
+
+Usage:
+    from settings import settings
+    settings.require(*GOOGLE_SETTINGS)
+    search_google(query, settings.GOOGLE_API_KEY, settings.SEARCH_ENGINE_ID)
+    settings.DIFY_AGENT_URL = stub_url     # overrides the environment (stubs, tests)
+"""
+import os
+
+# --- CONFIGURATION ---
+###***********************************************************************************************************************###
+GOOGLE_SETTINGS = ('GOOGLE_API_KEY', 'SEARCH_ENGINE_ID')
+DIFY_SETTINGS = ('DIFY_API_KEY', 'DIFY_API_KEY_SEEKER', 'DIFY_AGENT_URL', 'DIFY_USER')
+TRELLO_SETTINGS = ('TRELLO_API_KEY', 'TRELLO_TOKEN', 'TRELLO_BOARD_ID', 'TRELLO_LIST_ID')
+SETTING_NAMES = GOOGLE_SETTINGS + DIFY_SETTINGS + TRELLO_SETTINGS
+
+
+class MissingSettingError(KeyError):
+    """A credential the run needs is not set in the environment."""
+
+    def __str__(self):
+        return self.args[0]
+
+
+###***********************************************************************************************************************###
+class Settings:
+    """
+        Credentials resolved lazily: an attribute is read from the environment the first time it is
+        used, then kept. Assigning an attribute overrides the environment.
+    Args:
+        environ (Mapping): Where the values are read from (default: os.environ)
+    """
+
+    def __init__(self, environ=None):
+        self._environ = os.environ if environ is None else environ
+
+    def __getattr__(self, name):
+        # Only called for attributes not resolved (nor assigned) yet
+        if name not in SETTING_NAMES:
+            raise AttributeError(f"Unknown setting: {name}")
+        try:
+            value = self._environ[name]
+        except KeyError:
+            raise MissingSettingError(f"Environment variable {name} is not set") from None
+        setattr(self, name, value)
+        return value
+
+    def get(self, name):
+        """
+            Setting by name, also outside SETTING_NAMES (the agent keys of a profile, see profiles.py).
+        Raises:
+            MissingSettingError: When it is not set
+        """
+        if name in SETTING_NAMES:
+            return getattr(self, name)
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            pass
+        try:
+            value = self._environ[name]
+        except KeyError:
+            raise MissingSettingError(f"Environment variable {name} is not set") from None
+        self.__dict__[name] = value
+        return value
+
+    def require(self, *names):
+        """
+            Check that every setting in `names` is available, reporting all the missing ones at once.
+        Raises:
+            MissingSettingError: When any of them is not set
+        """
+        missing = [name for name in names if name not in self.__dict__ and name not in self._environ]
+        if missing:
+            raise MissingSettingError(f"Environment variables not set: {', '.join(missing)}")
+
+    def reset(self):
+        """Forget resolved and assigned values: the next access reads the environment again."""
+        for name in [name for name in self.__dict__ if not name.startswith('_')]:
+            del self.__dict__[name]
+
+
+settings = Settings()
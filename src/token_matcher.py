@@ -0,0 +1,169 @@
+"""
+token_matcher.py
+
+Precompiled multi-pattern matcher for the profile tokens (lib/profile_tokens.py).
+
+All PT and EN tokens are lowercased once and compiled into a single trie-shaped regex,
+so every text is scanned in one pass instead of one substring search per token.
+Results are identical to a plain `token.lower() in text.lower()` check per token.
+"""
+import re
+from functools import lru_cache
+
+
+###***********************************************************************************************************************###
+def trie_pattern(words, substitutions=None):
+    """
+    Build a regex matching the longest of `words` at a given position.
+    Words sharing a prefix share the branch, so the regex engine walks a trie instead
+    of trying every word. `substitutions` maps characters to the regex matching them
+    (default: the escaped character).
+    """
+    substitutions = substitutions or {}
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        terminal = '' in node
+        branches = [substitutions.get(char, re.escape(char)) + build(child) for char, child in sorted(node.items()) if char != '']
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional: tries the longer word first, falls back to the word ending here
+        return f'(?:{body})?' if terminal else body
+
+    return build(trie)
+
+
+class TokenMatcher:
+    """
+    Args:
+        tokens_pt (list): Portuguese profile tokens
+        tokens_en (list): English profile tokens
+    """
+
+    def __init__(self, tokens_pt, tokens_en):
+        self.tokens_pt = list(tokens_pt)
+        self.tokens_en = list(tokens_en)
+
+        # Lowercased form -> positions in each list (a token listed twice counts twice, as before)
+        self._pt_index = {}
+        self._en_index = {}
+        for index, token in enumerate(self.tokens_pt):
+            self._pt_index.setdefault(token.lower(), []).append(index)
+        for index, token in enumerate(self.tokens_en):
+            self._en_index.setdefault(token.lower(), []).append(index)
+
+        words = {word for word in list(self._pt_index) + list(self._en_index) if word}
+        # An empty token is always "in" the text
+        self._always = {''} if ('' in self._pt_index or '' in self._en_index) else set()
+
+        # The lookahead reports, at every position, the longest token starting there.
+        # Shorter tokens starting at the same position are its prefixes, precomputed below.
+        self._pattern = re.compile(f'(?=({trie_pattern(words)}))') if words else None
+        self._prefixes = {word: [word[:i] for i in range(1, len(word)) if word[:i] in words] for word in words}
+
+    def find(self, text):
+        """
+        Returns:
+            set: Lowercased tokens occurring in `text`
+        """
+        found = set(self._always)
+        if self._pattern is None:
+            return found
+
+        for longest in set(self._pattern.findall(text.lower())):
+            if longest:
+                found.add(longest)
+                found.update(self._prefixes[longest])
+        return found
+
+    def positions(self, text):
+        """
+        Returns:
+            tuple: Sorted indexes of the matched tokens in tokens_pt and in tokens_en
+        """
+        found = self.find(text)
+        pt_positions = sorted(index for word in found for index in self._pt_index.get(word, ()))
+        en_positions = sorted(index for word in found for index in self._en_index.get(word, ()))
+        return pt_positions, en_positions
+
+    def incidence_pairs(self, texts):
+        """
+            Scan many texts in a single regex pass over their joined lowercased form.
+        Args:
+            texts (list): Texts to scan
+        Returns:
+            tuple: (rows, columns) lists, one pair per (text, matched token). Columns index
+                   tokens_pt first, then tokens_en (offset by len(tokens_pt)). Pairs may repeat.
+        """
+        offset = len(self.tokens_pt)
+        lowered = [text.lower() for text in texts]
+        rows = []
+        columns = []
+
+        if self._always:
+            always_columns = self._word_columns('', offset)
+            for row in range(len(lowered)):
+                rows.extend([row] * len(always_columns))
+                columns.extend(always_columns)
+
+        if self._pattern is None or not lowered:
+            return rows, columns
+
+        # No token contains NUL, so no match spans two texts
+        starts = []
+        position = 0
+        for text in lowered:
+            starts.append(position)
+            position += len(text) + 1
+
+        word_columns = {}
+        row = 0
+        for found in self._pattern.finditer('\0'.join(lowered)):
+            longest = found.group(1)
+            if not longest:
+                continue
+            while row + 1 < len(starts) and starts[row + 1] <= found.start():
+                row += 1
+            if longest not in word_columns:
+                word_columns[longest] = [column for word in [longest] + self._prefixes[longest] for column in self._word_columns(word, offset)]
+            matched = word_columns[longest]
+            rows.extend([row] * len(matched))
+            columns.extend(matched)
+
+        return rows, columns
+
+    def _word_columns(self, word, offset):
+        return self._pt_index.get(word, []) + [offset + index for index in self._en_index.get(word, [])]
+
+    def match(self, text):
+        """
+        Returns:
+            dict: {'pt': [...], 'en': [...], 'total': int}, same output as analyze_text_for_tokens
+        """
+        pt_positions, en_positions = self.positions(text)
+
+        return {
+            'pt': [self.tokens_pt[index] for index in pt_positions],
+            'en': [self.tokens_en[index] for index in en_positions],
+            'total': len(pt_positions) + len(en_positions)
+        }
+
+
+###***********************************************************************************************************************###
+@lru_cache(maxsize=16)
+def _cached_matcher(tokens_pt, tokens_en):
+    return TokenMatcher(tokens_pt, tokens_en)
+
+
+def get_matcher(tokens_pt, tokens_en):
+    """
+    Returns:
+        TokenMatcher: Compiled once per distinct vocabulary, then reused
+    """
+    return _cached_matcher(tuple(tokens_pt), tuple(tokens_en))
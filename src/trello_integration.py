@@ -10,70 +10,208 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import os
-import requests
+import threading
+from collections import Counter
 
-# Get environment variables directly
-TRELLO_API_KEY = os.environ['TRELLO_API_KEY']
-TRELLO_TOKEN = os.environ['TRELLO_TOKEN']
-TRELLO_BOARD_ID = os.environ['TRELLO_BOARD_ID']
-TRELLO_LIST_ID = os.environ['TRELLO_LIST_ID']
+import http_client
+from concurrency import TokenBucket, ordered_map
+from seen_index import canonical_url
+from instrumentation import count, instrumented
+from settings import settings
 
+# Credentials (TRELLO_API_KEY, TRELLO_TOKEN, TRELLO_BOARD_ID, TRELLO_LIST_ID) are read on first use, see settings.py
+TRELLO_API_URL = "https://api.trello.com/1"
+GREEN_LABEL_ID = '67eddecc96db48eddbbeb469'
+TRELLO_MAX_CONCURRENCY = 4
+TRELLO_RATE_PER_SECOND = 8     # Trello allows 100 calls per 10 s per token
 
-def create_trello_card(job_data):
+
+def card_fields(job_data):
     """
-    Create a Trello card for a job opportunity.
-    
-    Args:
-        job_data (dict): Dictionary containing job information with keys:
-            - title: Job title
-            - url: Job posting URL
-            - description: Job description/snippet
-            - recommendation: AI recommendation (e.g., "INVESTIGAR MAIS", "CANDIDATAR-SE")
-    
     Returns:
-        dict: Response from Trello API containing the created card information
+        dict: Name, description, source URL (and label) of the card of an analyzed job
     """
-    url = "https://api.trello.com/1/cards"
-    
-    # Prepare card data
-    card_data = {
-        'idList': TRELLO_LIST_ID,
-        'key': TRELLO_API_KEY,
-        'token': TRELLO_TOKEN,
+    fields = {
         'name': job_data["EMPRESA"],
-        'desc': f'CLASSIFICAÇÃO: **{job_data['CLASSIFICAÇÃO']}**\n{job_data["ANÁLISE"]}\n\n**RECOMENDAÇÃO: {job_data['RECOMENDAÇÃO']}**',
+        'desc': f'CLASSIFICAÇÃO: **{job_data["CLASSIFICAÇÃO"]}**\n{job_data["ANÁLISE"]}\n\n**RECOMENDAÇÃO: {job_data["RECOMENDAÇÃO"]}**',
         'urlSource': job_data['URL'],
-        'pos': 'top'
     }
 
     # Add a label for jobs that are recommended, according to AI Agent
     if job_data['RECOMENDAÇÃO'] == 'CANDIDATAR-SE':
-        card_data['idLabels'] = '67eddecc96db48eddbbeb469' # it's a Green Label ID
-    
-    try:
-        response = requests.post(url, json=card_data)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"Error creating Trello card: {e}")
-        return None
+        fields['idLabels'] = GREEN_LABEL_ID
+    return fields
 
-def create_trello_cards_from_jobs(jobs):
+
+def create_trello_cards_from_jobs(jobs, list_id=None, board_id=None):
     """
     Create multiple Trello cards from a list of job opportunities.
+    Jobs that already have a card on the board are skipped (or updated, when their analysis changed).
     
     Args:
         jobs (list): List of job dictionaries containing job information
+        list_id (str): List new cards go to (default: TRELLO_LIST_ID)
+        board_id (str): Board whose cards are checked for existing URLs (default: TRELLO_BOARD_ID)
     
     Returns:
         list: List of created Trello card responses
     """
-    created_cards = []
-    
-    for job in jobs:
-        card_response = create_trello_card(job)
-        if card_response:
-            created_cards.append(card_response)
-            print(f"Created Trello card for: {job['EMPRESA']}")
-    
-    return created_cards 
\ No newline at end of file
+    trello_sync = TrelloSync(list_id, board_id)
+    trello_sync.sync(jobs)
+    trello_sync.print_report()
+    return trello_sync.created
+
+
+###***********************************************************************************************************************###
+class TrelloSync:
+    """
+        Creates or updates the cards of analyzed jobs, idempotently.
+
+        The board cards are fetched once (archived ones included) and indexed by the canonical URL of
+        their attachments (Trello turns `urlSource` into an attachment). A job whose URL already has a
+        card is skipped when the card is up to date, updated (name, description, label) when the
+        analysis changed, and only created otherwise, so a rerun never duplicates cards. Cards are
+        synced by a bounded thread pool under a token bucket sized for Trello's per-token limit;
+        429 answers are retried by the shared http_client session (waiting the Retry-After the API asks for).
+
+    Args:
+        list_id (str): List new cards go to
+        board_id (str): Board whose cards are checked for existing URLs
+        max_concurrency (int): Cards synced at the same time (default: TRELLO_MAX_CONCURRENCY)
+        rate_per_second (float): Trello calls per second, across all threads (default: TRELLO_RATE_PER_SECOND)
+    """
+
+    def __init__(self, list_id=None, board_id=None, max_concurrency=None, rate_per_second=None):
+        self.list_id = list_id or settings.TRELLO_LIST_ID
+        self.board_id = board_id or settings.TRELLO_BOARD_ID
+        self.max_concurrency = max_concurrency or TRELLO_MAX_CONCURRENCY
+        self.counts = Counter()  # created, updated, skipped, failed, throttled (429 answers)
+        self.created = []
+        self._cards = None  # canonical URL -> card
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._rate_limiter = TokenBucket(rate_per_second or TRELLO_RATE_PER_SECOND)
+
+    def _request(self, method, path, params=None, json=None):
+        params = {'key': settings.TRELLO_API_KEY, 'token': settings.TRELLO_TOKEN, **(params or {})}
+        self._rate_limiter.acquire()
+        # Single retry layer: the adapter's Retry already retries 429s (any method) after Retry-After
+        response = http_client.request(method, f"{TRELLO_API_URL}{path}", params=params, json=json)
+        retries = getattr(response.raw, 'retries', None)
+        throttled = sum(1 for retry in retries.history if retry.status == 429) if retries is not None else 0
+        if throttled:
+            with self._lock:
+                self.counts['throttled'] += throttled
+            count('trello_throttled', throttled)
+        response.raise_for_status()
+        return response.json()
+
+    @instrumented('trello_fetch_cards', items_out=len)
+    def fetch_cards(self):
+        """
+        Returns:
+            dict: Canonical URL -> card, for every card of the board (archived included)
+        """
+        cards = self._request('GET', f"/boards/{self.board_id}/cards", params={
+            'filter': 'all',
+            'fields': 'name,desc,idLabels,idList,closed',
+            'attachments': 'true',
+            'attachment_fields': 'url',
+        })
+        index = {}
+        for card in cards:
+            for attachment in card.get('attachments') or []:
+                index.setdefault(canonical_url(attachment.get('url') or ''), card)
+        return index
+
+    def _board_cards(self):
+        if self._cards is None:
+            with self._load_lock:
+                if self._cards is None:
+                    self._cards = self.fetch_cards()
+                    print(f"[trello] {len(self._cards)} cards já existentes no quadro")
+        return self._cards
+
+    @instrumented('trello_sync_job')
+    def sync_job(self, job_data, list_id=None):
+        """
+        Args:
+            list_id (str): List the card goes to when created (default: the list of the sync), e.g. the
+                           list of a profile on a board shared by several profiles
+        Returns:
+            str: 'created', 'updated', 'skipped' or 'failed'
+        """
+        import requests  # Deferred: importing this module does not load the HTTP stack
+
+        claimed = None
+        try:
+            cards = self._board_cards()
+            fields = card_fields(job_data)
+            key = canonical_url(fields['urlSource'])
+
+            with self._lock:
+                card = cards.get(key)
+                if card is None:
+                    # Claimed before the call: the same URL twice in a run gets a single card
+                    cards[key] = {'id': None, **fields}
+                    claimed = key
+            changes = _card_changes(card, fields) if card is not None else None
+
+            if card is None:
+                created = self._request('POST', '/cards', json={'idList': list_id or self.list_id, 'pos': 'top', **fields})
+                with self._lock:
+                    cards[key] = {**fields, 'id': created.get('id'), 'idLabels': [fields['idLabels']] if 'idLabels' in fields else []}
+                    self.created.append(created)
+                action = 'created'
+            elif changes:
+                self._request('PUT', f"/cards/{card['id']}", json=changes)
+                with self._lock:
+                    card.update(changes)
+                    if 'idLabels' in changes:
+                        card['idLabels'] = changes['idLabels'].split(',')
+                action = 'updated'
+            else:
+                action = 'skipped'
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            print(f"Error syncing Trello card: {e}")
+            action = 'failed'
+            if claimed is not None:
+                # Released, so the next run (or a duplicate of the job) tries again
+                with self._lock:
+                    self._cards.pop(claimed, None)
+
+        with self._lock:
+            self.counts[action] += 1
+        count('trello_cards', action=action)
+        return action
+
+    def sync(self, jobs):
+        """
+        Returns:
+            list: Action taken for each job ('created', 'updated', 'skipped', 'failed'), in order
+        """
+        actions = ordered_map(self.sync_job, jobs, max_workers=self.max_concurrency)
+        for job, action in zip(jobs, actions):
+            if action == 'created':
+                print(f"Created Trello card for: {job['EMPRESA']}")
+        return actions
+
+    def print_report(self):
+        print(f"[trello] {self.counts['created']} cards criados, {self.counts['updated']} atualizados, "
+              f"{self.counts['skipped']} já existentes, {self.counts['failed']} falhas ({self.counts['throttled']} respostas 429)")
+
+
+def _card_changes(card, fields):
+    """
+    Returns:
+        dict: Fields to PUT so `card` matches `fields` (empty when up to date).
+              Archived cards and cards still being created are left alone; labels are only added.
+    """
+    if card.get('id') is None or card.get('closed'):
+        return {}
+    changes = {key: fields[key] for key in ('name', 'desc') if card.get(key) != fields[key]}
+    labels = list(card.get('idLabels') or [])
+    if fields.get('idLabels') and fields['idLabels'] not in labels:
+        changes['idLabels'] = ','.join(labels + [fields['idLabels']])
+    return changes
+